@@ -20,6 +20,23 @@ import socket
 import os
 import subprocess
 import shutil
+import threading
+import queue
+import random
+import time
+import html
+import hashlib
+import contextlib
+import cProfile
+import pstats
+import linecache
+import traceback
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
 from typing import Tuple
 
 def check_windows_ollama() -> Tuple[bool, str]:
@@ -71,6 +88,10 @@ try:
     import pyttsx3
 except ImportError:
     pyttsx3 = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def is_port_open(port, host="localhost", timeout=0.5):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -82,11 +103,911 @@ def is_port_open(port, host="localhost", timeout=0.5):
     except:
         return False
 
-def find_api_url(default_path="/api/generate", candidate_ports=[11434, 11435, 11433, 5000, 8000]):
-    for port in candidate_ports:
-        if is_port_open(port):
-            return f"http://localhost:{port}{default_path}"
-    return None
+def find_api_url(default_path="/api/generate", candidate_ports=[11434, 11435, 11433, 5000, 8000], force=False):
+    api_url, _ = discover_ollama_endpoint(default_path, candidate_ports, force=force)
+    return api_url
+
+def get_settings_path():
+    return os.path.join(os.path.expanduser("~"), ".houdini_ai_settings.json")
+
+def read_settings_file():
+    try:
+        with open(get_settings_path(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+_settings_lock = threading.Lock()
+
+def update_settings_file(values):
+    # Discovery saves from a worker thread while the panel saves from the UI thread, so the
+    # read-modify-write is serialized and the file is swapped in whole for concurrent readers
+    with _settings_lock:
+        settings = read_settings_file()
+        settings.update(values)
+        tmp_path = f"{get_settings_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(settings, f)
+        os.replace(tmp_path, get_settings_path())
+
+def ollama_endpoint(api_url, path):
+    parsed = urlparse(api_url)
+    return f"{parsed.scheme}://{parsed.netloc}{path}"
+
+DEFAULT_OPTIONS = {
+    "http_pool_connections": 4,
+    "http_pool_maxsize": 8,
+    "response_cache_enabled": True,
+    "response_cache_max_mb": 64,
+    "response_cache_max_age_days": 30,
+    "semantic_cache_enabled": False,
+    "semantic_cache_threshold": 0.92,
+    "embedding_model": "nomic-embed-text",
+    "conversation_mode": True,
+    "num_ctx": 8192,
+    "num_ctx_reserve": 1024,
+    "keep_alive": "30m",
+    "discovery_cache_ttl_hours": 24,
+    "backends": [],
+    "scheduler_policy": "least_outstanding",
+    "hedge_delay_ms": 0,
+    "hedge_model": "",
+    "race_models": [],
+    "connect_timeout": 5.0,
+    "first_token_timeout": 300.0,
+    "token_timeout": 60.0,
+    "max_retries": 2,
+    "retry_backoff": 0.5,
+    "breaker_threshold": 3,
+    "breaker_cooldown": 30.0,
+    "deferred_cooking": False,
+    "final_cook": True,
+    "scene_context": False,
+    "scene_context_tokens": 1500,
+    "geometry_context": False,
+    "geometry_context_tokens": 800,
+    "docs_enabled": False,
+    "docs_paths": [],
+    "docs_top_k": 4,
+    "docs_tokens": 1200,
+    "show_reply_stats": True,
+    "metrics_log_enabled": True,
+    "metrics_log_path": "",
+    "metrics_log_max_mb": 10,
+}
+
+HOUDINI_CONTEXT = (
+    "You are a Houdini automation assistant chat bot. "
+    "If the user request is related to Houdini, Python, or VEX, provide the complete and precise, correct and executable code accordingly, enclosed within the appropriate code fences.Answer only what is asked, precisely and concisely, without extra details.  "
+    "If the user request is not related to Houdini (for example, casual greetings or general questions), respond conversationally without any code, but still provide a helpful answer."
+)
+
+class OllamaHttpClient:
+    def __init__(self, pool_connections=4, pool_maxsize=8):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def backend_key(self, url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def session_for(self, url):
+        key = self.backend_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["Connection"] = "keep-alive"
+                self._sessions[key] = session
+            return session
+
+    def request(self, method, url, **kwargs):
+        return self.session_for(url).request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def configure(self, pool_connections=None, pool_maxsize=None):
+        pool_connections = pool_connections or self.pool_connections
+        pool_maxsize = pool_maxsize or self.pool_maxsize
+        if (pool_connections, pool_maxsize) == (self.pool_connections, self.pool_maxsize):
+            return
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.close()
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.items())
+        result = {}
+        for key, session in sessions:
+            pools = session.get_adapter(key).poolmanager.pools
+            pools = [pools[pool_key] for pool_key in pools.keys()]
+            requests_made = sum(pool.num_requests for pool in pools)
+            misses = sum(pool.num_connections for pool in pools)
+            hits = max(requests_made - misses, 0)
+            total = hits + misses
+            result[key] = {
+                "requests": requests_made,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
+        return result
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client():
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = OllamaHttpClient(DEFAULT_OPTIONS["http_pool_connections"], DEFAULT_OPTIONS["http_pool_maxsize"])
+        return _http_client
+
+def backend_api_url(url):
+    url = url.strip().rstrip("/")
+    if "://" not in url:
+        url = "http://" + url
+    return url if urlparse(url).path else url + "/api/generate"
+
+def latency_percentiles(samples, points=(50, 95, 99)):
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    return {point: ordered[min(int(round(point / 100.0 * (len(ordered) - 1))), len(ordered) - 1)] for point in points}
+
+class BackendScheduler:
+    def __init__(self, policy="least_outstanding", ewma_alpha=0.3, breaker_threshold=3, breaker_cooldown=30.0, ttft_window=200):
+        self.policy = policy
+        self.ewma_alpha = ewma_alpha
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.ttft_window = ttft_window
+        self.backends = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, urls, policy=None, breaker_threshold=None, breaker_cooldown=None):
+        with self._lock:
+            if policy:
+                self.policy = policy
+            if breaker_threshold:
+                self.breaker_threshold = breaker_threshold
+            if breaker_cooldown:
+                self.breaker_cooldown = breaker_cooldown
+            backends = OrderedDict()
+            for url in urls:
+                backends[url] = self.backends.get(url) or {
+                    "outstanding": 0, "requests": 0, "errors": 0, "ewma_ttft": None, "ttft_samples": deque(maxlen=self.ttft_window),
+                    "tokens": 0, "busy_seconds": 0.0, "failures": 0, "state": "closed", "open_until": 0.0,
+                    "probing": False, "last_error": "",
+                }
+            self.backends = backends
+
+    def available(self, backend, now):
+        # Circuit breaker: an open backend fails fast until its cooldown ends, then lets one probe request through
+        if backend["state"] == "open" and now >= backend["open_until"]:
+            backend["state"] = "half_open"
+        if backend["state"] == "half_open":
+            return not backend["probing"]
+        return backend["state"] == "closed"
+
+    def pick(self, exclude=()):
+        with self._lock:
+            now = time.time()
+            pool = [url for url in self.backends if url not in exclude and self.available(self.backends[url], now)]
+            if not pool:
+                return None
+            if self.policy == "latency":
+                key = lambda url: ((self.backends[url]["ewma_ttft"] or 0.0) * (self.backends[url]["outstanding"] + 1), self.backends[url]["outstanding"])
+            else:
+                key = lambda url: (self.backends[url]["outstanding"], self.backends[url]["ewma_ttft"] or 0.0)
+            url = min(pool, key=key)
+            backend = self.backends[url]
+            backend["outstanding"] += 1
+            backend["requests"] += 1
+            if backend["state"] == "half_open":
+                backend["probing"] = True
+            return url
+
+    def record_first_token(self, url, seconds):
+        with self._lock:
+            backend = self.backends.get(url)
+            if backend is not None:
+                previous = backend["ewma_ttft"]
+                backend["ewma_ttft"] = seconds if previous is None else previous + self.ewma_alpha * (seconds - previous)
+                backend["ttft_samples"].append(seconds)
+
+    def release(self, url, ok, seconds=0.0, tokens=0, error=""):
+        # ok is None for requests that ended without saying anything about the backend (cancelled, replayed)
+        with self._lock:
+            backend = self.backends.get(url)
+            if backend is None:
+                return
+            backend["outstanding"] = max(backend["outstanding"] - 1, 0)
+            backend["probing"] = False
+            if ok:
+                backend["tokens"] += tokens
+                backend["busy_seconds"] += seconds
+                backend["failures"] = 0
+                backend["state"] = "closed"
+            elif ok is False:
+                backend["errors"] += 1
+                backend["failures"] += 1
+                backend["last_error"] = error
+                if backend["state"] == "half_open" or backend["failures"] >= self.breaker_threshold:
+                    backend["state"] = "open"
+                    backend["open_until"] = time.time() + self.breaker_cooldown
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return [
+                {
+                    "url": url,
+                    "outstanding": backend["outstanding"],
+                    "requests": backend["requests"],
+                    "errors": backend["errors"],
+                    "healthy": backend["state"] == "closed",
+                    "state": backend["state"],
+                    "retry_in": max(backend["open_until"] - now, 0.0) if backend["state"] == "open" else 0.0,
+                    "ewma_ttft": backend["ewma_ttft"],
+                    "ttft_percentiles": latency_percentiles(backend["ttft_samples"]),
+                    "tokens_per_second": backend["tokens"] / backend["busy_seconds"] if backend["busy_seconds"] else 0.0,
+                    "last_error": backend["last_error"],
+                }
+                for url, backend in self.backends.items()
+            ]
+
+_backend_scheduler = None
+
+def get_backend_scheduler():
+    global _backend_scheduler
+    with _cache_lock:
+        if _backend_scheduler is None:
+            _backend_scheduler = BackendScheduler()
+        return _backend_scheduler
+
+def probe_ollama(port, host="localhost", timeout=1.0):
+    # A bare open port is not enough: only a server answering /api/tags like Ollama counts
+    if not is_port_open(port, host, timeout):
+        return None
+    try:
+        response = get_http_client().get(f"http://{host}:{port}/api/tags", timeout=timeout)
+        models = response.json().get("models") if response.status_code == 200 else None
+    except Exception:
+        return None
+    if not isinstance(models, list):
+        return None
+    return [model.get("name", "") for model in models if isinstance(model, dict)]
+
+def load_discovery_cache():
+    settings = read_settings_file()
+    cached = settings.get("discovery") or {}
+    ttl = settings.get("discovery_cache_ttl_hours", DEFAULT_OPTIONS["discovery_cache_ttl_hours"]) * 3600
+    if cached.get("api_url") and time.time() - cached.get("timestamp", 0) < ttl:
+        return cached["api_url"], cached.get("models", [])
+    return None, []
+
+def save_discovery_cache(api_url, models):
+    try:
+        update_settings_file({"discovery": {"api_url": api_url, "models": models, "timestamp": time.time()}})
+    except OSError:
+        pass
+
+def discover_ollama_endpoint(default_path="/api/generate", candidate_ports=(11434, 11435, 11433, 5000, 8000), host="localhost", force=False):
+    if not force:
+        api_url, models = load_discovery_cache()
+        if api_url:
+            return api_url, models
+    with ThreadPoolExecutor(max_workers=len(candidate_ports) or 1) as executor:
+        results = list(executor.map(lambda port: probe_ollama(port, host), candidate_ports))
+    for port, models in zip(candidate_ports, results):
+        if models is not None:
+            api_url = f"http://{host}:{port}{default_path}"
+            save_discovery_cache(api_url, models)
+            return api_url, models
+    save_discovery_cache(None, [])
+    return None, []
+
+def normalize_user_message(message):
+    return " ".join(message.lower().split()).rstrip("?!. ")
+
+def tokenize_for_replay(text):
+    return re.findall(r"\s*\S+|\s+", text)
+
+class ResponseCache:
+    def __init__(self, cache_dir, max_bytes=64 * 1024 * 1024, max_age=30 * 86400):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._index = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, model_name, template, message):
+        raw = "\0".join((model_name, template, normalize_user_message(message)))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for item in os.scandir(self.cache_dir):
+                if item.name.endswith(".json"):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, item.name[:-5], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, [size, mtime]) for mtime, key, size in entries)
+        self._total_bytes = sum(size for size, _ in self._index.values())
+
+    def _remove(self, key):
+        size, _ = self._index.pop(key)
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        cutoff = time.time() - self.max_age
+        for key in [key for key, (_, last_used) in self._index.items() if last_used < cutoff]:
+            self._remove(key)
+        while self._index and self._total_bytes > self.max_bytes:
+            self._remove(next(iter(self._index)))
+
+    def contains(self, key):
+        with self._lock:
+            self._load_index()
+            return key in self._index
+
+    def get(self, key):
+        with self._lock:
+            self._load_index()
+            meta = self._index.get(key)
+            if meta is not None and meta[1] < time.time() - self.max_age:
+                self._remove(key)
+                meta = None
+            if meta is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._remove(key)
+                self.misses += 1
+                return None
+            meta[1] = time.time()
+            self._index.move_to_end(key)
+            try:
+                os.utime(self._path(key), (meta[1], meta[1]))
+            except OSError:
+                pass
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        data = json.dumps(entry).encode("utf-8")
+        with self._lock:
+            self._load_index()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            if key in self._index:
+                self._total_bytes -= self._index[key][0]
+            self._index[key] = [len(data), time.time()]
+            self._index.move_to_end(key)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                self._remove(key)
+
+    def configure(self, max_bytes=None, max_age=None):
+        with self._lock:
+            self.max_bytes = max_bytes or self.max_bytes
+            self.max_age = max_age or self.max_age
+            if self._index is not None:
+                self._evict()
+
+    def stats(self):
+        with self._lock:
+            self._load_index()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+_response_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    global _response_cache
+    with _cache_lock:
+        if _response_cache is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".houdini_ai_cache", "responses")
+            _response_cache = ResponseCache(cache_dir)
+        return _response_cache
+
+SEMANTIC_EMBED_RETRY_SECONDS = 300
+
+class SemanticCache:
+    def __init__(self, cache_dir, http_client=None):
+        self.cache_dir = cache_dir
+        self.http_client = http_client or get_http_client()
+        self.vectors_path = os.path.join(cache_dir, "vectors.npy")
+        self.entries_path = os.path.join(cache_dir, "entries.jsonl")
+        self.vectors = None
+        self.entries = None
+        self.lookups = 0
+        self.hits = 0
+        self.embed_seconds = 0.0
+        self.scan_seconds = 0.0
+        # Failed embedding endpoints are skipped for a while, so a missing model does not add a round trip to every send
+        self.embed_failures = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = []
+        if os.path.exists(self.entries_path):
+            with open(self.entries_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        break
+        if os.path.exists(self.vectors_path):
+            self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+            if self.vectors.shape[0] < len(self.entries):
+                self.entries = self.entries[:self.vectors.shape[0]]
+
+    def _grow(self, dim):
+        capacity = max(64, 2 * (self.vectors.shape[0] if self.vectors is not None else 0))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.vectors_path + ".tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        count = len(self.entries)
+        if count:
+            grown[:count] = self.vectors[:count]
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp_path, self.vectors_path)
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+    def embed(self, text, api_url, embedding_model):
+        key = (ollama_endpoint(api_url, ""), embedding_model)
+        with self._lock:
+            failed = self.embed_failures.get(key)
+        if failed is not None and time.time() - failed < SEMANTIC_EMBED_RETRY_SECONDS:
+            raise RuntimeError(f"{embedding_model} embeddings failed recently")
+        start = time.perf_counter()
+        try:
+            response = self.http_client.post(ollama_endpoint(api_url, "/api/embeddings"), json={"model": embedding_model, "prompt": normalize_user_message(text)}, timeout=30)
+            response.raise_for_status()
+            vector = np.asarray(response.json()["embedding"], dtype=np.float32)
+        except Exception:
+            with self._lock:
+                self.embed_failures[key] = time.time()
+            raise
+        with self._lock:
+            self.embed_failures.pop(key, None)
+        norm = float(np.linalg.norm(vector))
+        with self._lock:
+            self.embed_seconds += time.perf_counter() - start
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, model_name, threshold):
+        with self._lock:
+            self._load()
+            self.lookups += 1
+            count = len(self.entries)
+            if not count or self.vectors is None or self.vectors.shape[1] != vector.shape[0]:
+                return None, 0.0
+            start = time.perf_counter()
+            scores = self.vectors[:count] @ vector
+            models = np.fromiter((entry["model"] == model_name for entry in self.entries), dtype=bool, count=count)
+            scores = np.where(models, scores, -1.0)
+            best = int(np.argmax(scores))
+            self.scan_seconds += time.perf_counter() - start
+            if scores[best] < threshold:
+                return None, float(scores[best])
+            self.hits += 1
+            return self.entries[best], float(scores[best])
+
+    def add(self, vector, entry):
+        with self._lock:
+            self._load()
+            if self.vectors is not None and self.vectors.shape[1] != vector.shape[0]:
+                self.clear_locked()
+            if self.vectors is None or len(self.entries) >= self.vectors.shape[0]:
+                self._grow(vector.shape[0])
+            self.vectors[len(self.entries)] = vector
+            self.vectors.flush()
+            with open(self.entries_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.entries.append(entry)
+
+    def clear_locked(self):
+        self.vectors = None
+        self.entries = []
+        for path in (self.vectors_path, self.entries_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self):
+        with self._lock:
+            self.clear_locked()
+
+    def stats(self):
+        with self._lock:
+            lookups = max(self.lookups, 1)
+            return {
+                "entries": len(self.entries or []),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / lookups,
+                "avg_embed_ms": self.embed_seconds * 1000.0 / lookups,
+                "avg_scan_ms": self.scan_seconds * 1000.0 / lookups,
+                "embed_failing": bool(self.embed_failures),
+            }
+
+_semantic_cache = None
+
+def get_semantic_cache():
+    global _semantic_cache
+    with _cache_lock:
+        if _semantic_cache is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".houdini_ai_cache", "semantic")
+            _semantic_cache = SemanticCache(cache_dir)
+        return _semantic_cache
+
+DOCS_EXTENSIONS = (".txt", ".md", ".rst", ".html", ".htm", ".py", ".vfl", ".vex", ".h")
+DOCS_CHUNK_CHARS = 1200
+DOCS_CANDIDATES = 50
+DOCS_EMBED_BATCH = 32
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def docs_terms(text):
+    return re.findall(r"[a-z0-9_]{2,}", text.lower())
+
+def chunk_document(text):
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        while len(paragraph) > DOCS_CHUNK_CHARS:
+            cut = paragraph.rfind(" ", 0, DOCS_CHUNK_CHARS)
+            cut = cut if cut > 0 else DOCS_CHUNK_CHARS
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > DOCS_CHUNK_CHARS:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+def read_document(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if path.lower().endswith((".html", ".htm")):
+        text = re.sub(r"(?is)<(script|style)\b.*?</\1>", " ", text)
+        text = re.sub(r"(?i)<(br|/p|/div|/h\d|/li|/pre)\b[^>]*>", "\n\n", text)
+        text = html.unescape(re.sub(r"<[^>]+>", " ", text))
+    return text
+
+class DocsIndex:
+    def __init__(self, index_dir, http_client=None):
+        self.index_dir = index_dir
+        self.http_client = http_client or get_http_client()
+        self.manifest = None
+        self.arrays = None
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.embed_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def version(self):
+        with self._lock:
+            self._load()
+            return self.manifest.get("version", 0)
+
+    def _load(self):
+        if self.manifest is not None:
+            return
+        self.manifest, self.arrays = {"version": 0, "files": {}}, {}
+        manifest_path = os.path.join(self.index_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            with open(os.path.join(self.index_dir, "vocab.json"), "r", encoding="utf-8") as f:
+                vocab = json.load(f)
+            # Only the postings touched by a query and the top chunks' text are paged in
+            arrays = {name: np.load(os.path.join(self.index_dir, f"{name}.npy"), mmap_mode="r")
+                      for name in ("offsets", "lengths", "postings_ptr", "postings_doc", "postings_tf", "file_starts")}
+            if manifest.get("dim"):
+                arrays["vectors"] = np.load(os.path.join(self.index_dir, "vectors.npy"), mmap_mode="r")
+            arrays["text"] = np.memmap(os.path.join(self.index_dir, "text.bin"), dtype=np.uint8, mode="r") if int(arrays["offsets"][-1]) else np.zeros(0, np.uint8)
+        except (OSError, ValueError) as e:
+            print(f"[HoudiniChatBot] docs index unreadable, reindex needed: {e}")
+            return
+        lengths = np.asarray(arrays["lengths"], dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) else 1.0
+        arrays["norms"] = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / max(average, 1.0))
+        arrays["vocab"] = vocab
+        arrays["paths"] = list(manifest["files"])
+        self.manifest, self.arrays = manifest, arrays
+
+    def close(self):
+        with self._lock:
+            self.manifest, self.arrays = None, None
+
+    def chunk_text(self, index, arrays=None):
+        arrays = arrays or self.arrays
+        offsets = arrays["offsets"]
+        return bytes(arrays["text"][int(offsets[index]):int(offsets[index + 1])]).decode("utf-8", errors="replace")
+
+    def embed(self, text, api_url, embedding_model, timeout=30):
+        start = time.perf_counter()
+        response = self.http_client.post(ollama_endpoint(api_url, "/api/embeddings"), json={"model": embedding_model, "prompt": text}, timeout=timeout)
+        response.raise_for_status()
+        vector = np.asarray(response.json()["embedding"], dtype=np.float32)
+        self.embed_seconds += time.perf_counter() - start
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def embed_batch(self, texts, api_url, embedding_model):
+        vectors = []
+        for start in range(0, len(texts), DOCS_EMBED_BATCH):
+            batch = texts[start:start + DOCS_EMBED_BATCH]
+            begin = time.perf_counter()
+            response = self.http_client.post(ollama_endpoint(api_url, "/api/embed"), json={"model": embedding_model, "input": batch}, timeout=120)
+            if response.status_code == 404:
+                # Ollama before 0.3 only has the one-prompt endpoint
+                vectors.extend(self.embed(text, api_url, embedding_model) for text in batch)
+                continue
+            response.raise_for_status()
+            self.embed_seconds += time.perf_counter() - begin
+            matrix = np.asarray(response.json()["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            vectors.extend(matrix / np.where(norms > 0, norms, 1.0))
+        return vectors
+
+    def scan(self, roots):
+        files = {}
+        for root in roots:
+            for directory, _, names in os.walk(os.path.expanduser(root)):
+                for name in sorted(names):
+                    if name.lower().endswith(DOCS_EXTENSIONS):
+                        path = os.path.join(directory, name)
+                        stat = os.stat(path)
+                        files[path] = {"mtime": stat.st_mtime, "size": stat.st_size}
+        return files
+
+    def build(self, roots, api_url=None, embedding_model="", progress=None, cancelled=lambda: False):
+        with self._lock:
+            self._load()
+            old_manifest, old_arrays = self.manifest, self.arrays
+        files = self.scan(roots)
+        use_vectors = bool(api_url and embedding_model)
+        same_model = old_manifest.get("embedding_model", "") == (embedding_model if use_vectors else "")
+        changed = [path for path, info in files.items()
+                   if not same_model or {key: old_manifest["files"].get(path, {}).get(key) for key in ("mtime", "size")} != info]
+        removed = [path for path in old_manifest["files"] if path not in files]
+        if not changed and not removed:
+            return {"files": len(files), "changed": 0, "removed": 0, "chunks": len(old_arrays.get("lengths", ())), "version": old_manifest["version"]}
+        texts, vectors, dim = [], [], old_manifest.get("dim", 0) if same_model else 0
+        for number, path in enumerate(files, 1):
+            if cancelled():
+                raise RuntimeError("Indexing cancelled.")
+            old = old_manifest["files"].get(path)
+            if path not in changed and old is not None:
+                # Unchanged files keep their chunks and, more importantly, their embeddings
+                first, count = old["first"], old["count"]
+                chunks = [self.chunk_text(index, old_arrays) for index in range(first, first + count)]
+                # Copied out of the memmap, since a view would keep the old file mapped
+                chunk_vectors = list(np.array(old_arrays["vectors"][first:first + count])) if dim else [None] * count
+            else:
+                if progress is not None:
+                    progress(f"Indexing {number}/{len(files)}: {os.path.basename(path)}")
+                chunks = chunk_document(read_document(path))
+                chunk_vectors = [None] * len(chunks)
+                if use_vectors:
+                    try:
+                        chunk_vectors = self.embed_batch(chunks, api_url, embedding_model)
+                        dim = dim or (len(chunk_vectors[0]) if chunk_vectors else 0)
+                    except Exception as e:
+                        if dim and same_model:
+                            # Keeping the last good index beats silently dropping its embeddings
+                            raise RuntimeError(f"Could not embed {os.path.basename(path)}: {e}")
+                        print(f"[HoudiniChatBot] docs embeddings unavailable, indexing keywords only: {e}")
+                        use_vectors, dim = False, 0
+            files[path]["first"], files[path]["count"] = len(texts), len(chunks)
+            texts.extend(chunks)
+            vectors.extend(chunk_vectors)
+        manifest = {"version": old_manifest["version"] + 1, "embedding_model": embedding_model if use_vectors and dim else "",
+                    "dim": dim if use_vectors else 0, "files": files, "built": time.time()}
+        # Windows cannot rename the index directory while any of its files are still mapped
+        del old_arrays
+        self.write(manifest, texts, vectors)
+        return {"files": len(files), "changed": len(changed), "removed": len(removed), "chunks": len(texts), "version": manifest["version"]}
+
+    def write(self, manifest, texts, vectors):
+        vocab, term_ids, doc_ids, term_counts, lengths = {}, [], [], [], []
+        for doc, text in enumerate(texts):
+            counts = {}
+            for term in docs_terms(text):
+                term_id = vocab.setdefault(term, len(vocab))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            lengths.append(sum(counts.values()))
+            term_ids.extend(counts)
+            doc_ids.extend([doc] * len(counts))
+            term_counts.extend(counts.values())
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        encoded = [text.encode("utf-8") for text in texts]
+        arrays = {
+            "offsets": np.concatenate(([0], np.cumsum([len(data) for data in encoded], dtype=np.int64))),
+            "lengths": np.asarray(lengths, dtype=np.int32),
+            # Postings in CSR form: the documents of term t are postings_doc[postings_ptr[t]:postings_ptr[t + 1]]
+            "postings_ptr": np.concatenate(([0], np.cumsum(np.bincount(term_ids, minlength=len(vocab)), dtype=np.int64))),
+            "postings_doc": np.asarray(doc_ids, dtype=np.int32)[order],
+            "postings_tf": np.minimum(np.asarray(term_counts, dtype=np.int64), 65535).astype(np.uint16)[order],
+            "file_starts": np.asarray([info["first"] for info in manifest["files"].values()], dtype=np.int64),
+        }
+        if manifest["dim"]:
+            arrays["vectors"] = np.vstack(vectors).astype(np.float32) if vectors else np.zeros((0, manifest["dim"]), np.float32)
+        tmp_dir = self.index_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dir, "text.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        with open(os.path.join(tmp_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f)
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        with self._lock:
+            # Open memmaps would keep the old files locked on Windows
+            self.manifest, self.arrays = None, None
+            old_dir = self.index_dir + ".old"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(self.index_dir):
+                os.replace(self.index_dir, old_dir)
+            os.replace(tmp_dir, self.index_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+    def search(self, query, top_k=4, query_vector=None):
+        with self._lock:
+            self._load()
+            arrays = self.arrays
+            count = len(arrays.get("lengths", ()))
+            if not count:
+                return []
+            start = time.perf_counter()
+            scores = np.zeros(count, dtype=np.float32)
+            ptr, vocab = arrays["postings_ptr"], arrays["vocab"]
+            for term in set(docs_terms(query)):
+                term_id = vocab.get(term)
+                if term_id is None:
+                    continue
+                low, high = int(ptr[term_id]), int(ptr[term_id + 1])
+                docs = arrays["postings_doc"][low:high]
+                tf = arrays["postings_tf"][low:high].astype(np.float32)
+                idf = np.log(1.0 + (count - (high - low) + 0.5) / (high - low + 0.5))
+                scores[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + arrays["norms"][docs])
+            rankings = [self.top(scores, DOCS_CANDIDATES, positive=True)]
+            if query_vector is not None and "vectors" in arrays and arrays["vectors"].shape[1] == query_vector.shape[0]:
+                rankings.append(self.top(arrays["vectors"] @ query_vector, DOCS_CANDIDATES))
+            # Reciprocal rank fusion needs no calibration between BM25 and cosine scores
+            fused = {}
+            for ranking in rankings:
+                for rank, index in enumerate(ranking):
+                    fused[index] = fused.get(index, 0.0) + 1.0 / (60 + rank)
+            best = sorted(fused, key=lambda index: -fused[index])[:top_k]
+            paths = arrays["paths"]
+            results = [{"chunk": index, "score": fused[index], "text": self.chunk_text(index),
+                        "path": paths[int(np.searchsorted(arrays["file_starts"], index, side="right")) - 1]} for index in best]
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - start
+            return results
+
+    def top(self, scores, limit, positive=False):
+        if positive:
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+            return [int(index) for index in candidates[np.argsort(-scores[candidates])]]
+        limit = min(limit, len(scores))
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+        return [int(index) for index in candidates[np.argsort(-scores[candidates])]]
+
+    def context(self, query, api_url=None, embedding_model="", top_k=4, token_budget=1200):
+        with self._lock:
+            self._load()
+            manifest = self.manifest
+        query_vector = None
+        if manifest.get("dim") and api_url and embedding_model == manifest.get("embedding_model"):
+            try:
+                query_vector = self.embed(query, api_url, embedding_model, timeout=5)
+            except Exception as e:
+                print(f"[HoudiniChatBot] docs query embedding failed, using keywords only: {e}")
+        sections, budget = [], token_budget
+        for result in self.search(query, top_k, query_vector):
+            section = f"[{os.path.basename(result['path'])}]\n{result['text']}"
+            if estimate_tokens(section) > budget:
+                continue
+            sections.append(section)
+            budget -= estimate_tokens(section)
+        if not sections:
+            return ""
+        return "Reference material from the local Houdini docs:\n\n" + "\n\n".join(sections)
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            searches = max(self.searches, 1)
+            return {
+                "files": len(self.manifest["files"]),
+                "chunks": len(self.arrays.get("lengths", ())),
+                "vectors": bool(self.manifest.get("dim")),
+                "version": self.manifest.get("version", 0),
+                "searches": self.searches,
+                "avg_search_ms": self.search_seconds * 1000.0 / searches,
+            }
+
+_docs_index = None
+
+def get_docs_index():
+    global _docs_index
+    with _cache_lock:
+        if _docs_index is None:
+            index_dir = os.path.join(os.path.expanduser("~"), ".houdini_ai_cache", "docs")
+            _docs_index = DocsIndex(index_dir)
+        return _docs_index
 
 SVG_CLEAR = """
 <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
@@ -154,156 +1075,2526 @@ SVG_RUN = """
 </svg>
 """
 
-SVG_COPY = """
-<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
-    <g fill="#ffffff">
-        <path d="M16 1H4c-1.1 0-2 .9-2 2v14h2V3h12V1zm3 4H8c-1.1 0-2 .9-2 2v14c0 1.1.9 2 2 2h11c1.1 0 2-.9 2-2V7c0-1.1-.9-2-2-2zm0 16H8V7h11v14z"/>
-        <text x="12" y="23" font-family="Arial" font-size="4" text-anchor="middle">Copy</text>
-    </g>
-</svg>
-"""
+SVG_COPY = """
+<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
+    <g fill="#ffffff">
+        <path d="M16 1H4c-1.1 0-2 .9-2 2v14h2V3h12V1zm3 4H8c-1.1 0-2 .9-2 2v14c0 1.1.9 2 2 2h11c1.1 0 2-.9 2-2V7c0-1.1-.9-2-2-2zm0 16H8V7h11v14z"/>
+        <text x="12" y="23" font-family="Arial" font-size="4" text-anchor="middle">Copy</text>
+    </g>
+</svg>
+"""
+
+SVG_EDIT = """
+<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
+    <g fill="#ffffff">
+        <path d="M3 17.25V21h3.75L17.81 9.94l-3.75-3.75L3 17.25zM20.71 7.04c.39-.39.39-1.02 0-1.41l-2.34-2.34c-.39-.39-1.02-.39-1.41 0l-1.83 1.83 3.75 3.75 1.83-1.83z"/>
+        <text x="12" y="23" font-family="Arial" font-size="4" text-anchor="middle">Edit</text>
+    </g>
+</svg>
+"""
+
+_ICON_CACHE = {}
+
+def get_cached_icon(svg_data, size):
+    key = (svg_data, size)
+    icon = _ICON_CACHE.get(key)
+    if icon is None:
+        icon = _ICON_CACHE[key] = create_svg_icon(svg_data, size)
+    return icon
+
+def create_svg_icon(svg_data, size):
+    svg_bytes = svg_data.encode('utf-8')
+    renderer = QtSvg.QSvgRenderer(QtCore.QByteArray(svg_bytes))
+    pixmap = QtGui.QPixmap(size, size)
+    pixmap.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter(pixmap)
+    renderer.render(painter)
+    painter.end()
+    return QtGui.QIcon(pixmap)
+
+STREAM_FRAME_MS = 33
+
+MARKDOWN_FENCE_RE = re.compile(r"^\s*```")
+MARKDOWN_HEADER_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+MARKDOWN_BULLET_RE = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+MARKDOWN_INLINE_CODE_RE = re.compile(r"`([^`]+)`")
+MARKDOWN_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+MARKDOWN_ITALIC_RE = re.compile(r"(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])")
+
+def markdown_inline_to_html(text):
+    text = html.escape(text, quote=False)
+    text = MARKDOWN_INLINE_CODE_RE.sub(r"<code style='background-color:#1e1e1e;'>\1</code>", text)
+    text = MARKDOWN_BOLD_RE.sub(r"<b>\1</b>", text)
+    return MARKDOWN_ITALIC_RE.sub(r"<i>\1</i>", text)
+
+def markdown_line_to_html(line):
+    header = MARKDOWN_HEADER_RE.match(line)
+    if header:
+        size = max(18 - 2 * len(header.group(1)), 13)
+        return f"<span style='font-size:{size}px; font-weight:600;'>{markdown_inline_to_html(header.group(2))}</span>"
+    bullet = MARKDOWN_BULLET_RE.match(line)
+    if bullet:
+        indent = "&nbsp;" * (2 * len(bullet.group(1)))
+        return f"{indent}&bull; {markdown_inline_to_html(bullet.group(2))}"
+    return markdown_inline_to_html(line)
+
+class StreamingRenderer:
+    def __init__(self, document):
+        self.document = document
+        self.cursor = QtGui.QTextCursor(document)
+        self.plain_format = QtGui.QTextCharFormat()
+        self.code_format = QtGui.QTextCharFormat()
+        self.code_format.setFontFamily("Consolas")
+        self.code_format.setFontFixedPitch(True)
+        self.code_format.setForeground(QtGui.QColor("#c8c8c8"))
+        self.pending = []
+        self.tail = ""
+        self.tail_start = 0
+        self.line_count = 0
+        self.in_code = False
+
+    def append(self, delta):
+        if delta:
+            self.pending.append(delta)
+
+    def flush(self):
+        if not self.pending:
+            return False
+        lines = (self.tail + "".join(self.pending)).split("\n")
+        self.pending = []
+        self.tail = lines.pop()
+        self.cursor.beginEditBlock()
+        self._remove_tail()
+        for line in lines:
+            self._commit_line(line)
+        self._insert_tail()
+        self.cursor.endEditBlock()
+        return True
+
+    def finish(self):
+        self.flush()
+        if self.tail:
+            self.cursor.beginEditBlock()
+            self._remove_tail()
+            self._commit_line(self.tail)
+            self.tail = ""
+            self.cursor.endEditBlock()
+
+    def _remove_tail(self):
+        self.cursor.setPosition(self.tail_start)
+        self.cursor.movePosition(QtGui.QTextCursor.End, QtGui.QTextCursor.KeepAnchor)
+        self.cursor.removeSelectedText()
+
+    def _insert_tail(self):
+        self.tail_start = self.cursor.position()
+        if self.tail:
+            if self.line_count:
+                self.cursor.insertBlock()
+            self.cursor.insertText(self.tail, self.code_format if self.in_code else self.plain_format)
+
+    def _commit_line(self, line):
+        if MARKDOWN_FENCE_RE.match(line):
+            self.in_code = not self.in_code
+            return
+        if self.line_count:
+            self.cursor.insertBlock()
+        self.line_count += 1
+        if self.in_code:
+            self.cursor.insertText(line, self.code_format)
+        else:
+            self.cursor.insertHtml(markdown_line_to_html(line))
+            self.cursor.setCharFormat(self.plain_format)
+
+def benchmark_streaming_render(token_count=1000, tokens_per_second=40, width=600):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    sample = (
+        "## Scatter points\nHere is a **quick** way to scatter points on a grid:\n"
+        "```python\nimport hou\ngeo = hou.node('/obj').createNode('geo')\n"
+        "grid = geo.createNode('grid')\nscatter = geo.createNode('scatter')\n```\n"
+        "- Adjust `npts` on the *scatter* node.\n"
+    )
+    tokens = re.findall(r"\s*\S+|\s+", sample)
+    tokens = (tokens * (token_count // len(tokens) + 1))[:token_count]
+    tokens_per_frame = max(int(tokens_per_second * STREAM_FRAME_MS / 1000.0), 1)
+
+    label = QtWidgets.QLabel()
+    label.setTextFormat(QtCore.Qt.RichText)
+    label.setWordWrap(True)
+    start = time.perf_counter()
+    text = ""
+    for token in tokens:
+        text += token
+        label.setText(text)
+        label.heightForWidth(width)
+    legacy_ms = (time.perf_counter() - start) * 1000.0
+
+    document = QtGui.QTextDocument()
+    document.setTextWidth(width)
+    renderer = StreamingRenderer(document)
+    start = time.perf_counter()
+    for index, token in enumerate(tokens, 1):
+        renderer.append(token)
+        if index % tokens_per_frame == 0:
+            renderer.flush()
+            document.size()
+    renderer.finish()
+    document.size()
+    streaming_ms = (time.perf_counter() - start) * 1000.0
+
+    scale = 1000.0 / token_count
+    results = {"legacy_ms_per_1k_tokens": legacy_ms * scale, "streaming_ms_per_1k_tokens": streaming_ms * scale}
+    print(f"QLabel.setText per token:  {results['legacy_ms_per_1k_tokens']:.1f} ms per 1k tokens")
+    print(f"StreamingRenderer @ {1000 // STREAM_FRAME_MS} Hz: {results['streaming_ms_per_1k_tokens']:.1f} ms per 1k tokens")
+    return results
+
+CODE_FENCE_OPEN_RE = re.compile(r"^\s*```\s*([\w#+.-]*)")
+CODE_FENCE_CLOSE_RE = re.compile(r"^\s*```\s*$")
+PYTHON_LANGUAGES = ("python", "py", "python3")
+VEX_LANGUAGES = ("vex", "vfl")
+
+class CodeFenceParser:
+    def __init__(self):
+        self.buffer = ""
+        self.blocks = []
+        self.open_index = None
+        self.open_lines = 0
+
+    def feed(self, text):
+        events = []
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            self._feed_line(line, events)
+        return events
+
+    def finish(self):
+        events = []
+        if self.buffer:
+            self._feed_line(self.buffer, events)
+            self.buffer = ""
+        if self.open_index is not None:
+            self._close(events)
+        return events
+
+    def _feed_line(self, line, events):
+        if self.open_index is None:
+            match = CODE_FENCE_OPEN_RE.match(line)
+            if match:
+                self.open_index = len(self.blocks)
+                self.open_lines = 0
+                self.blocks.append({"language": match.group(1).lower(), "code": ""})
+                events.append(("open", self.open_index, match.group(1).lower()))
+        elif CODE_FENCE_CLOSE_RE.match(line):
+            self._close(events)
+        else:
+            delta = ("\n" if self.open_lines else "") + line
+            self.open_lines += 1
+            self.blocks[self.open_index]["code"] += delta
+            events.append(("code", self.open_index, delta))
+
+    def _close(self, events):
+        block = self.blocks[self.open_index]
+        events.append(("close", self.open_index, block["code"]))
+        self.open_index = None
+
+def primary_code_block(blocks):
+    for languages in (PYTHON_LANGUAGES, VEX_LANGUAGES):
+        for block in blocks:
+            if block["language"] in languages and block["code"].strip():
+                return block["code"].strip(), languages is VEX_LANGUAGES
+    return "", False
+
+CODE_CACHE_SIZE = 128
+CODE_RUN_HISTORY = 20
+PROFILE_TOP_FUNCTIONS = 8
+
+def profile_hotspots(profiler, limit=PROFILE_TOP_FUNCTIONS):
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in pstats.Stats(profiler).stats.items():
+        if "_lsprof" in name:
+            continue
+        label = name if filename == "~" else f"{name} ({os.path.basename(filename)}:{line})"
+        rows.append({"function": label, "calls": calls, "total_ms": total * 1000.0, "cumulative_ms": cumulative * 1000.0})
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows[:limit]
+
+def format_run_result(run):
+    timing = f"{run['wall_ms']:.1f} ms (CPU {run['cpu_ms']:.1f} ms{', cached compile' if run['cached'] else ''})"
+    if not run["ok"]:
+        heading = "Could not compile" if run.get("stage") == "compile" else f"Failed after {timing}"
+        return f"{heading}\n{run['traceback'] or run['error']}".rstrip()
+    lines = [f"Ran in {timing}"]
+    lines.extend(format_final_cook(run))
+    if run["hotspots"]:
+        lines.append(f"{'self ms':>9} {'total ms':>9} {'calls':>7}  function")
+        for row in run["hotspots"]:
+            lines.append(f"{row['total_ms']:9.2f} {row['cumulative_ms']:9.2f} {row['calls']:7d}  {row['function']}")
+    return "\n".join(lines)
+
+@contextlib.contextmanager
+def deferred_cooking():
+    # Manual update mode stops Houdini recooking after every node a script creates or edits
+    previous = hou.updateModeSetting()
+    hou.setUpdateMode(hou.updateMode.Manual)
+    try:
+        yield
+    finally:
+        hou.setUpdateMode(previous)
+
+def cook_dirty_displays(root="/obj"):
+    cooked = []
+    network = hou.node(root)
+    if network is None:
+        return cooked
+    for node in network.allSubChildren(recurse_in_locked_nodes=False):
+        if node.childTypeCategory() != hou.sopNodeTypeCategory():
+            continue
+        display = node.displayNode()
+        if display is not None and display.needsToCook():
+            display.cook()
+            cooked.append(display)
+    return cooked
+
+def timed_final_cook(result):
+    # One forced cook of what the script left dirty, so its cost is measured here rather than in the viewport
+    cook_start = time.perf_counter()
+    cooked = []
+    try:
+        cooked = cook_dirty_displays()
+    except Exception as e:
+        result["cook_error"] = str(e)
+    result["cook_ms"] = (time.perf_counter() - cook_start) * 1000.0
+    result["cooked"] = len(cooked)
+    return result
+
+def format_final_cook(result):
+    if "cook_ms" not in result:
+        return []
+    lines = [f"Cooking was deferred; final cook of {result['cooked']} nodes took {result['cook_ms']:.1f} ms"]
+    if result.get("cook_error"):
+        lines.append(f"Final cook failed: {result['cook_error']}")
+    return lines
+
+def run_deferred(executor, source, final_cook=True, profile=False):
+    with hou.undos.group("AI Assistant: run script"):
+        with deferred_cooking():
+            run = executor.run(source, profile=profile)
+        if final_cook and run["ok"]:
+            timed_final_cook(run)
+    return run
+
+class CodeExecutor:
+    def __init__(self, max_entries=CODE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.compiled = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def compile(self, source):
+        key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        with self._lock:
+            code = self.compiled.get(key)
+            if code is not None:
+                self.compiled.move_to_end(key)
+                self.hits += 1
+                return code, True
+        filename = f"<chatbot {key[:8]}>"
+        code = compile(source, filename, "exec")
+        # Registered with linecache so tracebacks and profiles can quote the generated lines
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+        with self._lock:
+            self.misses += 1
+            self.compiled[key] = code
+            while len(self.compiled) > self.max_entries:
+                linecache.cache.pop(self.compiled.popitem(last=False)[1].co_filename, None)
+        return code, False
+
+    def run(self, source, profile=False, namespace=None):
+        result = {"time": time.time(), "ok": False, "stage": "compile", "cached": False, "wall_ms": 0.0, "cpu_ms": 0.0,
+                  "error": "", "traceback": "", "hotspots": []}
+        try:
+            code, result["cached"] = self.compile(source)
+        except SyntaxError as e:
+            result["error"] = f"SyntaxError: {e.msg} (line {e.lineno})"
+            result["traceback"] = "".join(traceback.format_exception_only(type(e), e))
+            return result
+        result["stage"] = "run"
+        namespace = {"hou": hou, "__name__": "__main__"} if namespace is None else namespace
+        profiler = cProfile.Profile() if profile else None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                exec(code, namespace)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+            result["ok"] = True
+        except Exception as e:
+            result["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+            # The first frame is this method; everything after it belongs to the script
+            result["traceback"] = "".join(traceback.format_exception(type(e), e, e.__traceback__.tb_next))
+        result["wall_ms"] = (time.perf_counter() - wall) * 1000.0
+        result["cpu_ms"] = (time.thread_time() - cpu) * 1000.0
+        if profiler is not None:
+            result["hotspots"] = profile_hotspots(profiler)
+        return result
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self.compiled), "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+_code_executor = None
+
+def get_code_executor():
+    global _code_executor
+    with _cache_lock:
+        if _code_executor is None:
+            _code_executor = CodeExecutor()
+        return _code_executor
+
+VEX_INDICATORS = (
+    '@', 'v@', 'f@', 'i@', 'p@',
+    'point()', 'prim()', 'vertex()', 'detail()',
+    'volumesample()', 'chramp()', 'primintrinsic()'
+)
+
+def looks_like_vex(code):
+    return any(indicator in code for indicator in VEX_INDICATORS)
+
+def is_vex_code(code, language=None):
+    # The fence language decides; the substring heuristic only covers unlabelled blocks
+    language = (language or "").lower()
+    return language in VEX_LANGUAGES if language else looks_like_vex(code)
+
+def insert_wrangle(source, snippet, offset=(0, -1)):
+    # The wrangle goes right below source and takes over its downstream connections and display flag
+    if source.type().category().name() != "Sop":
+        raise ValueError(f"{source.path()} is not a SOP node")
+    wrangle = source.parent().createNode("attribwrangle")
+    wrangle.parm("snippet").set(snippet)
+    position = source.position()
+    wrangle.setPosition(hou.Vector2(position[0] + offset[0], position[1] + offset[1]))
+    for connection in source.outputConnections():
+        connection.outputNode().setInput(connection.inputIndex(), wrangle)
+    wrangle.setInput(0, source)
+    if source.isDisplayFlagSet():
+        wrangle.setDisplayFlag(True)
+        wrangle.setRenderFlag(True)
+    return wrangle
+
+class BatchTargetError(Exception):
+    pass
+
+def python_job(source, executor, node=None):
+    def job():
+        run = executor.run(source, namespace={"hou": hou, "node": node, "__name__": "__main__"})
+        if not run["ok"]:
+            raise BatchTargetError(run["error"])
+        return f"ran in {run['wall_ms']:.1f} ms"
+    return job
+
+def node_jobs(nodes, source, executor, language=None):
+    # VEX becomes one wrangle per node; Python runs once per node with `node` bound to it
+    if is_vex_code(source, language):
+        return [(node.path(), lambda node=node: insert_wrangle(node, source).name()) for node in nodes]
+    return [(node.path(), python_job(source, executor, node)) for node in nodes]
+
+def block_jobs(blocks, executor, anchor=None):
+    # VEX blocks of one reply are chained into consecutive wrangles, starting below the anchor node
+    jobs = []
+    chain = [anchor]
+    def wrangle_job(code):
+        def job():
+            if chain[-1] is None:
+                raise ValueError("Select a SOP node to attach VEX blocks to")
+            chain.append(insert_wrangle(chain[-1], code))
+            return chain[-1].name()
+        return job
+    for number, block in enumerate(blocks, 1):
+        code = block["code"]
+        jobs.append((f"block {number}", wrangle_job(code) if is_vex_code(code, block.get("language")) else python_job(code, executor)))
+    return jobs
+
+def run_batch(label, jobs, deferred=False, final_cook=False):
+    # The whole batch, final cook included, is a single undo step; a failing target is reported and the rest still run
+    batch = {"results": []}
+    with hou.undos.group(label):
+        with deferred_cooking() if deferred else contextlib.nullcontext():
+            for target, job in jobs:
+                start = time.perf_counter()
+                try:
+                    detail, ok = job() or "", True
+                except BatchTargetError as e:
+                    detail, ok = str(e), False
+                except Exception as e:
+                    detail, ok = f"{type(e).__name__}: {e}", False
+                batch["results"].append({"target": target, "ok": ok, "detail": detail, "ms": (time.perf_counter() - start) * 1000.0})
+        if deferred and final_cook and any(result["ok"] for result in batch["results"]):
+            timed_final_cook(batch)
+    return batch
+
+def format_batch_results(batch):
+    results = batch["results"]
+    succeeded = sum(1 for result in results if result["ok"])
+    lines = [f"{succeeded} of {len(results)} succeeded in {sum(result['ms'] for result in results):.1f} ms (one undo step)"]
+    lines.extend(format_final_cook(batch))
+    for result in results:
+        lines.append(f"{'ok    ' if result['ok'] else 'FAILED'} {result['target']}: {result['detail']}")
+    return "\n".join(lines)
+
+class WorkerSignals(QtCore.QObject):
+    finished = QtCore.Signal(str, bool, str)
+    error = QtCore.Signal(str)
+    partial = QtCore.Signal(str)
+    block_started = QtCore.Signal(int, str)
+    block_delta = QtCore.Signal(int, str)
+    block_finished = QtCore.Signal(int, str, str)
+    stats = QtCore.Signal(dict)
+    first_token = QtCore.Signal(float)
+    winner = QtCore.Signal(str, str)
+    telemetry = QtCore.Signal(dict)
+    connection_lost = QtCore.Signal(str)
+
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "\u00b5s": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600}
+DURATION_PART = r"(\d+(?:\.\d*)?|\.\d+)(ns|us|\u00b5s|ms|s|m|h)"
+DURATION_RE = re.compile(r"^[-+]?(?:%s)+$" % DURATION_PART)
+
+def normalize_keep_alive(value):
+    # Ollama reads numbers as seconds and strings with Go's time.ParseDuration, which requires a unit
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if value >= 0 else -1
+    text = str(value).strip().replace(" ", "")
+    if re.match(r"^[-+]?\d+(?:\.\d+)?$", text):
+        return int(float(text)) if float(text) >= 0 else -1
+    return text if DURATION_RE.match(text) else None
+
+def parse_keep_alive(value):
+    value = normalize_keep_alive(value)
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    seconds = sum(float(number) * DURATION_UNITS[unit] for number, unit in re.findall(DURATION_PART, value))
+    return -1 if value.startswith("-") else int(seconds)
+
+class StartupSignals(QtCore.QObject):
+    finished = QtCore.Signal(str, object, bool, str, float)
+
+class StartupDiscoveryWorker(QtCore.QRunnable):
+    def __init__(self, force=False):
+        super().__init__()
+        self.signals = StartupSignals()
+        self.force = force
+
+    def run(self):
+        start = time.perf_counter()
+        found_url, models = discover_ollama_endpoint(force=self.force)
+        try:
+            is_installed, detail = check_windows_ollama()
+        except Exception as e:
+            is_installed, detail = False, str(e)
+        self.signals.finished.emit(found_url or "", models, is_installed, detail, time.perf_counter() - start)
+
+class WarmupSignals(QtCore.QObject):
+    loaded = QtCore.Signal(str, float, float)
+    failed = QtCore.Signal(str, str)
+
+class ModelWarmupWorker(QtCore.QRunnable):
+    def __init__(self, api_url, model_name, keep_alive, http_client=None):
+        super().__init__()
+        self.signals = WarmupSignals()
+        self.api_url = api_url
+        self.model_name = model_name
+        self.keep_alive = keep_alive
+        self.http_client = http_client or get_http_client()
+
+    def run(self):
+        # An empty prompt makes Ollama load the model and reset its unload timer without generating
+        start = time.perf_counter()
+        try:
+            response = self.http_client.post(ollama_endpoint(self.api_url, "/api/generate"), json={
+                "model": self.model_name,
+                "prompt": "",
+                "stream": False,
+                "keep_alive": self.keep_alive,
+            }, timeout=(5, 600))
+            response.raise_for_status()
+            load_duration = response.json().get("load_duration", 0) / 1e9
+            self.signals.loaded.emit(self.model_name, time.perf_counter() - start, load_duration)
+        except Exception as e:
+            self.signals.failed.emit(self.model_name, str(e))
+
+class DocsIndexSignals(QtCore.QObject):
+    progress = QtCore.Signal(str)
+    finished = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+
+class DocsIndexWorker(QtCore.QRunnable):
+    def __init__(self, index, roots, api_url, embedding_model):
+        super().__init__()
+        self.signals = DocsIndexSignals()
+        self.index = index
+        self.roots = roots
+        self.api_url = api_url
+        self.embedding_model = embedding_model
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            result = self.index.build(self.roots, self.api_url, self.embedding_model, progress=self.signals.progress.emit, cancelled=lambda: self._cancelled)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        result["seconds"] = time.perf_counter() - start
+        self.signals.finished.emit(result)
+
+OLLAMA_STAT_KEYS = ("total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration")
+
+def format_stats_line(stats):
+    if stats.get("cached"):
+        return f"{stats.get('model', '')} · from cache · {stats['total_ms'] / 1000.0:.2f}s"
+    parts = [f"{stats['model']} @ {stats['backend']}"]
+    if stats.get("ttft_ms") is not None:
+        parts.append(f"TTFT {stats['ttft_ms'] / 1000.0:.2f}s")
+    rate = stats.get("eval_rate") or stats.get("client_rate")
+    if rate:
+        parts.append(f"{rate:.1f} tok/s")
+    parts.append(f"{stats.get('tokens', 0)} tokens in {stats['total_ms'] / 1000.0:.1f}s")
+    if stats.get("prompt_tokens"):
+        parts.append(f"prompt {stats['prompt_tokens']} tok {stats.get('prompt_eval_ms', 0) / 1000.0:.2f}s")
+    if stats.get("load_ms", 0) >= 100:
+        parts.append(f"load {stats['load_ms'] / 1000.0:.1f}s")
+    if stats.get("gap_p95_ms") is not None:
+        parts.append(f"gap p95 {stats['gap_p95_ms']:.0f} ms")
+    if stats.get("retries"):
+        parts.append(f"{stats['retries']} {'retry' if stats['retries'] == 1 else 'retries'}")
+    return " · ".join(parts)
+
+class MetricsLog:
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def configure(self, path, max_bytes):
+        with self._lock:
+            self.path = path
+            self.max_bytes = max_bytes
+
+    def append(self, record):
+        # Logs may sit on a studio share, so the write never runs on the UI thread
+        threading.Thread(target=self.write, args=(record,), daemon=True).start()
+
+    def write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                    for number in range(self.backups - 1, 0, -1):
+                        if os.path.exists(f"{self.path}.{number}"):
+                            os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"[HoudiniChatBot] Could not write metrics log {self.path}: {e}")
+
+    def read(self):
+        records = []
+        with self._lock:
+            for path in [f"{self.path}.{number}" for number in range(self.backups, 0, -1)] + [self.path]:
+                if not os.path.exists(path):
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            continue
+        return records
+
+    def summary(self):
+        groups = OrderedDict()
+        for record in self.read():
+            if record.get("cached"):
+                continue
+            group = groups.setdefault((record.get("model", ""), record.get("backend", "")), {"requests": 0, "rates": [], "ttft": []})
+            group["requests"] += 1
+            if record.get("eval_rate") or record.get("client_rate"):
+                group["rates"].append(record.get("eval_rate") or record.get("client_rate"))
+            if record.get("ttft_ms") is not None:
+                group["ttft"].append(record["ttft_ms"])
+        return [{"model": model, "backend": backend, "requests": group["requests"],
+                 "tokens_per_second": sum(group["rates"]) / len(group["rates"]) if group["rates"] else None,
+                 "ttft_ms": latency_percentiles(group["ttft"])} for (model, backend), group in groups.items()]
+
+def format_metrics_summary(rows):
+    if not rows:
+        return "No requests in the metrics log yet."
+    lines = [f"{'tok/s':>7} {'TTFT p50':>9} {'p95':>7} {'requests':>8}  model @ backend"]
+    for row in sorted(rows, key=lambda row: -(row["tokens_per_second"] or 0.0)):
+        rate = f"{row['tokens_per_second']:7.1f}" if row["tokens_per_second"] else f"{'-':>7}"
+        ttft = row["ttft_ms"]
+        p50, p95 = (f"{ttft[50] / 1000.0:8.2f}s", f"{ttft[95] / 1000.0:6.2f}s") if ttft else (f"{'-':>9}", f"{'-':>7}")
+        lines.append(f"{rate} {p50} {p95} {row['requests']:8d}  {row['model']} @ {row['backend']}")
+    return "\n".join(lines)
+
+_metrics_log = None
+
+def get_metrics_log():
+    global _metrics_log
+    with _cache_lock:
+        if _metrics_log is None:
+            _metrics_log = MetricsLog(os.path.join(os.path.expanduser("~"), ".houdini_ai_cache", "metrics.jsonl"))
+        return _metrics_log
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+class ChatHistoryBudget:
+    def __init__(self, num_ctx=8192, reserve=1024, refill=0.75):
+        self.num_ctx = num_ctx
+        self.reserve = reserve
+        self.refill = refill
+        self.start = 0
+
+    def reset(self):
+        self.start = 0
+
+    def build_messages(self, history, user_message):
+        turns = [{"role": entry["role"], "content": entry.get("message", "")} for entry in history if entry.get("role") in ("user", "assistant")]
+        fixed = estimate_tokens(HOUDINI_CONTEXT) + estimate_tokens(user_message)
+        budget = self.num_ctx - self.reserve - fixed
+        costs = [estimate_tokens(turn["content"]) for turn in turns]
+        self.start = min(self.start, len(turns))
+        if sum(costs[self.start:]) > budget:
+            # Trim well below the limit so the kept prefix stays identical for the next few turns
+            # and Ollama can keep reusing its cached KV state for it.
+            target = budget * self.refill
+            while self.start < len(turns) and sum(costs[self.start:]) > target:
+                self.start += 1
+            while self.start < len(turns) and turns[self.start]["role"] != "user":
+                self.start += 1
+        messages = [{"role": "system", "content": HOUDINI_CONTEXT}]
+        messages.extend(turns[self.start:])
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+SCENE_NODE_EVENTS = ("ParmTupleChanged", "InputRearranged", "NameChanged", "FlagChanged")
+SCENE_NETWORK_EVENTS = ("ChildCreated", "ChildDeleted")
+SCENE_WATCHED_NODES = 500
+SCENE_MAX_PARMS = 24
+SCENE_MAX_VALUE_CHARS = 300
+
+class SceneContextProvider:
+    def __init__(self, token_budget=1500, max_watched=SCENE_WATCHED_NODES):
+        self.token_budget = token_budget
+        self.max_watched = max_watched
+        self.node_sections = {}
+        self.network_summaries = {}
+        # Sections are rebuilt only after a node callback reports a change, so a send costs a few dict lookups
+        self.watched = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def event_types(self):
+        return tuple(getattr(hou.nodeEventType, name) for name in SCENE_NODE_EVENTS + SCENE_NETWORK_EVENTS + ("BeingDeleted",))
+
+    def watch(self, node):
+        key = node.sessionId()
+        if key in self.watched:
+            self.watched.move_to_end(key)
+            return
+        node.addEventCallback(self.event_types(), self.on_node_event)
+        self.watched[key] = node
+        while len(self.watched) > self.max_watched:
+            old_key, old_node = self.watched.popitem(last=False)
+            self.node_sections.pop(old_key, None)
+            self.network_summaries.pop(old_key, None)
+            try:
+                old_node.removeEventCallback(self.event_types(), self.on_node_event)
+            except Exception:
+                pass
+
+    def on_node_event(self, event_type, **kwargs):
+        key = kwargs["node"].sessionId()
+        if event_type == hou.nodeEventType.BeingDeleted:
+            # Houdini drops the callbacks of a deleted node itself
+            self.watched.pop(key, None)
+            self.node_sections.pop(key, None)
+            self.network_summaries.pop(key, None)
+        elif event_type in (hou.nodeEventType.ChildCreated, hou.nodeEventType.ChildDeleted):
+            self.network_summaries.pop(key, None)
+        elif event_type == hou.nodeEventType.NameChanged:
+            # Other sections name this node as an input, and renames are rare enough to start over
+            self.node_sections.clear()
+        else:
+            self.node_sections.pop(key, None)
+
+    def cached(self, cache, node, describe):
+        key = node.sessionId()
+        text = cache.get(key)
+        if text is not None:
+            self.hits += 1
+            self.watched.move_to_end(key)
+            return text
+        self.misses += 1
+        self.watch(node)
+        text = cache[key] = describe(node)
+        return text
+
+    def format_value(self, parm_tuple):
+        values = parm_tuple.eval()
+        values = [f"{value:g}" if isinstance(value, float) else json.dumps(value) if isinstance(value, str) else str(value) for value in values]
+        text = values[0] if len(values) == 1 else "(" + ", ".join(values) + ")"
+        return text if len(text) <= SCENE_MAX_VALUE_CHARS else text[:SCENE_MAX_VALUE_CHARS] + "..."
+
+    def describe_node(self, node):
+        line = f"{node.path()} ({node.type().name()})"
+        inputs = node.inputs()
+        if inputs:
+            line += " <- " + ", ".join(source.name() if source is not None else "-" for source in inputs)
+        if hasattr(node, "isDisplayFlagSet") and node.isDisplayFlagSet():
+            line += " [display]"
+        parms = []
+        for parm_tuple in node.parmTuples():
+            if parm_tuple.isAtDefault():
+                continue
+            if len(parms) == SCENE_MAX_PARMS:
+                parms.append("...")
+                break
+            parms.append(f"{parm_tuple.name()}={self.format_value(parm_tuple)}")
+        return line + ("\n  " + " ".join(parms) if parms else "")
+
+    def describe_network(self, network):
+        counts = {}
+        children = network.children()
+        for child in children:
+            type_name = child.type().name()
+            counts[type_name] = counts.get(type_name, 0) + 1
+        common = sorted(counts.items(), key=lambda pair: -pair[1])[:8]
+        text = f"Network {network.path()}: {len(children)} nodes"
+        if common:
+            text += " (" + ", ".join(f"{count} {type_name}" for type_name, count in common) + (", ..." if len(counts) > len(common) else "") + ")"
+        return text
+
+    def current_network(self, selected):
+        editors = [pane for pane in hou.ui.paneTabs() if isinstance(pane, hou.NetworkEditor)]
+        if editors:
+            return editors[0].pwd()
+        return selected[0].parent() if selected else None
+
+    def snapshot(self):
+        selected = list(hou.selectedNodes())
+        network = self.current_network(selected)
+        sections = []
+        if network is not None:
+            sections.append(self.cached(self.network_summaries, network, self.describe_network))
+        # Selected nodes come first, then whatever feeds them
+        nodes, seen = [], set()
+        for node in selected + [source for node in selected for source in node.inputs() if source is not None]:
+            if node.sessionId() not in seen:
+                seen.add(node.sessionId())
+                nodes.append(node)
+        budget = self.token_budget - sum(estimate_tokens(section) for section in sections)
+        included = 0
+        for node in nodes:
+            text = self.cached(self.node_sections, node, self.describe_node)
+            if estimate_tokens(text) > budget:
+                break
+            sections.append(text)
+            budget -= estimate_tokens(text)
+            included += 1
+        if included < len(nodes):
+            sections.append(f"({len(nodes) - included} more nodes left out to stay within the context budget)")
+        if not sections:
+            return ""
+        return "Current Houdini scene:\n" + "\n".join(sections)
+
+    def close(self):
+        for node in self.watched.values():
+            try:
+                node.removeEventCallback(self.event_types(), self.on_node_event)
+            except Exception:
+                pass
+        self.watched.clear()
+        self.node_sections.clear()
+        self.network_summaries.clear()
+
+GEOMETRY_CACHE_SIZE = 64
+GEOMETRY_MAX_NODES = 3
+GEOMETRY_MAX_STRINGS = 6
+GEOMETRY_HISTOGRAM_BINS = 8
+
+def format_numbers(values):
+    values = [f"{value:.4g}" for value in values]
+    return values[0] if len(values) == 1 else "(" + ", ".join(values) + ")"
+
+class GeometrySummarizer:
+    def __init__(self, token_budget=800, max_cached=GEOMETRY_CACHE_SIZE):
+        self.token_budget = token_budget
+        self.max_cached = max_cached
+        # Keyed by node and cook count, so an uncooked node is never read twice
+        self.summaries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def attrib_array(self, geo, attrib, owner):
+        reader = getattr(geo, f"{owner}{'Float' if attrib.dataType() == hou.attribData.Float else 'Int'}AttribValuesAsString")
+        # One bulk copy per attribute; values arrive as packed 32-bit numbers
+        dtype = np.float32 if attrib.dataType() == hou.attribData.Float else np.int32
+        return np.frombuffer(reader(attrib.name()), dtype=dtype).reshape(-1, attrib.size())
+
+    def histogram(self, values):
+        # inf would push values outside the bins and NaN would hide the range, so only finite values are counted
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return []
+        low, high = float(values.min()), float(values.max())
+        if not high > low:
+            return []
+        bins = ((values - low) * np.float32(GEOMETRY_HISTOGRAM_BINS / (high - low))).astype(np.intp)
+        np.minimum(bins, GEOMETRY_HISTOGRAM_BINS - 1, out=bins)
+        return np.bincount(bins, minlength=GEOMETRY_HISTOGRAM_BINS).tolist()
+
+    def describe_attrib(self, geo, attrib, owner):
+        type_name = attrib.dataType().name().lower()
+        label = f"{owner} {attrib.name()} {type_name}{attrib.size() if attrib.size() > 1 else ''}"
+        if attrib.isArrayType():
+            return f"{label}[]"
+        if attrib.dataType() == hou.attribData.String:
+            strings = attrib.strings()
+            shown = ", ".join(json.dumps(value) for value in strings[:GEOMETRY_MAX_STRINGS])
+            return f"{label}: {len(strings)} unique ({shown}{', ...' if len(strings) > GEOMETRY_MAX_STRINGS else ''})"
+        if attrib.dataType() not in (hou.attribData.Float, hou.attribData.Int):
+            return label
+        if owner == "global":
+            value = geo.attribValue(attrib.name())
+            return f"{label}: {format_numbers(value if isinstance(value, (tuple, list)) else (value,))}"
+        if np is None:
+            return label
+        values = self.attrib_array(geo, attrib, owner)
+        if not len(values):
+            return label
+        # Reductions along the interleaved axis are several times slower, so each component gets its own row first
+        columns = np.ascontiguousarray(values.T)
+        low, high = columns.min(axis=1), columns.max(axis=1)
+        non_finite = 0
+        # min and max propagate NaN, so finite bounds mean every value is finite and the mask can be skipped
+        if not (np.isfinite(low).all() and np.isfinite(high).all()):
+            finite = np.isfinite(columns).all(axis=0)
+            non_finite = len(finite) - int(np.count_nonzero(finite))
+            columns = columns[:, finite]
+            if not columns.shape[1]:
+                return f"{label}: all {non_finite:,} values non-finite"
+            low, high = columns.min(axis=1), columns.max(axis=1)
+        text = f"{label}: min {format_numbers(low)} max {format_numbers(high)} mean {format_numbers(columns.mean(axis=1, dtype=np.float64))}"
+        if non_finite:
+            text += f" ({non_finite:,} non-finite skipped)"
+        # Vectors are binned by length, which is what matters for N, v and the like
+        if attrib.size() == 1:
+            magnitudes = columns[0]
+        else:
+            columns = columns.astype(np.float32, copy=False)
+            magnitudes = np.sqrt(np.einsum("ij,ij->j", columns, columns))
+        counts = self.histogram(magnitudes)
+        if counts:
+            text += f" {'histogram' if attrib.size() == 1 else 'length histogram'} {counts}"
+        return text
+
+    def describe(self, node, geo):
+        counts = {name: geo.intrinsicValue(f"{name}count") for name in ("point", "primitive", "vertex")}
+        lines = [f"Geometry of {node.path()}: {counts['point']:,} points, {counts['primitive']:,} primitives, {counts['vertex']:,} vertices"]
+        box = geo.boundingBox()
+        if counts["point"]:
+            lines.append(f"bounds min {format_numbers(box.minvec())} max {format_numbers(box.maxvec())} size {format_numbers(box.sizevec())}")
+        for owner, attribs in (("point", geo.pointAttribs()), ("prim", geo.primAttribs()),
+                               ("vertex", geo.vertexAttribs()), ("global", geo.globalAttribs())):
+            lines.extend(self.describe_attrib(geo, attrib, owner) for attrib in attribs)
+        return lines
+
+    def summarize(self, node):
+        geo = node.geometry()
+        if geo is None:
+            return []
+        key = (node.sessionId(), node.cookCount())
+        lines = self.summaries.get(key)
+        if lines is not None:
+            self.hits += 1
+            self.summaries.move_to_end(key)
+            return lines
+        self.misses += 1
+        lines = self.summaries[key] = self.describe(node, geo)
+        while len(self.summaries) > self.max_cached:
+            self.summaries.popitem(last=False)
+        return lines
+
+    def snapshot(self, nodes=None):
+        nodes = hou.selectedNodes() if nodes is None else nodes
+        nodes = [node for node in nodes if node.type().category().name() == "Sop"][:GEOMETRY_MAX_NODES]
+        sections, budget = [], self.token_budget
+        for node in nodes:
+            lines = self.summarize(node)
+            kept = []
+            for line in lines:
+                if estimate_tokens(line) > budget:
+                    kept.append(f"({len(lines) - len(kept)} more attributes left out to stay within the context budget)")
+                    break
+                kept.append(line)
+                budget -= estimate_tokens(line)
+            if kept:
+                sections.append("\n".join(kept))
+            if budget <= 0:
+                break
+        if not sections:
+            return ""
+        return "Selected geometry:\n" + "\n\n".join(sections)
+
+class SemanticLookupSignals(QtCore.QObject):
+    hit = QtCore.Signal(object, float)
+    miss = QtCore.Signal(object)
+
+class SemanticLookupWorker(QtCore.QRunnable):
+    def __init__(self, user_message, api_url, model_name, embedding_model, threshold):
+        super().__init__()
+        self.signals = SemanticLookupSignals()
+        self.user_message = user_message
+        self.api_url = api_url
+        self.model_name = model_name
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        # Exact hits are cheaper and are replayed by AIWorker itself
+        exact_key = get_response_cache().make_key(self.model_name, HOUDINI_CONTEXT, self.user_message)
+        if get_response_cache().contains(exact_key):
+            self.signals.miss.emit(None)
+            return
+        try:
+            cache = get_semantic_cache()
+            vector = cache.embed(self.user_message, self.api_url, self.embedding_model)
+            entry, score = cache.lookup(vector, self.model_name, self.threshold)
+        except Exception:
+            self.signals.miss.emit(None)
+            return
+        if entry is not None:
+            self.signals.hit.emit(entry, score)
+        else:
+            self.signals.miss.emit(vector)
+
+class BackendBusyError(Exception):
+    pass
+
+def response_cache_key(cache, model_name, user_message, docs_index=None):
+    # A reindex changes what gets retrieved, so answers are cached per docs version
+    template = HOUDINI_CONTEXT if docs_index is None else f"{HOUDINI_CONTEXT}\ndocs v{docs_index.version()}"
+    return cache.make_key(model_name, template, user_message)
+
+# Failures worth retrying on the same backend as long as no token has been shown yet.
+# A read timeout only reaches the retry loop before the first token, when the server has accepted the request but hung
+TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.ReadTimeout, BackendBusyError)
+
+def response_socket(response):
+    connection = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+    return getattr(connection, "sock", None)
+
+def abort_response(response):
+    # close() would wait for a reader blocked in another thread; a socket shutdown wakes it immediately
+    # and tells Ollama to stop generating
+    sock = response_socket(response)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+class AIWorker(QtCore.QRunnable):
+    def __init__(self, user_message, api_url, model_name, http_client=None, cache=None, cache_mode="use", cached_entry=None, embedding=None, messages=None, num_ctx=None, keep_alive=None, scheduler=None, hedge_delay=None, hedge_model=None, race_models=None,
+                 connect_timeout=5.0, first_token_timeout=300.0, token_timeout=60.0, max_retries=2, retry_backoff=0.5,
+                 docs_index=None, docs_query=None, docs_top_k=4, docs_tokens=1200, embedding_model=""):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self.user_message = user_message
+        self.api_url = api_url
+        self.model_name = model_name
+        self.http_client = http_client or get_http_client()
+        self.cache = cache
+        self.cache_mode = cache_mode
+        self.cached_entry = cached_entry
+        self.embedding = embedding
+        self.messages = messages
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.scheduler = scheduler
+        self.hedge_delay = hedge_delay
+        self.hedge_model = hedge_model
+        self.race_models = [model for model in race_models or [] if model != model_name]
+        self.connect_timeout = connect_timeout
+        self.first_token_timeout = first_token_timeout
+        self.token_timeout = token_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.docs_index = docs_index
+        self.docs_query = docs_query or user_message
+        self.docs_top_k = docs_top_k
+        self.docs_tokens = docs_tokens
+        self.embedding_model = embedding_model
+        self.reference = ""
+        self.reference_metrics = {}
+        self.attempts = []
+        self.output_started = False
+        self.fence_parser = CodeFenceParser()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+        # Wakes a reader that is waiting on a stalled server instead of leaving it until the timeout
+        self.cancel_attempts()
+
+    def emit_block_events(self, events):
+        for kind, index, value in events:
+            if kind == "open":
+                self.signals.block_started.emit(index, value)
+            elif kind == "code":
+                self.signals.block_delta.emit(index, value)
+            else:
+                self.signals.block_finished.emit(index, self.fence_parser.blocks[index]["language"], value)
+
+    def emit_token(self, token):
+        self.output_started = True
+        self.signals.partial.emit(token)
+        self.emit_block_events(self.fence_parser.feed(token))
+
+    def replay_cached(self, entry):
+        for token in tokenize_for_replay(entry["response"]):
+            if self._cancelled:
+                self.signals.error.emit("Request cancelled by user.")
+                return
+            self.emit_token(token)
+        self.signals.telemetry.emit({"model": entry.get("model", self.model_name), "cached": True,
+                                     "total_ms": (time.perf_counter() - self.attempts[0]["start"]) * 1000.0})
+        self.finish_response(entry["response"])
+
+    def request_metrics(self, winner, final_stats):
+        # Client-side times are measured from the first attempt, which is what the user waited for
+        begin = self.attempts[0]["start"]
+        metrics = {
+            "model": winner["model"],
+            "backend": urlparse(winner["api_url"]).netloc,
+            "ttft_ms": (winner["start"] + winner["ttft"] - begin) * 1000.0 if winner["ttft"] is not None else None,
+            "total_ms": (time.perf_counter() - begin) * 1000.0,
+            "tokens": final_stats.get("eval_count", winner["chunks"]),
+            "chunks": winner["chunks"],
+            "attempts": len(self.attempts),
+            "retries": winner["retries"],
+        }
+        if winner["chunks"] > 1 and winner["gaps"]:
+            streaming = sum(winner["gaps"])
+            metrics["client_rate"] = (winner["chunks"] - 1) / streaming if streaming > 0 else None
+            points = latency_percentiles(winner["gaps"], (50, 95, 100))
+            metrics.update(gap_p50_ms=points[50] * 1000.0, gap_p95_ms=points[95] * 1000.0, gap_max_ms=points[100] * 1000.0)
+        if final_stats.get("eval_count") and final_stats.get("eval_duration"):
+            metrics["eval_rate"] = final_stats["eval_count"] / (final_stats["eval_duration"] / 1e9)
+        for key, name in (("total_duration", "server_total_ms"), ("load_duration", "load_ms"), ("prompt_eval_duration", "prompt_eval_ms"), ("eval_duration", "eval_ms")):
+            if key in final_stats:
+                metrics[name] = final_stats[key] / 1e6
+        if "prompt_eval_count" in final_stats:
+            metrics["prompt_tokens"] = final_stats["prompt_eval_count"]
+        metrics.update(self.reference_metrics)
+        return metrics
+
+    def finish_response(self, partial_text):
+        self.emit_block_events(self.fence_parser.finish())
+        extracted_code, _ = primary_code_block(self.fence_parser.blocks)
+
+        if extracted_code:
+            hou.session.ai_execution_code = extracted_code
+            self.signals.finished.emit(partial_text, True, extracted_code)
+        else:
+            self.signals.finished.emit(partial_text, False, "")
+
+    def add_attempt(self, api_url, model_name, picked=True):
+        # picked is False for attempts that share a backend without a scheduler slot of their own
+        attempt = {"api_url": api_url, "model": model_name, "picked": picked, "start": time.perf_counter(), "ttft": None,
+                   "outcome": None, "tokens": 0, "retries": 0, "cancelled": False, "response": None,
+                   "chunks": 0, "last_token": None, "gaps": []}
+        self.attempts.append(attempt)
+        return attempt
+
+    def cancel_attempts(self, keep=None):
+        for attempt in self.attempts:
+            if attempt is not keep and attempt["outcome"] is None and not attempt["cancelled"]:
+                attempt["cancelled"] = True
+                if keep is not None and not self._cancelled and attempt["ttft"] is None and self.scheduler is not None:
+                    # A backend that lost the race before its first token took at least this long
+                    self.scheduler.record_first_token(attempt["api_url"], time.perf_counter() - attempt["start"])
+                if attempt["response"] is not None:
+                    abort_response(attempt["response"])
+
+    def retrieve_reference(self):
+        start = time.perf_counter()
+        try:
+            self.reference = self.docs_index.context(self.docs_query, self.api_url, self.embedding_model, self.docs_top_k, self.docs_tokens)
+        except Exception as e:
+            print(f"[HoudiniChatBot] docs lookup failed: {e}")
+            return
+        self.reference_metrics = {"docs_lookup_tokens": estimate_tokens(self.reference), "docs_lookup_ms": (time.perf_counter() - start) * 1000.0}
+
+    def build_request(self, api_url, model_name):
+        if self.messages is not None:
+            request_url = ollama_endpoint(api_url, "/api/chat")
+            messages = self.messages
+            if self.reference:
+                # Retrieved docs ride on the current turn so the system prompt and earlier turns stay a reusable prefix
+                messages = messages[:-1] + [dict(messages[-1], content=f"{self.reference}\n\n{messages[-1]['content']}")]
+            data = {
+                "model": model_name,
+                "messages": messages,
+                "stream": True
+            }
+        else:
+            request_url = api_url
+            full_prompt = HOUDINI_CONTEXT + ("\n" + self.reference + "\n" if self.reference else "") + "\nUser request:\n" + self.user_message
+            data = {
+                "model": model_name,
+                "prompt": full_prompt,
+                "stream": True
+            }
+        if self.num_ctx:
+            data["options"] = {"num_ctx": self.num_ctx}
+        if self.keep_alive is not None:
+            data["keep_alive"] = self.keep_alive
+        return request_url, data
+
+    def stream_attempt(self, attempt):
+        # Yields ("token", text) and a final ("stats", dict); stops quietly once the attempt is cancelled
+        for retry in range(self.max_retries + 1):
+            try:
+                yield from self.stream_once(attempt)
+                return
+            except Exception as e:
+                if self._cancelled or attempt["cancelled"]:
+                    return
+                if not isinstance(e, TRANSIENT_ERRORS) or attempt["ttft"] is not None or retry >= self.max_retries:
+                    raise
+            # Full jitter keeps several panels that lost the same server from retrying in lockstep
+            time.sleep(random.uniform(0, self.retry_backoff * 2 ** retry))
+            attempt["retries"] += 1
+
+    def stream_once(self, attempt):
+        request_url, data = self.build_request(attempt["api_url"], attempt["model"])
+        # The read timeout covers the wait for the first token; it is shortened to the inter-token limit afterwards
+        timeout = (self.connect_timeout or None, self.first_token_timeout or None)
+        with self.http_client.post(request_url, json=data, stream=True, timeout=timeout) as r:
+            attempt["response"] = r
+            if attempt["cancelled"]:
+                abort_response(r)
+            if r.status_code != 200:
+                error_msg = f"Bad response: {r.status_code}"
+                try:
+                    error_msg += f" - {r.json()}"
+                except:
+                    error_msg += f" - {r.text}"
+                raise BackendBusyError(error_msg) if r.status_code in (502, 503, 504) else Exception(error_msg)
+
+            try:
+                for line in r.iter_lines(decode_unicode=True):
+                    if self._cancelled or attempt["cancelled"]:
+                        return
+                    if line:
+                        try:
+                            chunk = json.loads(line)
+                        except ValueError:
+                            continue
+                        token = chunk.get('response') or chunk.get('message', {}).get('content', '')
+                        if token:
+                            now = time.perf_counter()
+                            if attempt["last_token"] is not None:
+                                attempt["gaps"].append(now - attempt["last_token"])
+                            attempt["last_token"] = now
+                            attempt["chunks"] += 1
+                            if attempt["ttft"] is None:
+                                attempt["ttft"] = time.perf_counter() - attempt["start"]
+                                if self.scheduler is not None:
+                                    self.scheduler.record_first_token(attempt["api_url"], attempt["ttft"])
+                                sock = response_socket(r)
+                                if sock is not None:
+                                    sock.settimeout(self.token_timeout or None)
+                            yield "token", token
+                        if chunk.get('done'):
+                            yield "stats", {key: chunk[key] for key in OLLAMA_STAT_KEYS if key in chunk}
+            except requests.exceptions.ConnectionError as e:
+                # requests reports a read timeout in the body as a connection error
+                if e.args and isinstance(e.args[0], ReadTimeoutError):
+                    raise requests.exceptions.ReadTimeout(str(e.args[0])) from e
+                raise
+
+    def start_reader(self, attempt, events):
+        index = self.attempts.index(attempt)
+        def read():
+            try:
+                for kind, value in self.stream_attempt(attempt):
+                    events.put((index, kind, value))
+                events.put((index, "done", None))
+            except Exception as e:
+                events.put((index, "error", e))
+        threading.Thread(target=read, daemon=True).start()
+
+    def declare_winner(self, attempt):
+        self.cancel_attempts(keep=attempt)
+        self.signals.winner.emit(attempt["api_url"], attempt["model"])
+        # Races declare a winner only once its answer is complete, so the first token time comes from the attempt itself
+        first_token = attempt["start"] + attempt["ttft"] if attempt["ttft"] is not None else time.perf_counter()
+        self.signals.first_token.emit(first_token - self.attempts[0]["start"])
+
+    def run_single(self, attempt):
+        partial_text, final_stats = "", {}
+        for kind, value in self.stream_attempt(attempt):
+            if kind == "stats":
+                final_stats = value
+                continue
+            if not partial_text:
+                self.signals.first_token.emit(attempt["ttft"])
+            partial_text += value
+            self.emit_token(value)
+        return partial_text, final_stats, attempt
+
+    def run_hedged(self, primary):
+        events = queue.Queue()
+        self.start_reader(primary, events)
+        deadline = primary["start"] + self.hedge_delay
+        hedged, live, winner = False, 1, None
+        partial_text, final_stats = "", {}
+        while not self._cancelled:
+            waiting = winner is None and not hedged
+            try:
+                index, kind, value = events.get(timeout=max(deadline - time.perf_counter(), 0) if waiting else 0.1)
+            except queue.Empty:
+                if waiting:
+                    hedged = True
+                    live += self.start_hedge(primary, events)
+                continue
+            attempt = self.attempts[index]
+            if attempt["cancelled"] or (winner is not None and attempt is not winner):
+                continue
+            if kind == "error" or (kind == "done" and winner is None):
+                attempt["outcome"] = False
+                live -= 1
+                if attempt is not winner and not hedged and not self._cancelled:
+                    # The primary failed before the delay ran out, so the duplicate goes out right away
+                    hedged = True
+                    live += self.start_hedge(primary, events)
+                if attempt is winner or live <= 0:
+                    if kind == "error":
+                        raise value
+                    return "", {}, attempt
+                continue
+            if kind == "done":
+                return partial_text, final_stats, winner
+            if kind == "stats":
+                final_stats = value
+                continue
+            if winner is None:
+                winner = attempt
+                self.declare_winner(winner)
+            partial_text += value
+            self.emit_token(value)
+        return None, {}, winner
+
+    def start_hedge(self, primary, events):
+        model = self.hedge_model or primary["model"]
+        exclude = (primary["api_url"],) if model == primary["model"] else ()
+        api_url = self.scheduler.pick(exclude=exclude) if self.scheduler is not None else None
+        if api_url is None:
+            if model == primary["model"]:
+                return 0
+            self.start_reader(self.add_attempt(primary["api_url"], model, picked=False), events)
+            return 1
+        self.start_reader(self.add_attempt(api_url, model), events)
+        return 1
+
+    def run_race(self, primary):
+        events = queue.Queue()
+        self.start_reader(primary, events)
+        for model in self.race_models:
+            api_url = self.scheduler.pick() if self.scheduler is not None else None
+            # With no backend free the racer shares the primary's, whose scheduler slot stays the primary's to release
+            self.start_reader(self.add_attempt(api_url or self.api_url, model, picked=api_url is not None), events)
+        texts, stats, live = {}, {}, len(self.attempts)
+        while not self._cancelled:
+            try:
+                index, kind, value = events.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            attempt = self.attempts[index]
+            if kind == "token":
+                texts[index] = texts.get(index, "") + value
+            elif kind == "stats":
+                stats[index] = value
+            elif kind == "done" and texts.get(index, "").strip():
+                # Racers stream silently; only the first complete answer is shown
+                self.declare_winner(attempt)
+                for token in tokenize_for_replay(texts[index]):
+                    self.emit_token(token)
+                return texts[index], stats.get(index, {}), attempt
+            else:
+                attempt["outcome"] = False
+                live -= 1
+                if live <= 0:
+                    if kind == "error":
+                        raise value
+                    return "", {}, attempt
+        return None, {}, None
+
+    def run(self):
+        primary = self.add_attempt(self.api_url, self.model_name)
+        error = ""
+        try:
+            if self.cached_entry:
+                self.replay_cached(self.cached_entry)
+                return
+            cache_key = None
+            if self.cache is not None and self.cache_mode != "bypass":
+                cache_key = response_cache_key(self.cache, self.model_name, self.user_message, self.docs_index)
+                if self.cache_mode == "use":
+                    cached = self.cache.get(cache_key)
+                    if cached:
+                        self.replay_cached(cached)
+                        return
+            if self.docs_index is not None:
+                self.retrieve_reference()
+            if self.race_models:
+                partial_text, final_stats, winner = self.run_race(primary)
+            elif self.hedge_delay:
+                partial_text, final_stats, winner = self.run_hedged(primary)
+            else:
+                partial_text, final_stats, winner = self.run_single(primary)
+            if self._cancelled or partial_text is None:
+                self.signals.error.emit("Request cancelled by user.")
+                return
+    
+            if not partial_text.strip():
+                raise Exception("Empty response from API")
+    
+            winner["outcome"], winner["tokens"] = True, final_stats.get("eval_count", len(partial_text) // 4)
+            if final_stats:
+                self.signals.stats.emit(final_stats)
+            self.signals.telemetry.emit(self.request_metrics(winner, final_stats))
+            self.finish_response(partial_text)
+            entry = {
+                "model": winner["model"],
+                "message": self.user_message,
+                "response": partial_text,
+                "code": primary_code_block(self.fence_parser.blocks)[0],
+                "blocks": self.fence_parser.blocks,
+                "created": time.time(),
+            }
+            # A smaller hedge model's answer must not be replayed as the main model's
+            if cache_key and winner["model"] == self.model_name:
+                self.cache.put(cache_key, entry)
+            if self.embedding is not None and winner["model"] == self.model_name:
+                get_semantic_cache().add(self.embedding, entry)
+    
+        except requests.exceptions.Timeout as e:
+            if isinstance(e, requests.exceptions.ConnectTimeout):
+                error = f"Could not connect to {self.api_url} within {self.connect_timeout:g}s."
+            elif self.output_started:
+                error = f"The model stopped sending tokens for more than {self.token_timeout:g}s."
+            else:
+                error = f"No response from the model within {self.first_token_timeout:g}s."
+            self.signals.error.emit(error)
+        except requests.exceptions.ConnectionError:
+            error = f"Failed to connect to {self.api_url}. Check if the server is running."
+            self.signals.connection_lost.emit(self.api_url)
+            self.signals.error.emit(error)
+        except Exception as e:
+            error = f"Model request error: {str(e)}\nAPI URL: {self.api_url}\nModel: {self.model_name}"
+            self.signals.error.emit(error)
+        finally:
+            if error and primary["outcome"] is None and not primary["cancelled"]:
+                primary["outcome"] = False
+            self.cancel_attempts()
+            if self.scheduler is not None:
+                # Only attempts that took a slot with pick give one back
+                for attempt in [attempt for attempt in self.attempts if attempt["picked"]]:
+                    outcome = None if self._cancelled else attempt["outcome"]
+                    self.scheduler.release(attempt["api_url"], outcome, time.perf_counter() - attempt["start"], attempt["tokens"], error)
+
+
+PYTHON_KEYWORDS = (
+    "def", "class", "import", "from", "as", "if", "elif", "else", "try",
+    "except", "finally", "for", "while", "with", "return", "in", "is", "not",
+    "and", "or", "pass", "break", "continue", "yield", "lambda", "raise", "assert",
+    "del", "global", "nonlocal", "async", "await", "None", "True", "False"
+)
+PYTHON_BUILTINS = (
+    "print", "len", "range", "enumerate", "zip", "dict", "list", "tuple", "set", "str",
+    "int", "float", "bool", "isinstance", "super", "open", "min", "max", "sum", "any",
+    "all", "sorted", "map", "filter", "getattr", "setattr", "hasattr", "type", "object",
+    "Exception", "self", "hou"
+)
+VEX_KEYWORDS = (
+    "if", "else", "for", "foreach", "while", "do", "break", "continue", "return",
+    "function", "export", "const", "struct"
+)
+VEX_TYPES = (
+    "int", "float", "vector", "vector2", "vector4", "matrix", "matrix2", "matrix3",
+    "string", "void", "dict", "bsdf"
+)
+VEX_BUILTINS = (
+    "point", "prim", "vertex", "detail", "attrib", "hasattrib", "setpointattrib", "setprimattrib",
+    "setvertexattrib", "setdetailattrib", "addpoint", "addprim", "addvertex", "removepoint", "removeprim",
+    "npoints", "nprims", "nvertices", "primpoints", "pointprims", "primintrinsic", "setprimintrinsic",
+    "pcopen", "pcfind", "pcfilter", "pciterate", "pcimport", "nearpoint", "nearpoints", "xyzdist", "primuv",
+    "ch", "chf", "chi", "chv", "chs", "chramp", "fit", "fit01", "rand", "random", "noise", "snoise",
+    "onoise", "curlnoise", "length", "distance", "normalize", "dot", "cross", "lerp", "clamp", "min",
+    "max", "abs", "floor", "ceil", "sin", "cos", "tan", "pow", "sqrt", "exp", "log", "radians",
+    "degrees", "set", "sprintf", "printf", "append", "push", "pop", "len", "resize", "getbbox",
+    "relbbox", "volumesample", "ident", "rotate", "scale", "translate", "qrotate", "quaternion"
+)
+
+PYTHON_TOKEN_RE = re.compile(
+    r"(?P<comment>#.*)"
+    r"|(?P<open>(?:[rRbBuUfF]{1,2})?(?:\"\"\"|'''))"
+    r"|(?P<string>(?:[rRbBuUfF]{1,2})?(?:\"(?:[^\"\\]|\\.)*\"?|'(?:[^'\\]|\\.)*'?))"
+    r"|(?P<decorator>^\s*@[\w.]+)"
+    r"|(?P<number>\b\d[\d_]*(?:\.\d*)?(?:[eE][+-]?\d+)?j?\b)"
+    r"|(?P<word>[A-Za-z_]\w*)"
+)
+VEX_TOKEN_RE = re.compile(
+    r"(?P<comment>//.*)"
+    r"|(?P<open>/\*)"
+    r"|(?P<string>\"(?:[^\"\\]|\\.)*\"?)"
+    r"|(?P<attribute>(?:\b[a-z0-9]{1,2}(?:\[\])?)?@[A-Za-z_]\w*)"
+    r"|(?P<decorator>^\s*#\s*\w+)"
+    r"|(?P<number>\b\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b)"
+    r"|(?P<word>[A-Za-z_]\w*)"
+)
+# Block states carried between lines: unterminated triple-quoted strings and /* comments
+HIGHLIGHT_CLOSERS = {1: '"""', 2: "'''", 3: "*/"}
+
+def syntax_format(color, bold=False):
+    fmt = QtGui.QTextCharFormat()
+    fmt.setForeground(QtGui.QColor(color))
+    if bold:
+        fmt.setFontWeight(QtGui.QFont.Bold)
+    return fmt
+
+_SYNTAX_TABLES = {}
+
+def get_syntax_tables():
+    # Formats and word lookups are shared by every code block, so they are built once
+    if not _SYNTAX_TABLES:
+        formats = {
+            "keyword": syntax_format("#666666", bold=True),
+            "string": syntax_format("#444444"),
+            "comment": syntax_format("#999999"),
+            "number": syntax_format("#b5cea8"),
+            "builtin": syntax_format("#dcdcaa"),
+            "type": syntax_format("#4ec9b0"),
+            "attribute": syntax_format("#9cdcfe"),
+            "decorator": syntax_format("#c586c0"),
+        }
+        words = lambda *groups: {word: formats[kind] for kind, names in groups for word in names}
+        _SYNTAX_TABLES["formats"] = formats
+        _SYNTAX_TABLES["python"] = words(("builtin", PYTHON_BUILTINS), ("keyword", PYTHON_KEYWORDS))
+        _SYNTAX_TABLES["vex"] = words(("builtin", VEX_BUILTINS), ("type", VEX_TYPES), ("keyword", VEX_KEYWORDS))
+    return _SYNTAX_TABLES
+
+class CodeHighlighter(QtGui.QSyntaxHighlighter):
+    def __init__(self, document, language="python"):
+        super().__init__(document)
+        self.formats = get_syntax_tables()["formats"]
+        self.set_language(language)
+
+    def set_language(self, language):
+        self.language = "vex" if (language or "").lower() in VEX_LANGUAGES else "python"
+        self.token_re = VEX_TOKEN_RE if self.language == "vex" else PYTHON_TOKEN_RE
+        self.words = get_syntax_tables()[self.language]
+
+    def highlightBlock(self, text):
+        formats = self.formats
+        pos = 0
+        state = self.previousBlockState()
+        if state in HIGHLIGHT_CLOSERS:
+            fmt = formats["comment"] if state == 3 else formats["string"]
+            end = text.find(HIGHLIGHT_CLOSERS[state])
+            if end < 0:
+                self.setFormat(0, len(text), fmt)
+                self.setCurrentBlockState(state)
+                return
+            pos = end + len(HIGHLIGHT_CLOSERS[state])
+            self.setFormat(0, pos, fmt)
+        self.setCurrentBlockState(0)
+        search = self.token_re.search
+        words = self.words
+        while True:
+            match = search(text, pos)
+            if match is None:
+                return
+            kind = match.lastgroup
+            start, pos = match.span()
+            if kind == "word":
+                fmt = words.get(match.group())
+                if fmt is not None:
+                    self.setFormat(start, pos - start, fmt)
+            elif kind == "open":
+                state = 3 if self.language == "vex" else (1 if match.group().endswith('"') else 2)
+                fmt = formats["comment"] if state == 3 else formats["string"]
+                end = text.find(HIGHLIGHT_CLOSERS[state], pos)
+                if end < 0:
+                    self.setFormat(start, len(text) - start, fmt)
+                    self.setCurrentBlockState(state)
+                    return
+                pos = end + len(HIGHLIGHT_CLOSERS[state])
+                self.setFormat(start, pos - start, fmt)
+            else:
+                self.setFormat(start, pos - start, formats[kind])
+
+def benchmark_highlighter(line_count=5000):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    python_sample = (
+        "@staticmethod\ndef build(count=10):\n    \"\"\"Scatter points\n    and copy spheres.\"\"\"\n"
+        "    geo = hou.node('/obj').createNode('geo')  # container\n"
+        "    for i in range(count):\n        print(\"point %d\" % i, 1.5e3)\n    return geo\n"
+    )
+    vex_sample = (
+        "/* push points\n   along normals */\nvector n = normalize(v@N);\n"
+        "float amp = chf(\"amp\") * fit01(rand(@ptnum), 0.5, 1.0);\n"
+        "@P += n * amp; // offset\nif (@ptnum % 2 == 0) { i@group_even = 1; }\n"
+    )
+
+    class LegacyHighlighter(QtGui.QSyntaxHighlighter):
+        # The previous highlighter: one QRegExp per keyword, copied and run on every block
+        def __init__(self, document):
+            super().__init__(document)
+            keyword_format = syntax_format("#666666", bold=True)
+            self.highlighting_rules = [(QtCore.QRegExp(r"\b" + keyword + r"\b"), keyword_format) for keyword in PYTHON_KEYWORDS[:25]]
+            self.highlighting_rules.extend([
+                (QtCore.QRegExp(r"\".*\""), syntax_format("#444444")),
+                (QtCore.QRegExp(r"\'.*\'"), syntax_format("#444444")),
+                (QtCore.QRegExp(r"#.*"), syntax_format("#999999")),
+            ])
+
+        def highlightBlock(self, text):
+            for pattern, fmt in self.highlighting_rules:
+                expression = QtCore.QRegExp(pattern)
+                index = expression.indexIn(text)
+                while index >= 0:
+                    length = expression.matchedLength()
+                    self.setFormat(index, length, fmt)
+                    index = expression.indexIn(text, index + length)
+
+    def measure(make_highlighter, sample, edits=50):
+        lines = sample.splitlines()
+        document = QtGui.QTextDocument()
+        document.setPlainText("\n".join((lines * (line_count // len(lines) + 1))[:line_count]))
+        highlighter = make_highlighter(document)
+        start = time.perf_counter()
+        highlighter.rehighlight()
+        full_ms = (time.perf_counter() - start) * 1000.0
+        cursor = QtGui.QTextCursor(document.findBlockByNumber(line_count // 2))
+        start = time.perf_counter()
+        for _ in range(edits):
+            cursor.insertText("x")
+        edit_ms = (time.perf_counter() - start) * 1000.0 / edits
+        return {"full_ms": full_ms, "edit_ms": edit_ms}
+
+    results = {
+        "legacy_python": measure(LegacyHighlighter, python_sample),
+        "python": measure(lambda document: CodeHighlighter(document, "python"), python_sample),
+        "vex": measure(lambda document: CodeHighlighter(document, "vex"), vex_sample),
+    }
+    for name, r in results.items():
+        print(f"{name:<14} {line_count} lines: {r['full_ms']:.1f} ms full, {r['edit_ms']:.2f} ms per keystroke")
+    return results
+
+TRANSCRIPT_BUBBLE_WIDTH = 700
+TRANSCRIPT_DOCUMENT_CACHE = 200
+TRANSCRIPT_ROW_MARGIN = 10
+TRANSCRIPT_ROW_SPACING = 5
+TRANSCRIPT_PADDING = 12
+CODE_BLOCK_MAX_LINES = 20
+CODE_BLOCK_CHROME = 90
+CODE_EDITOR_POOL = 12
+
+class TranscriptModel(QtCore.QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+        self.next_key = 0
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if index.isValid() and role == QtCore.Qt.DisplayRole:
+            return self.items[index.row()]["text"]
+        return None
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled
+
+    def assign_key(self, item):
+        item["key"] = self.next_key
+        self.next_key += 1
+        return item
+
+    def append_item(self, item, before=None):
+        row = len(self.items) if before is None else self.row_of(before)
+        row = len(self.items) if row < 0 else row
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.items.insert(row, self.assign_key(item))
+        self.endInsertRows()
+        return item
+
+    def set_items(self, items):
+        self.beginResetModel()
+        self.items = [self.assign_key(item) for item in items]
+        self.endResetModel()
+
+    def row_of(self, item):
+        # Updates almost always touch the newest rows, so search from the end
+        for row in range(len(self.items) - 1, -1, -1):
+            if self.items[row] is item:
+                return row
+        return -1
+
+    def remove_item(self, item):
+        row = self.row_of(item)
+        if row >= 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            self.items.pop(row)
+            self.endRemoveRows()
+
+class CodeBlockWidget(QtWidgets.QWidget):
+    def __init__(self, delegate, parent=None):
+        super().__init__(parent)
+        self.delegate = delegate
+        self.item = None
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(TRANSCRIPT_ROW_MARGIN, TRANSCRIPT_ROW_SPACING, TRANSCRIPT_ROW_MARGIN, TRANSCRIPT_ROW_SPACING)
+        layout.setSpacing(4)
+        self.code_edit = QtWidgets.QPlainTextEdit()
+        self.code_edit.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse | QtCore.Qt.TextSelectableByKeyboard)
+        self.code_edit.setObjectName("codeBlock")
+        self.code_edit.setProperty("class", "codeBlock")
+        self.highlighter = CodeHighlighter(self.code_edit.document())
+        self.code_edit.textChanged.connect(self.store_text)
+        layout.addWidget(self.code_edit, 1)
+
+        buttons_container = QtWidgets.QWidget()
+        buttons_container.setFixedHeight(30)
+        buttons_layout = QtWidgets.QHBoxLayout(buttons_container)
+        buttons_layout.setContentsMargins(0,0,0,0)
+        buttons_layout.setSpacing(10)
+        self.run_button = QtWidgets.QPushButton()
+        self.run_button.setIcon(get_cached_icon(SVG_RUN, 24))
+        self.run_button.setToolTip("Execute Code")
+        self.run_button.setIconSize(QtCore.QSize(24,24))
+        self.run_button.clicked.connect(lambda: self.delegate.panel.execute_code(self.code_edit, item=self.item))
+        buttons_layout.addWidget(self.run_button)
+        self.profile_button = QtWidgets.QPushButton("Profile")
+        self.profile_button.setToolTip("Run with profiler")
+        self.profile_button.clicked.connect(lambda: self.delegate.panel.execute_code(self.code_edit, profile=True, item=self.item))
+        buttons_layout.addWidget(self.profile_button)
+        self.selection_button = QtWidgets.QPushButton("Selected")
+        self.selection_button.setToolTip("Apply to every selected node in one undo step")
+        self.selection_button.clicked.connect(lambda: self.delegate.panel.execute_on_selection(self.code_edit, item=self.item))
+        buttons_layout.addWidget(self.selection_button)
+        self.copy_button = QtWidgets.QPushButton("Copy")
+        self.copy_button.setIcon(get_cached_icon(SVG_COPY, 16))
+        self.copy_button.setToolTip("Copy Code")
+        self.copy_button.clicked.connect(lambda: self.delegate.panel.copy_code(self.code_edit, self.copy_button))
+        buttons_layout.addWidget(self.copy_button)
+        self.edit_button = QtWidgets.QPushButton("Edit")
+        self.edit_button.setIcon(get_cached_icon(SVG_EDIT, 16))
+        self.edit_button.setToolTip("Toggle Editable Code")
+        self.edit_button.clicked.connect(self.toggle_edit)
+        buttons_layout.addWidget(self.edit_button)
+        buttons_layout.addStretch()
+        layout.addWidget(buttons_container)
+
+    def set_item(self, item):
+        # A block can be run as soon as its closing fence arrives, but not while it is still streaming
+        for button in (self.run_button, self.profile_button, self.selection_button):
+            button.setEnabled(not item.get("streaming", False))
+        if item is self.item:
+            shown = self.code_edit.toPlainText()
+            if shown == item["text"]:
+                return
+            if item["text"].startswith(shown):
+                # Streaming code only grows, so append instead of re-highlighting the whole block
+                cursor = QtGui.QTextCursor(self.code_edit.document())
+                cursor.movePosition(QtGui.QTextCursor.End)
+                cursor.insertText(item["text"][len(shown):])
+                return
+        self.item = None
+        self.highlighter.set_language(item.get("language"))
+        self.profile_button.setVisible(item.get("language") not in VEX_LANGUAGES)
+        self.code_edit.setPlainText(item["text"])
+        self.code_edit.setReadOnly(item.get("read_only", False))
+        self.edit_button.setText(item.get("edit_label", "Edit"))
+        self.copy_button.setText("Copy")
+        self.item = item
+
+    def store_text(self):
+        if self.item is None:
+            return
+        previous_lines = self.item["text"].count("\n")
+        self.item["text"] = self.code_edit.toPlainText()
+        if self.item["text"].count("\n") != previous_lines:
+            self.delegate.item_resized(self.item)
+
+    def toggle_edit(self):
+        self.delegate.panel.toggle_edit_code(self.code_edit, self.edit_button)
+        if self.item is not None:
+            self.item["read_only"] = self.code_edit.isReadOnly()
+            self.item["edit_label"] = self.edit_button.text()
+
+class TranscriptDelegate(QtWidgets.QStyledItemDelegate):
+    def __init__(self, view, panel=None):
+        super().__init__(view)
+        self.view = view
+        self.panel = panel
+        self.documents = OrderedDict()
+        self.editor_pool = []
+        self.text_font = QtGui.QFont(view.font())
+        self.text_font.setPixelSize(13)
+        self.code_font = QtGui.QFont("Consolas")
+        self.code_font.setStyleHint(QtGui.QFont.Monospace)
+        self.code_font.setPixelSize(13)
+        self.stats_font = QtGui.QFont(self.text_font)
+        self.stats_font.setPixelSize(11)
+        self.text_metrics = QtGui.QFontMetrics(self.text_font)
+        self.code_line_height = QtGui.QFontMetrics(self.code_font).lineSpacing()
+        # Heights measured while painting are applied in one relayout instead of one per row
+        self.relayout_timer = QtCore.QTimer(self)
+        self.relayout_timer.setSingleShot(True)
+        self.relayout_timer.setInterval(50)
+        self.relayout_timer.timeout.connect(lambda: self.sizeHintChanged.emit(QtCore.QModelIndex()))
+
+    def text_width(self):
+        width = min(self.view.viewport().width() - 2 * TRANSCRIPT_ROW_MARGIN, TRANSCRIPT_BUBBLE_WIDTH)
+        return max(width - 2 * TRANSCRIPT_PADDING, 50)
+
+    def build_document(self, item):
+        document = QtGui.QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self.text_font)
+        if item["kind"] == "assistant":
+            renderer = StreamingRenderer(document)
+            renderer.append(item["text"])
+            renderer.finish()
+        elif item["kind"] == "user":
+            text = html.escape(item["text"]).replace("\n", "<br>")
+            document.setHtml(f"{text}&nbsp;&nbsp;&nbsp;<span style='font-size:11px; color:#666666;'>{item.get('timestamp', '')}</span>")
+        else:
+            if item["kind"] == "output":
+                document.setDefaultFont(self.code_font)
+            elif item["kind"] == "stats":
+                document.setDefaultFont(self.stats_font)
+            document.setPlainText(item["text"])
+        return document
+
+    def document_for(self, item, width):
+        document = item.get("document")
+        if document is None:
+            document = self.documents.get(item["key"])
+            if document is None:
+                document = self.documents[item["key"]] = self.build_document(item)
+                if len(self.documents) > TRANSCRIPT_DOCUMENT_CACHE:
+                    self.documents.popitem(last=False)
+            else:
+                self.documents.move_to_end(item["key"])
+        if document.textWidth() != width:
+            document.setTextWidth(width)
+        return document
+
+    def cache_document(self, item, document):
+        self.documents[item["key"]] = document
+        if len(self.documents) > TRANSCRIPT_DOCUMENT_CACHE:
+            self.documents.popitem(last=False)
+
+    def forget(self, item):
+        self.documents.pop(item.get("key"), None)
+        item["height"] = None
+
+    def estimate_height(self, item, width):
+        # Off-screen rows get a cheap guess; paint() replaces it with the measured height
+        chars_per_line = max(width // max(self.text_metrics.averageCharWidth(), 1), 1)
+        lines = sum(len(line) // chars_per_line + 1 for line in item["text"].split("\n"))
+        return lines * self.text_metrics.lineSpacing() + 2 * (TRANSCRIPT_PADDING + TRANSCRIPT_ROW_SPACING)
+
+    def measured_height(self, document):
+        return int(document.size().height()) + 1 + 2 * (TRANSCRIPT_PADDING + TRANSCRIPT_ROW_SPACING)
+
+    def code_height(self, item):
+        lines = min(item["text"].count("\n") + 1, CODE_BLOCK_MAX_LINES)
+        return lines * self.code_line_height + CODE_BLOCK_CHROME
+
+    def sizeHint(self, option, index):
+        item = index.model().items[index.row()]
+        width = self.text_width()
+        if item["kind"] == "code":
+            return QtCore.QSize(width, self.code_height(item))
+        if item.get("document") is not None:
+            item["height"] = self.measured_height(self.document_for(item, width))
+        elif item.get("height") is None or item.get("width") != width:
+            item["height"] = self.estimate_height(item, width)
+        item["width"] = width
+        return QtCore.QSize(width, item["height"])
+
+    def paint(self, painter, option, index):
+        item = index.model().items[index.row()]
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtGui.QColor("#404040"))
+        if item["kind"] == "code":
+            # Placeholder until the recycled editor is attached to this row
+            rect = option.rect.adjusted(TRANSCRIPT_ROW_MARGIN, TRANSCRIPT_ROW_SPACING, -TRANSCRIPT_ROW_MARGIN, -TRANSCRIPT_ROW_SPACING - 34)
+            painter.setBrush(QtGui.QColor("#1e1e1e"))
+            painter.drawRoundedRect(QtCore.QRectF(rect), 8, 8)
+            painter.setFont(self.code_font)
+            painter.setPen(QtGui.QColor("#c8c8c8"))
+            painter.drawText(QtCore.QRectF(rect.adjusted(16, 16, -16, -16)), item["text"])
+            painter.restore()
+            return
+        width = self.text_width()
+        document = self.document_for(item, width)
+        height = self.measured_height(document)
+        if height != item.get("height"):
+            item["height"] = height
+            if not self.relayout_timer.isActive():
+                self.relayout_timer.start()
+        bubble_width = width if item["kind"] == "assistant" else min(int(document.idealWidth()) + 1, width)
+        bubble = QtCore.QRect(0, 0, bubble_width + 2 * TRANSCRIPT_PADDING, int(document.size().height()) + 1 + 2 * TRANSCRIPT_PADDING)
+        if item["kind"] == "user":
+            bubble.moveTopRight(QtCore.QPoint(option.rect.right() - TRANSCRIPT_ROW_MARGIN, option.rect.top() + TRANSCRIPT_ROW_SPACING))
+        elif item["kind"] == "info":
+            bubble.moveTopLeft(QtCore.QPoint(option.rect.left() + (option.rect.width() - bubble.width()) // 2, option.rect.top() + TRANSCRIPT_ROW_SPACING))
+        else:
+            bubble.moveTopLeft(QtCore.QPoint(option.rect.left() + TRANSCRIPT_ROW_MARGIN, option.rect.top() + TRANSCRIPT_ROW_SPACING))
+        # Stats are a plain caption under the reply rather than a bubble of their own
+        if item["kind"] != "stats":
+            painter.setBrush(QtGui.QColor("#2d2d2d"))
+            radius = 4 if item["kind"] == "info" else 8
+            painter.drawRoundedRect(QtCore.QRectF(bubble).adjusted(0.5, 0.5, -0.5, -0.5), radius, radius)
+        painter.translate(bubble.left() + TRANSCRIPT_PADDING, bubble.top() + TRANSCRIPT_PADDING)
+        context = QtGui.QAbstractTextDocumentLayout.PaintContext()
+        text_color = "#e0e0e0"
+        if item["kind"] == "output":
+            text_color = "#f48771" if item.get("error") else "#9cdcfe"
+        elif item["kind"] == "stats":
+            text_color = "#808080"
+        context.palette.setColor(QtGui.QPalette.Text, QtGui.QColor(text_color))
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+    def createEditor(self, parent, option, index):
+        editor = self.editor_pool.pop() if self.editor_pool else CodeBlockWidget(self)
+        editor.setParent(parent)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.set_item(index.model().items[index.row()])
+
+    def setModelData(self, editor, model, index):
+        pass
+
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(option.rect)
+
+    def destroyEditor(self, editor, index):
+        # Editors scrolled out of view are parked and reused for the next visible code rows
+        editor.item = None
+        editor.hide()
+        if len(self.editor_pool) < CODE_EDITOR_POOL:
+            self.editor_pool.append(editor)
+        else:
+            editor.deleteLater()
+
+    def item_resized(self, item):
+        row = self.view.transcript_model.row_of(item)
+        if row >= 0:
+            self.sizeHintChanged.emit(self.view.transcript_model.index(row))
+
+class TranscriptView(QtWidgets.QListView):
+    def __init__(self, panel=None, parent=None):
+        super().__init__(parent)
+        self.setObjectName("transcript")
+        self.transcript_model = TranscriptModel(self)
+        self.setModel(self.transcript_model)
+        self.delegate = TranscriptDelegate(self, panel)
+        self.setItemDelegate(self.delegate)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(20)
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+        self.open_editors = {}
+        self.editor_timer = QtCore.QTimer(self)
+        self.editor_timer.setSingleShot(True)
+        self.editor_timer.setInterval(0)
+        self.editor_timer.timeout.connect(self.update_visible_editors)
+        self.verticalScrollBar().valueChanged.connect(self.editor_timer.start)
+        self.verticalScrollBar().rangeChanged.connect(self.editor_timer.start)
+        self.transcript_model.rowsInserted.connect(self.editor_timer.start)
+        self.transcript_model.rowsRemoved.connect(self.editor_timer.start)
+        self.transcript_model.modelReset.connect(self.editor_timer.start)
+
+    def add_item(self, kind, text="", before=None, **fields):
+        item = self.transcript_model.append_item(dict(fields, kind=kind, text=text), before)
+        self.scroll_to_bottom()
+        return item
+
+    def add_item_after(self, anchor, kind, text="", **fields):
+        # Placed right under its anchor without jumping to the bottom, e.g. run output for an older code block
+        items = self.transcript_model.items
+        row = self.transcript_model.row_of(anchor)
+        before = items[row + 1] if 0 <= row < len(items) - 1 else None
+        if before is None:
+            return self.add_item(kind, text, **fields)
+        return self.transcript_model.append_item(dict(fields, kind=kind, text=text), before)
+
+    def update_item(self, item):
+        row = self.transcript_model.row_of(item)
+        if row < 0:
+            return
+        if item.get("document") is None:
+            self.delegate.forget(item)
+        index = self.transcript_model.index(row)
+        self.transcript_model.dataChanged.emit(index, index)
+        self.delegate.sizeHintChanged.emit(index)
+
+    def remove_item(self, item):
+        self.transcript_model.remove_item(item)
+
+    def start_streaming(self, item):
+        item["document"] = QtGui.QTextDocument()
+        item["document"].setDocumentMargin(0)
+        item["document"].setDefaultFont(self.delegate.text_font)
+        item["renderer"] = StreamingRenderer(item["document"])
+        item["chunks"] = []
+
+    def stream_append(self, item, delta):
+        item["chunks"].append(delta)
+        item["renderer"].append(delta)
+
+    def finish_streaming(self, item):
+        item["renderer"].finish()
+        item["text"] = "".join(item.pop("chunks"))
+        del item["renderer"]
+        self.delegate.cache_document(item, item.pop("document"))
+        self.update_item(item)
+
+    def clear(self):
+        self.transcript_model.set_items([])
+        self.delegate.documents.clear()
+
+    def show_entries(self, entries):
+        items = []
+        for seq, entry in enumerate(entries):
+            role = entry.get("role")
+            if role == "user":
+                items.append({"kind": "user", "text": entry.get("message") or "", "seq": seq})
+            elif role == "assistant":
+                if entry.get("answered_by"):
+                    items.append({"kind": "info", "text": entry["answered_by"], "seq": seq})
+                items.append({"kind": "assistant", "text": entry.get("message") or "", "seq": seq})
+                blocks = entry.get("blocks")
+                if not blocks and entry.get("code"):
+                    blocks = [{"code": entry["code"], "language": "vex" if entry.get("is_vex") else "python"}]
+                runs = {run.get("block"): run for run in entry.get("runs", [])}
+                for block_index, block in enumerate(blocks or []):
+                    items.append({"kind": "code", "text": block["code"], "language": block.get("language") or "python", "seq": seq, "block": block_index})
+                    if block_index in runs:
+                        items.append({"kind": "output", "text": format_run_result(runs[block_index]), "error": not runs[block_index]["ok"], "seq": seq})
+                        items[-2]["output_item"] = items[-1]
+                if entry.get("stats") and (self.delegate.panel is None or self.delegate.panel.options["show_reply_stats"]):
+                    items.append({"kind": "stats", "text": format_stats_line(entry["stats"]), "seq": seq})
+        self.delegate.documents.clear()
+        self.transcript_model.set_items(items)
+
+    def scroll_to_bottom(self):
+        QtCore.QTimer.singleShot(0, self.scrollToBottom)
+
+    def scroll_to_seq(self, seq):
+        for row, item in enumerate(self.transcript_model.items):
+            if item.get("seq") == seq:
+                index = self.transcript_model.index(row)
+                self.scrollTo(index, QtWidgets.QAbstractItemView.PositionAtTop)
+                # Rows above were laid out with estimated heights, so settle once they are measured
+                QtCore.QTimer.singleShot(150, lambda: self.scrollTo(index, QtWidgets.QAbstractItemView.PositionAtTop))
+                return
+
+    def update_visible_editors(self):
+        items = self.transcript_model.items
+        wanted = {}
+        if items:
+            first = self.indexAt(QtCore.QPoint(1, 0)).row()
+            if first < 0:
+                # Not laid out yet; the scroll range change after layout runs this again
+                return
+            last = self.indexAt(QtCore.QPoint(1, self.viewport().height() - 1)).row()
+            last = last if last >= 0 else len(items) - 1
+            for row in range(max(first - 2, 0), min(last + 2, len(items) - 1) + 1):
+                if items[row]["kind"] == "code":
+                    wanted[items[row]["key"]] = row
+        for key, persistent in list(self.open_editors.items()):
+            if key not in wanted:
+                del self.open_editors[key]
+                if persistent.isValid():
+                    self.closePersistentEditor(self.transcript_model.index(persistent.row()))
+        for key, row in wanted.items():
+            index = self.transcript_model.index(row)
+            if key not in self.open_editors or not self.isPersistentEditorOpen(index):
+                self.openPersistentEditor(index)
+                self.open_editors[key] = QtCore.QPersistentModelIndex(index)
+
+    def show_context_menu(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return
+        menu = QtWidgets.QMenu()
+        copy_action = menu.addAction("Copy Message")
+        code_items = self.reply_code_items(index.row())
+        run_all_action = menu.addAction(f"Run All {len(code_items)} Code Blocks") if len(code_items) > 1 else None
+        chosen = menu.exec_(self.viewport().mapToGlobal(pos))
+        if chosen == copy_action:
+            QtWidgets.QApplication.clipboard().setText(self.transcript_model.items[index.row()]["text"])
+        elif chosen is not None and chosen == run_all_action:
+            self.delegate.panel.execute_reply_blocks(code_items)
+
+    def reply_code_items(self, row):
+        # A reply is its assistant row plus the code and output rows that follow it
+        items = self.transcript_model.items
+        while row > 0 and items[row]["kind"] not in ("user", "assistant"):
+            row -= 1
+        if items[row]["kind"] != "assistant":
+            return []
+        code_items = []
+        for item in items[row + 1:]:
+            if item["kind"] in ("user", "assistant"):
+                break
+            if item["kind"] == "code":
+                code_items.append(item)
+        return code_items
+
+def current_rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1048576.0
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576.0
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def benchmark_transcript_load(message_count=5000, width=800, height=900, legacy=True):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    entries = []
+    for seq in range(message_count):
+        if seq % 2 == 0:
+            entries.append({"role": "user", "message": f"Question {seq}: how do I scatter points on a grid and copy spheres to them?"})
+        elif seq % 4 == 1:
+            entries.append({"role": "assistant", "message": "Create a grid, scatter onto it and copy spheres:\n```python\nimport hou\ngeo = hou.node('/obj').createNode('geo')\ngrid = geo.createNode('grid')\n```\nAdjust **npts** to taste.",
+                            "blocks": [{"language": "python", "code": "import hou\ngeo = hou.node('/obj').createNode('geo')\ngrid = geo.createNode('grid')"}]})
+        else:
+            entries.append({"role": "assistant", "message": "## Notes\n- Use a `scatter` SOP.\n- Then a *copytopoints* SOP.\n" * 3})
+
+    def measure(build):
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        widget = build()
+        widget.resize(width, height)
+        widget.show()
+        app.processEvents()
+        load_ms = (time.perf_counter() - start) * 1000.0
+        scroll_bar = widget.verticalScrollBar()
+        start = time.perf_counter()
+        for step in range(1, 21):
+            scroll_bar.setValue(scroll_bar.maximum() * step // 20)
+            app.processEvents()
+        scroll_ms = (time.perf_counter() - start) * 1000.0 / 20
+        rss_after = current_rss_mb()
+        widget.close()
+        widget.deleteLater()
+        app.processEvents()
+        rss_mb = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        return {"load_ms": load_ms, "scroll_frame_ms": scroll_ms, "rss_mb": rss_mb}
+
+    def build_view():
+        view = TranscriptView()
+        view.show_entries(entries)
+        return view
+
+    def build_widgets():
+        # The previous layout: one widget per message inside a scroll area
+        area = QtWidgets.QScrollArea()
+        area.setWidgetResizable(True)
+        container = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(container)
+        for entry in entries:
+            label = QtWidgets.QLabel(entry["message"])
+            label.setWordWrap(True)
+            layout.addWidget(label)
+            for block in entry.get("blocks", []):
+                layout.addWidget(QtWidgets.QPlainTextEdit(block["code"]))
+        area.setWidget(container)
+        return area
+
+    results = {"messages": message_count, "transcript": measure(build_view)}
+    if legacy:
+        results["widgets"] = measure(build_widgets)
+    for name in ("transcript", "widgets"):
+        if name in results:
+            r = results[name]
+            rss = f"{r['rss_mb']:.1f} MB" if r["rss_mb"] is not None else "n/a"
+            print(f"{name:<10} load {r['load_ms']:.0f} ms, scroll {r['scroll_frame_ms']:.1f} ms/frame, RSS +{rss}")
+    return results
+
+def conversation_title(entries):
+    for entry in entries:
+        if entry.get("role") == "user":
+            first_msg = entry.get("message") or ""
+            return (first_msg[:20] + "...") if first_msg else "New Chat"
+    return "New Chat"
+
+SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SEARCH_RANK_WINDOW = 1000
+# Bumped whenever the FTS5 table definition changes, so older databases are reindexed once
+SEARCH_INDEX_VERSION = "2"
+
+def searchable_text(entry):
+    code = "\n".join(block.get("code", "") for block in entry.get("blocks", [])) or entry.get("code", "")
+    return entry.get("message", "") or "", code or ""
+
+class MessageSearchIndex:
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+
+    def add(self, key, entry):
+        if key in self.documents:
+            self.remove(key)
+        text, code = searchable_text(entry)
+        self.documents[key] = (entry.get("role", ""), text + ("\n" + code if code else ""))
+        for token in SEARCH_TOKEN_RE.findall(self.documents[key][1].lower()):
+            postings = self.postings.setdefault(token, {})
+            postings[key] = postings.get(key, 0) + 1
+
+    def remove(self, key):
+        for token in set(SEARCH_TOKEN_RE.findall(self.documents.pop(key)[1].lower())):
+            self.postings[token].pop(key, None)
+
+    def remove_conversation(self, conversation_id):
+        for key in [key for key in self.documents if key[0] == conversation_id]:
+            del self.documents[key]
+        for postings in self.postings.values():
+            for key in [key for key in postings if key[0] == conversation_id]:
+                del postings[key]
+
+    def search(self, query, limit=50):
+        terms = SEARCH_TOKEN_RE.findall(query.lower())
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            # Every term is treated as a prefix so results appear while the user is still typing
+            matches = {}
+            for token, postings in self.postings.items():
+                if token.startswith(term):
+                    idf = 1.0 + (len(self.documents) / (1.0 + len(postings)))
+                    for key, count in postings.items():
+                        matches[key] = matches.get(key, 0.0) + count * idf
+            if scores is None:
+                scores = matches
+            else:
+                scores = {key: scores[key] + value for key, value in matches.items() if key in scores}
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [
+            {"conversation_id": key[0], "seq": key[1], "role": self.documents[key][0],
+             "snippet": highlight_snippet(self.documents[key][1], terms), "score": score}
+            for key, score in ranked
+        ]
+
+def highlight_snippet(text, terms, width=60):
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in terms if lowered.find(term) >= 0]
+    start = max(min(positions) - width // 2, 0) if positions else 0
+    snippet = text[start:start + width * 2].replace("\n", " ")
+    snippet = html.escape(snippet)
+    for term in sorted(set(terms), key=len, reverse=True):
+        snippet = re.sub(r"(?i)\b(" + re.escape(html.escape(term)) + r"\w*)", r"<b>\1</b>", snippet)
+    return ("..." if start else "") + snippet + ("..." if start + width * 2 < len(text) else "")
+
+class SessionHistoryStore:
+    # The in-memory index always ranks every match
+    search_truncated = False
+
+    def __init__(self):
+        if not hasattr(hou.session, "ai_chat_history"):
+            hou.session.ai_chat_history = []
+        self.conversations = hou.session.ai_chat_history
+        self.search_index = MessageSearchIndex()
+        for conv in self.conversations:
+            conv.setdefault("id", self._next_id())
+            for seq, entry in enumerate(conv["messages"]):
+                self.search_index.add((conv["id"], seq), entry)
+
+    def _next_id(self):
+        return max([conv.get("id", 0) for conv in self.conversations] + [0]) + 1
+
+    def _find(self, conversation_id):
+        for conv in self.conversations:
+            if conv["id"] == conversation_id:
+                return conv
+        return None
+
+    def list_conversations(self, offset=0, limit=None):
+        # Conversations from older sessions have no timestamp; their list order stands in for it
+        ordered = sorted(enumerate(self.conversations), key=lambda pair: (pair[1].get("updated", 0), pair[0]), reverse=True)
+        end = None if limit is None else offset + limit
+        return [{"id": conv["id"], "title": conv["title"]} for _, conv in ordered[offset:end]]
+
+    def load_messages(self, conversation_id):
+        conv = self._find(conversation_id)
+        return list(conv["messages"]) if conv else []
 
-SVG_EDIT = """
-<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
-    <g fill="#ffffff">
-        <path d="M3 17.25V21h3.75L17.81 9.94l-3.75-3.75L3 17.25zM20.71 7.04c.39-.39.39-1.02 0-1.41l-2.34-2.34c-.39-.39-1.02-.39-1.41 0l-1.83 1.83 3.75 3.75 1.83-1.83z"/>
-        <text x="12" y="23" font-family="Arial" font-size="4" text-anchor="middle">Edit</text>
-    </g>
-</svg>
-"""
+    def create_conversation(self, title):
+        conversation_id = self._next_id()
+        self.conversations.append({"id": conversation_id, "title": title, "messages": [], "updated": time.time()})
+        return conversation_id
 
-def create_svg_icon(svg_data, size):
-    svg_bytes = svg_data.encode('utf-8')
-    renderer = QtSvg.QSvgRenderer(QtCore.QByteArray(svg_bytes))
-    pixmap = QtGui.QPixmap(size, size)
-    pixmap.fill(QtCore.Qt.transparent)
-    painter = QtGui.QPainter(pixmap)
-    renderer.render(painter)
-    painter.end()
-    return QtGui.QIcon(pixmap)
+    def append_message(self, conversation_id, entry):
+        conv = self._find(conversation_id)
+        if conv is not None:
+            conv["messages"].append(entry)
+            conv["updated"] = time.time()
+            self.search_index.add((conversation_id, len(conv["messages"]) - 1), entry)
 
-class WorkerSignals(QtCore.QObject):
-    finished = QtCore.Signal(str, bool, str)
-    error = QtCore.Signal(str)
-    partial = QtCore.Signal(str)
+    def update_message(self, conversation_id, seq, entry):
+        conv = self._find(conversation_id)
+        if conv is not None and 0 <= seq < len(conv["messages"]):
+            conv["messages"][seq] = entry
+            self.search_index.add((conversation_id, seq), entry)
 
-class AIWorker(QtCore.QRunnable):
-    def __init__(self, user_message, api_url, model_name):
-        super().__init__()
-        self.signals = WorkerSignals()
-        self.user_message = user_message
-        self.api_url = api_url
-        self.model_name = model_name
-        self._cancelled = False
+    def delete_conversation(self, conversation_id):
+        conv = self._find(conversation_id)
+        if conv is not None:
+            self.conversations.remove(conv)
+            self.search_index.remove_conversation(conversation_id)
 
-    def cancel(self):
-        self._cancelled = True
+    def search(self, query, limit=50):
+        titles = {conv["id"]: conv["title"] for conv in self.conversations}
+        results = self.search_index.search(query, limit)
+        for result in results:
+            result["title"] = titles.get(result["conversation_id"], "")
+        return results
 
-    def run(self):
+    def close(self):
+        pass
+
+class SQLiteHistoryStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS conversations_by_updated ON conversations(updated DESC, id DESC);
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            conversation_id INTEGER NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            body TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages(conversation_id, seq);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, db_path, legacy_json_path=None, legacy_conversations=None):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(self.SCHEMA)
+        self.fallback_index = None
+        self.search_truncated = False
         try:
-            houdini_context = (
-                "You are a Houdini automation assistant chat bot. "
-                "If the user request is related to Houdini, Python, or VEX, provide the complete and precise, correct and executable code accordingly, enclosed within the appropriate code fences.Answer only what is asked, precisely and concisely, without extra details.  "
-                "If the user request is not related to Houdini (for example, casual greetings or general questions), respond conversationally without any code, but still provide a helpful answer."
-            )
-            full_prompt = houdini_context + "\nUser request:\n" + self.user_message
-            data = {
-                "model": self.model_name,
-                "prompt": full_prompt,
-                "stream": True
-            }
-            with requests.post(self.api_url, json=data, stream=True) as r:
-                if r.status_code != 200:
-                    error_msg = f"Bad response: {r.status_code}"
-                    try:
-                        error_msg += f" - {r.json()}"
-                    except:
-                        error_msg += f" - {r.text}"
-                    raise Exception(error_msg)
-    
-                partial_text = ""
-                for line in r.iter_lines(decode_unicode=True):
-                    if self._cancelled:
-                        self.signals.error.emit("Request cancelled by user.")
-                        return
-                    if line:
-                        try:
-                            chunk = json.loads(line)
-                            token = chunk.get('response', '')
-                            partial_text += token
-                            self.signals.partial.emit(partial_text)
-                        except:
-                            pass
-    
-            if not partial_text.strip():
-                raise Exception("Empty response from API")
-    
-            code_match = re.search(r'```python(.*?)```', partial_text, re.DOTALL)
-            if code_match:
-                extracted_code = code_match.group(1).strip()
-            else:
-                vex_match = re.search(r'```vex(.*?)```', partial_text, re.DOTALL)
-                if vex_match:
-                    extracted_code = vex_match.group(1).strip()
-                else:
-                    extracted_code = ""
-    
-            if extracted_code:
-                hou.session.ai_execution_code = extracted_code
-                self.signals.finished.emit(partial_text, True, extracted_code)
-            else:
-                self.signals.finished.emit(partial_text, False, "")
-    
-        except requests.exceptions.Timeout:
-            self.signals.error.emit("Request timed out.")
-        except requests.exceptions.ConnectionError:
-            self.signals.error.emit(f"Failed to connect to {self.api_url}. Check if the server is running.")
-        except Exception as e:
-            error_msg = f"Model request error: {str(e)}\nAPI URL: {self.api_url}\nModel: {self.model_name}"
-            self.signals.error.emit(error_msg)
+            if self.connection.execute("SELECT value FROM meta WHERE key = 'search_indexed'").fetchone() not in (None, (SEARCH_INDEX_VERSION,)):
+                self.connection.execute("DROP TABLE IF EXISTS message_search")
+            # One- and two-letter prefix indexes keep the first keystrokes of a search from scanning every term
+            self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(body, code, tokenize='unicode61', prefix='1 2')")
+        except sqlite3.OperationalError:
+            # SQLite builds without FTS5 fall back to an in-memory index built on first search
+            self.fallback_index = MessageSearchIndex()
+        self.migrate(legacy_json_path, legacy_conversations)
+        self.build_search_index()
+
+    def migrate(self, legacy_json_path, legacy_conversations):
+        if self.connection.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+            return
+        imported = []
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            try:
+                with open(legacy_json_path, 'r') as f:
+                    imported.extend(json.load(f))
+            except (OSError, ValueError):
+                pass
+        imported.extend(legacy_conversations or [])
+        with self.connection:
+            for conv in imported:
+                conversation_id = self._insert_conversation(conv.get("title") or conversation_title(conv.get("messages", [])))
+                for seq, entry in enumerate(conv.get("messages", [])):
+                    # build_search_index indexes every migrated row once the import commits
+                    self._insert_message(conversation_id, seq, entry, index=False)
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('migrated', ?)", (str(len(imported)),))
 
+    def _insert_conversation(self, title):
+        now = time.time()
+        cursor = self.connection.execute("INSERT INTO conversations (title, created, updated) VALUES (?, ?, ?)", (title, now, now))
+        return cursor.lastrowid
 
-class PythonHighlighter(QtGui.QSyntaxHighlighter):
-    def __init__(self, document):
-        super().__init__(document)
-        keyword_format = QtGui.QTextCharFormat()
-        keyword_format.setForeground(QtGui.QColor("#666666"))
-        keyword_format.setFontWeight(QtGui.QFont.Bold)
-        string_format = QtGui.QTextCharFormat()
-        string_format.setForeground(QtGui.QColor("#444444"))
-        comment_format = QtGui.QTextCharFormat()
-        comment_format.setForeground(QtGui.QColor("#999999"))
-        self.highlighting_rules = []
-        keywords = [
-            "def", "class", "import", "from", "as", "if", "elif", "else", "try",
-            "except", "finally", "for", "while", "with", "return", "in", "is", "not",
-            "and", "or", "pass", "break", "continue", "yield", "lambda"
+    def _insert_message(self, conversation_id, seq, entry, index=True):
+        cursor = self.connection.execute(
+            "INSERT INTO messages (conversation_id, seq, role, body, created) VALUES (?, ?, ?, ?, ?)",
+            (conversation_id, seq, entry.get("role", ""), json.dumps(entry), time.time()),
+        )
+        if index:
+            self._index_message(cursor.lastrowid, conversation_id, seq, entry)
+
+    def _index_message(self, message_id, conversation_id, seq, entry):
+        if self.fallback_index is not None:
+            self.fallback_index.add((conversation_id, seq), entry)
+        else:
+            self.connection.execute("INSERT INTO message_search (rowid, body, code) VALUES (?, ?, ?)", (message_id,) + searchable_text(entry))
+
+    def build_search_index(self):
+        if self.fallback_index is None and self.connection.execute("SELECT value FROM meta WHERE key = 'search_indexed'").fetchone() == (SEARCH_INDEX_VERSION,):
+            return
+        with self.connection:
+            if self.fallback_index is None:
+                # Databases left half-indexed by an interrupted build are rebuilt from scratch
+                self.connection.execute("DELETE FROM message_search")
+            rows = self.connection.execute("SELECT id, conversation_id, seq, body FROM messages").fetchall()
+            for message_id, conversation_id, seq, body in rows:
+                self._index_message(message_id, conversation_id, seq, json.loads(body))
+            if self.fallback_index is None:
+                self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_indexed', ?)", (SEARCH_INDEX_VERSION,))
+
+    def search(self, query, limit=50):
+        if self.fallback_index is not None:
+            results = self.fallback_index.search(query, limit)
+            titles = dict(self.connection.execute("SELECT id, title FROM conversations").fetchall())
+            for result in results:
+                result["title"] = titles.get(result["conversation_id"], "")
+            return results
+        terms = SEARCH_TOKEN_RE.findall(query)
+        if not terms:
+            return []
+        # Only the word still being typed is matched as a prefix; prefix scans are the slow part of FTS5
+        match = " ".join('"' + term.replace('"', '') + '"' for term in terms) + "*"
+        # bm25 costs a few microseconds per hit, several hundred ms for a common word in a large history.
+        # Queries with more hits than the window rank only the most recent ones, which the panel tells the user;
+        # walking rowids backwards is cheap for FTS5
+        window = self.connection.execute(
+            "SELECT rowid FROM message_search WHERE message_search MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+            (match, SEARCH_RANK_WINDOW),
+        ).fetchone()
+        self.search_truncated = window is not None
+        rows = self.connection.execute(
+            "SELECT m.conversation_id, m.seq, m.role, c.title, "
+            "snippet(message_search, -1, '\x01', '\x02', '...', 12), bm25(message_search) AS score "
+            "FROM message_search JOIN messages m ON m.id = message_search.rowid "
+            "JOIN conversations c ON c.id = m.conversation_id "
+            "WHERE message_search MATCH ? AND message_search.rowid > ? ORDER BY score LIMIT ?",
+            (match, window[0] if window else 0, limit),
+        ).fetchall()
+        return [
+            {"conversation_id": row[0], "seq": row[1], "role": row[2], "title": row[3],
+             "snippet": html.escape(row[4].replace("\n", " ")).replace("\x01", "<b>").replace("\x02", "</b>"), "score": -row[5]}
+            for row in rows
         ]
-        for keyword in keywords:
-            pattern = QtCore.QRegExp(r"\b" + keyword + r"\b")
-            self.highlighting_rules.append((pattern, keyword_format))
-        self.highlighting_rules.extend([
-            (QtCore.QRegExp(r"\".*\""), string_format),
-            (QtCore.QRegExp(r"\'.*\'"), string_format),
-        ])
-        self.highlighting_rules.append((QtCore.QRegExp(r"#.*"), comment_format))
-        self.code_block_regex = QtCore.QRegExp(r"```python.*?```")
-        self.code_block_regex.setMinimal(True)
 
-    def highlightBlock(self, text):
-        for pattern, fmt in self.highlighting_rules:
-            expression = QtCore.QRegExp(pattern)
-            index = expression.indexIn(text)
-            while index >= 0:
-                length = expression.matchedLength()
-                self.setFormat(index, length, fmt)
-                index = expression.indexIn(text, index + length)
+    def list_conversations(self, offset=0, limit=None):
+        rows = self.connection.execute(
+            "SELECT id, title FROM conversations ORDER BY updated DESC, id DESC LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        return [{"id": row[0], "title": row[1]} for row in rows]
+
+    def load_messages(self, conversation_id):
+        rows = self.connection.execute("SELECT body FROM messages WHERE conversation_id = ? ORDER BY seq", (conversation_id,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def create_conversation(self, title):
+        with self.connection:
+            return self._insert_conversation(title)
+
+    def append_message(self, conversation_id, entry):
+        with self.connection:
+            seq = self.connection.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation_id = ?", (conversation_id,)).fetchone()[0]
+            self._insert_message(conversation_id, seq, entry)
+            self.connection.execute("UPDATE conversations SET updated = ? WHERE id = ?", (time.time(), conversation_id))
+
+    def update_message(self, conversation_id, seq, entry):
+        with self.connection:
+            self.connection.execute("UPDATE messages SET body = ? WHERE conversation_id = ? AND seq = ?", (json.dumps(entry), conversation_id, seq))
+            # A regenerated answer replaces the text, so its search entry is rewritten too
+            row = self.connection.execute("SELECT id FROM messages WHERE conversation_id = ? AND seq = ?", (conversation_id, seq)).fetchone()
+            if row is None:
+                return
+            if self.fallback_index is not None:
+                self.fallback_index.add((conversation_id, seq), entry)
+            else:
+                self.connection.execute("UPDATE message_search SET body = ?, code = ? WHERE rowid = ?", searchable_text(entry) + (row[0],))
+
+    def delete_conversation(self, conversation_id):
+        with self.connection:
+            if self.fallback_index is not None:
+                self.fallback_index.remove_conversation(conversation_id)
+            else:
+                self.connection.execute("DELETE FROM message_search WHERE rowid IN (SELECT id FROM messages WHERE conversation_id = ?)", (conversation_id,))
+            self.connection.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def close(self):
+        self.connection.close()
 
 class SettingsDialog(QtWidgets.QDialog):
-    def __init__(self, parent=None, api_url="http://localhost:11434/api/generate", model_name="deepseek-coder-v2", history_path="", use_disk_storage=False):
+    def __init__(self, parent=None, api_url="http://localhost:11434/api/generate", model_name="deepseek-coder-v2", history_path="", use_disk_storage=False, options=None, available_models=None):
         super().__init__(parent)
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
         self.setWindowTitle("Settings")
-        self.resize(500, 350)
+        self.resize(520, 640)
         self.setModal(True)
         self.setStyleSheet("""
             QDialog {
@@ -316,7 +3607,7 @@ class SettingsDialog(QtWidgets.QDialog):
                 font-size: 14px;
                 padding: 4px;
             }
-            QLineEdit, QComboBox {
+            QLineEdit, QComboBox, QSpinBox {
                 background-color: #1e1e1e;
                 border: 1px solid #404040;
                 padding: 8px;
@@ -348,13 +3639,49 @@ class SettingsDialog(QtWidgets.QDialog):
                 padding: 0 3px;
             }
         """)
-        layout = QtWidgets.QVBoxLayout(self)
+        dialog_layout = QtWidgets.QVBoxLayout(self)
+        # The settings outgrew small screens, so the groups scroll above a fixed button row
+        scroll_area = QtWidgets.QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setFrameShape(QtWidgets.QFrame.NoFrame)
+        content = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(content)
+        layout.setContentsMargins(0, 0, 0, 0)
+        scroll_area.setWidget(content)
+        dialog_layout.addWidget(scroll_area)
         api_group = QtWidgets.QGroupBox("API Settings")
         api_layout = QtWidgets.QFormLayout(api_group)
         self.api_url_edit = QtWidgets.QLineEdit(api_url)
-        self.model_name_edit = QtWidgets.QLineEdit(model_name)
+        self.model_name_edit = QtWidgets.QComboBox()
+        self.model_name_edit.setEditable(True)
+        self.model_name_edit.addItems(available_models or [])
+        self.model_name_edit.setEditText(model_name)
         api_layout.addRow("API URL:", self.api_url_edit)
         api_layout.addRow("Model Name:", self.model_name_edit)
+        self.backends_edit = QtWidgets.QLineEdit(", ".join(self.options["backends"]))
+        self.backends_edit.setPlaceholderText("host2:11434, host3:11434")
+        self.backends_edit.setToolTip("Other Ollama servers to share requests with, comma-separated")
+        api_layout.addRow("Extra Backends:", self.backends_edit)
+        self.scheduler_policy_combo = QtWidgets.QComboBox()
+        self.scheduler_policy_combo.addItem("Fewest active requests", "least_outstanding")
+        self.scheduler_policy_combo.addItem("Lowest latency", "latency")
+        self.scheduler_policy_combo.setCurrentIndex(max(self.scheduler_policy_combo.findData(self.options["scheduler_policy"]), 0))
+        api_layout.addRow("Load Balancing:", self.scheduler_policy_combo)
+        self.hedge_delay_spin = QtWidgets.QSpinBox()
+        self.hedge_delay_spin.setRange(0, 60000)
+        self.hedge_delay_spin.setSingleStep(250)
+        self.hedge_delay_spin.setSuffix(" ms")
+        self.hedge_delay_spin.setSpecialValueText("Off")
+        self.hedge_delay_spin.setValue(self.options["hedge_delay_ms"])
+        self.hedge_delay_spin.setToolTip("Send a duplicate request when no token has arrived after this long; the first to answer wins")
+        api_layout.addRow("Hedge After:", self.hedge_delay_spin)
+        self.hedge_model_edit = QtWidgets.QLineEdit(self.options["hedge_model"])
+        self.hedge_model_edit.setPlaceholderText("same model on another backend")
+        api_layout.addRow("Hedge Model:", self.hedge_model_edit)
+        self.race_models_edit = QtWidgets.QLineEdit(", ".join(self.options["race_models"]))
+        self.race_models_edit.setPlaceholderText("off")
+        self.race_models_edit.setToolTip("Ask these models together with the main one and show the first complete answer, comma-separated")
+        api_layout.addRow("Race Models:", self.race_models_edit)
         layout.addWidget(api_group)
         history_group = QtWidgets.QGroupBox("Chat History Settings")
         history_layout = QtWidgets.QVBoxLayout(history_group)
@@ -375,14 +3702,129 @@ class SettingsDialog(QtWidgets.QDialog):
         history_layout.addWidget(QtWidgets.QLabel("Storage Path:"))
         history_layout.addWidget(path_widget)
         layout.addWidget(history_group)
+        conversation_group = QtWidgets.QGroupBox("Conversation Settings")
+        conversation_layout = QtWidgets.QFormLayout(conversation_group)
+        self.conversation_mode_check = QtWidgets.QCheckBox("Send earlier messages as chat history")
+        self.conversation_mode_check.setChecked(self.options["conversation_mode"])
+        self.num_ctx_spin = QtWidgets.QSpinBox()
+        self.num_ctx_spin.setRange(512, 131072)
+        self.num_ctx_spin.setSingleStep(1024)
+        self.num_ctx_spin.setValue(self.options["num_ctx"])
+        conversation_layout.addRow(self.conversation_mode_check)
+        conversation_layout.addRow("Context Size (num_ctx):", self.num_ctx_spin)
+        self.keep_alive_edit = QtWidgets.QLineEdit(str(self.options["keep_alive"]))
+        self.keep_alive_edit.setToolTip("How long Ollama keeps the model loaded, e.g. 30m, 1h30m, 600 (seconds) or -1 for forever")
+        conversation_layout.addRow("Keep Model Loaded:", self.keep_alive_edit)
+        self.scene_context_check = QtWidgets.QCheckBox("Describe the current network and selected nodes to the model")
+        self.scene_context_check.setChecked(self.options["scene_context"])
+        conversation_layout.addRow(self.scene_context_check)
+        self.scene_context_spin = QtWidgets.QSpinBox()
+        self.scene_context_spin.setRange(100, 16000)
+        self.scene_context_spin.setSingleStep(250)
+        self.scene_context_spin.setSuffix(" tokens")
+        self.scene_context_spin.setValue(self.options["scene_context_tokens"])
+        conversation_layout.addRow("Scene Context Budget:", self.scene_context_spin)
+        self.geometry_context_check = QtWidgets.QCheckBox("Summarize the attributes of selected SOP geometry")
+        self.geometry_context_check.setChecked(self.options["geometry_context"])
+        conversation_layout.addRow(self.geometry_context_check)
+        self.geometry_context_spin = QtWidgets.QSpinBox()
+        self.geometry_context_spin.setRange(100, 16000)
+        self.geometry_context_spin.setSingleStep(250)
+        self.geometry_context_spin.setSuffix(" tokens")
+        self.geometry_context_spin.setValue(self.options["geometry_context_tokens"])
+        conversation_layout.addRow("Geometry Summary Budget:", self.geometry_context_spin)
+        layout.addWidget(conversation_group)
+        docs_group = QtWidgets.QGroupBox("Documentation Index")
+        docs_layout = QtWidgets.QFormLayout(docs_group)
+        self.docs_enabled_check = QtWidgets.QCheckBox("Look up local docs and snippets for each question")
+        self.docs_enabled_check.setChecked(self.options["docs_enabled"])
+        self.docs_enabled_check.setEnabled(np is not None)
+        docs_layout.addRow(self.docs_enabled_check)
+        paths = self.options["docs_paths"]
+        self.docs_paths_edit = QtWidgets.QLineEdit(paths if isinstance(paths, str) else "; ".join(paths))
+        self.docs_paths_edit.setPlaceholderText("Folders, separated by ;")
+        docs_layout.addRow("Folders:", self.docs_paths_edit)
+        self.docs_top_k_spin = QtWidgets.QSpinBox()
+        self.docs_top_k_spin.setRange(1, 20)
+        self.docs_top_k_spin.setValue(self.options["docs_top_k"])
+        docs_layout.addRow("Passages per Question:", self.docs_top_k_spin)
+        self.docs_tokens_spin = QtWidgets.QSpinBox()
+        self.docs_tokens_spin.setRange(100, 16000)
+        self.docs_tokens_spin.setSingleStep(250)
+        self.docs_tokens_spin.setSuffix(" tokens")
+        self.docs_tokens_spin.setValue(self.options["docs_tokens"])
+        docs_layout.addRow("Docs Budget:", self.docs_tokens_spin)
+        layout.addWidget(docs_group)
+        telemetry_group = QtWidgets.QGroupBox("Telemetry")
+        telemetry_layout = QtWidgets.QFormLayout(telemetry_group)
+        self.show_reply_stats_check = QtWidgets.QCheckBox("Show timing and token stats under each reply")
+        self.show_reply_stats_check.setChecked(self.options["show_reply_stats"])
+        telemetry_layout.addRow(self.show_reply_stats_check)
+        self.metrics_log_check = QtWidgets.QCheckBox("Log request metrics")
+        self.metrics_log_check.setChecked(self.options["metrics_log_enabled"])
+        telemetry_layout.addRow(self.metrics_log_check)
+        self.metrics_log_edit = QtWidgets.QLineEdit(self.options["metrics_log_path"])
+        self.metrics_log_edit.setPlaceholderText("~/.houdini_ai_cache/metrics.jsonl")
+        self.metrics_log_edit.setToolTip("Point several artists at one shared file to compare models and backends across the studio")
+        telemetry_layout.addRow("Metrics Log:", self.metrics_log_edit)
+        layout.addWidget(telemetry_group)
+        execution_group = QtWidgets.QGroupBox("Code Execution")
+        execution_layout = QtWidgets.QVBoxLayout(execution_group)
+        self.deferred_cooking_check = QtWidgets.QCheckBox("Defer cooking while scripts run (manual update mode)")
+        self.deferred_cooking_check.setChecked(self.options["deferred_cooking"])
+        self.final_cook_check = QtWidgets.QCheckBox("Cook changed networks once afterwards")
+        self.final_cook_check.setChecked(self.options["final_cook"])
+        self.final_cook_check.setEnabled(self.options["deferred_cooking"])
+        self.deferred_cooking_check.toggled.connect(self.final_cook_check.setEnabled)
+        execution_layout.addWidget(self.deferred_cooking_check)
+        execution_layout.addWidget(self.final_cook_check)
+        layout.addWidget(execution_group)
+        reliability_group = QtWidgets.QGroupBox("Timeouts and Retries")
+        reliability_layout = QtWidgets.QFormLayout(reliability_group)
+        self.timeout_spins = {}
+        for key, label, maximum in (
+            ("connect_timeout", "Connect Timeout:", 120),
+            ("first_token_timeout", "First Token Timeout:", 3600),
+            ("token_timeout", "Between Tokens Timeout:", 3600),
+            ("breaker_cooldown", "Pause Failing Backend:", 3600),
+        ):
+            spin = QtWidgets.QDoubleSpinBox()
+            spin.setRange(0, maximum)
+            spin.setDecimals(1)
+            spin.setSuffix(" s")
+            spin.setSpecialValueText("None")
+            spin.setValue(self.options[key])
+            reliability_layout.addRow(label, spin)
+            self.timeout_spins[key] = spin
+        self.timeout_spins["breaker_cooldown"].setSpecialValueText("")
+        self.timeout_spins["breaker_cooldown"].setMinimum(1)
+        self.max_retries_spin = QtWidgets.QSpinBox()
+        self.max_retries_spin.setRange(0, 10)
+        self.max_retries_spin.setValue(self.options["max_retries"])
+        self.max_retries_spin.setToolTip("Retries on the same backend after a dropped or refused connection, with growing random delays")
+        reliability_layout.addRow("Connection Retries:", self.max_retries_spin)
+        self.breaker_threshold_spin = QtWidgets.QSpinBox()
+        self.breaker_threshold_spin.setRange(1, 100)
+        self.breaker_threshold_spin.setValue(self.options["breaker_threshold"])
+        self.breaker_threshold_spin.setToolTip("Consecutive failed requests before a backend is paused")
+        reliability_layout.addRow("Failures Before Pausing:", self.breaker_threshold_spin)
+        layout.addWidget(reliability_group)
         self.toggle_path_widgets(self.storage_type.currentIndex())
         layout.addStretch(1)
         button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
         button_box.button(QtWidgets.QDialogButtonBox.Ok).setText("Save")
-        layout.addWidget(button_box)
+        dialog_layout.addWidget(button_box)
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
 
+    def accept(self):
+        if normalize_keep_alive(self.keep_alive_edit.text() or DEFAULT_OPTIONS["keep_alive"]) is None:
+            self.keep_alive_edit.setStyleSheet("border: 1px solid #d9534f;")
+            self.keep_alive_edit.setToolTip("Use seconds (600, -1 for forever) or a duration with units such as 30m or 1h30m")
+            self.keep_alive_edit.setFocus()
+            return
+        super().accept()
+
     def toggle_path_widgets(self, index):
         use_disk = index == 1
         self.path_edit.setEnabled(use_disk)
@@ -396,44 +3838,177 @@ class SettingsDialog(QtWidgets.QDialog):
     def get_settings(self):
         return (
             self.api_url_edit.text().strip(),
-            self.model_name_edit.text().strip(),
+            self.model_name_edit.currentText().strip(),
             self.path_edit.text().strip(),
             self.storage_type.currentIndex() == 1
         )
 
+    def get_options(self):
+        options = dict(self.options)
+        options["conversation_mode"] = self.conversation_mode_check.isChecked()
+        options["num_ctx"] = self.num_ctx_spin.value()
+        options["keep_alive"] = normalize_keep_alive(self.keep_alive_edit.text() or DEFAULT_OPTIONS["keep_alive"])
+        options["deferred_cooking"] = self.deferred_cooking_check.isChecked()
+        options["scene_context"] = self.scene_context_check.isChecked()
+        options["scene_context_tokens"] = self.scene_context_spin.value()
+        options["geometry_context"] = self.geometry_context_check.isChecked()
+        options["geometry_context_tokens"] = self.geometry_context_spin.value()
+        options["docs_enabled"] = self.docs_enabled_check.isChecked()
+        options["docs_paths"] = [path.strip() for path in self.docs_paths_edit.text().split(";") if path.strip()]
+        options["docs_top_k"] = self.docs_top_k_spin.value()
+        options["docs_tokens"] = self.docs_tokens_spin.value()
+        options["show_reply_stats"] = self.show_reply_stats_check.isChecked()
+        options["metrics_log_enabled"] = self.metrics_log_check.isChecked()
+        options["metrics_log_path"] = self.metrics_log_edit.text().strip()
+        options["final_cook"] = self.final_cook_check.isChecked()
+        options["backends"] = [url.strip() for url in self.backends_edit.text().split(",") if url.strip()]
+        options["scheduler_policy"] = self.scheduler_policy_combo.currentData()
+        options["hedge_delay_ms"] = self.hedge_delay_spin.value()
+        options["hedge_model"] = self.hedge_model_edit.text().strip()
+        options["race_models"] = [model.strip() for model in self.race_models_edit.text().split(",") if model.strip()]
+        for key, spin in self.timeout_spins.items():
+            options[key] = spin.value()
+        options["max_retries"] = self.max_retries_spin.value()
+        options["breaker_threshold"] = self.breaker_threshold_spin.value()
+        return options
+
+SIDEBAR_PAGE_SIZE = 50
+
 class ChatbotPanel(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
+        self.startup_timings = OrderedDict()
+        phase_start = time.perf_counter()
         self.thread_pool = QtCore.QThreadPool()
-        found_url = find_api_url(candidate_ports=[11434, 11435, 11433, 5000, 8000])
-        self.api_url = found_url if found_url else "http://localhost:11434/api/generate"
+        self.api_url = "http://localhost:11434/api/generate"
+        self.api_url_configured = False
+        self.available_models = []
         self.model_name = "qwen2.5-coder:32b"
         self.history_path = ""
         self.use_disk_storage = False
+        self.options = dict(DEFAULT_OPTIONS)
         self.load_settings()
+        phase_start = self.mark_startup_phase("settings", phase_start)
+        self.history_store = None
         self.load_chat_history()
         self.current_conversation = []
-        if hasattr(hou.session, "ai_chat_history"):
-            self.conversations = hou.session.ai_chat_history
-        else:
-            self.conversations = []
-        self.thinking_label = None
+        self.current_conversation_id = None
+        self.history_budget = ChatHistoryBudget(self.options["num_ctx"], self.options["num_ctx_reserve"])
+        self.thinking_item = None
         self.thinking_timer = None
         self.thinking_state = 0
+        self.stream_item = None
+        self.stream_blocks = []
+        self.stream_code_pending = {}
+        self.stream_timer = QtCore.QTimer(self)
+        self.stream_timer.setInterval(STREAM_FRAME_MS)
+        self.stream_timer.timeout.connect(self.flush_stream)
         self.current_worker = None
+        self.model_state = "unknown"
+        self.warmup_worker = None
+        self.request_started_warm = False
+        self.ttft_samples = {"cold": [], "warm": []}
+        self.keep_alive_timer = QtCore.QTimer(self)
+        self.keep_alive_timer.timeout.connect(lambda: self.warm_up_model(ping=True))
         self.request_in_progress = False
         self.cancel_requested = False
-        self.icon_clear = create_svg_icon(SVG_CLEAR, 24)
-        self.icon_export = create_svg_icon(SVG_EXPORT, 24)
-        self.icon_settings = create_svg_icon(SVG_SETTINGS, 24)
-        self.icon_send = create_svg_icon(SVG_SEND, 24)
-        self.icon_run = create_svg_icon(SVG_RUN, 24)
-        self.icon_mic_default = create_svg_icon(SVG_MIC_DEFAULT, 24)
-        self.icon_mic_active = create_svg_icon(SVG_MIC_ACTIVE, 24)
-        self.icon_copy = create_svg_icon(SVG_COPY, 16)
-        self.icon_edit = create_svg_icon(SVG_EDIT, 16)
+        self.current_request = None
+        self.pending_requests = deque()
+        self.status_detail = ""
+        self.scene_context = None
+        self.geometry_summarizer = None
+        self.docs_worker = None
+        self.request_query = None
+        self.context_metrics = {}
+        # (conversation id, message index) of the answer the running request replaces
+        self.regenerating = None
+        phase_start = self.mark_startup_phase("history", phase_start)
+        self.icon_clear = get_cached_icon(SVG_CLEAR, 24)
+        self.icon_export = get_cached_icon(SVG_EXPORT, 24)
+        self.icon_settings = get_cached_icon(SVG_SETTINGS, 24)
+        self.icon_send = get_cached_icon(SVG_SEND, 24)
+        self.icon_run = get_cached_icon(SVG_RUN, 24)
+        self.icon_mic_default = get_cached_icon(SVG_MIC_DEFAULT, 24)
+        self.icon_mic_active = get_cached_icon(SVG_MIC_ACTIVE, 24)
+        self.icon_copy = get_cached_icon(SVG_COPY, 16)
+        self.icon_edit = get_cached_icon(SVG_EDIT, 16)
+        phase_start = self.mark_startup_phase("icons", phase_start)
         self.init_ui()
+        phase_start = self.mark_startup_phase("ui", phase_start)
         self.apply_modern_styles()
+        self.mark_startup_phase("styles", phase_start)
+        # Port probing and the install check can take seconds, so they finish after the panel is shown
+        self.discovery_worker = None
+        self.start_discovery()
+
+    def mark_startup_phase(self, name, phase_start):
+        now = time.perf_counter()
+        self.startup_timings[name] = (now - phase_start) * 1000.0
+        return now
+
+    def start_discovery(self, force=False):
+        if self.discovery_worker is not None:
+            return
+        self.discovery_worker = StartupDiscoveryWorker(force=force)
+        self.discovery_worker.signals.finished.connect(self.handle_startup_discovery)
+        self.thread_pool.start(self.discovery_worker)
+
+    def handle_connection_lost(self, failed_url):
+        if failed_url != self.api_url:
+            return
+        # Only local endpoints are replaced automatically; a remote server stays as configured
+        if urlparse(failed_url).hostname in ("localhost", "127.0.0.1"):
+            self.api_url_configured = False
+        self.start_discovery(force=True)
+
+    def handle_startup_discovery(self, found_url, models, is_installed, detail, seconds):
+        self.startup_timings.setdefault("discovery (background)", seconds * 1000.0)
+        self.discovery_worker = None
+        self.available_models = models or []
+        if found_url and not self.api_url_configured and found_url != self.api_url:
+            self.api_url = found_url
+            self.error_display.setText(f"Using Ollama at {found_url}")
+        if self.available_models and self.model_name not in self.available_models:
+            self.error_display.setText(f"Model {self.model_name} is not available on {self.api_url}.")
+        status_color = "#00ff00" if is_installed else "#ff0000"
+        self.status_icon.setStyleSheet(f"border-radius: 6px; background-color: {status_color};")
+        self.status_detail = detail
+        self.update_backend_status()
+        self.warm_up_model()
+        # Only files changed since the last run are re-read and re-embedded
+        self.reindex_docs(quiet=True)
+
+    def backend_urls(self):
+        backends = self.options["backends"]
+        if isinstance(backends, str):
+            backends = backends.split(",")
+        urls = [self.api_url]
+        for url in backends:
+            if url.strip() and backend_api_url(url) not in urls:
+                urls.append(backend_api_url(url))
+        return urls
+
+    def update_backend_status(self):
+        lines = [self.status_detail] if self.status_detail else []
+        for kind in ("warm", "cold"):
+            points = latency_percentiles(self.ttft_samples[kind])
+            if points:
+                lines.append(f"{kind.capitalize()} TTFT p50 {points[50]:.2f}s, p95 {points[95]:.2f}s, p99 {points[99]:.2f}s ({len(self.ttft_samples[kind])} requests)")
+        stats = {backend["url"]: backend for backend in get_backend_scheduler().stats()}
+        for url in self.backend_urls():
+            backend = stats.get(url)
+            if backend is None or (not backend["requests"] and backend["healthy"]):
+                lines.append(url)
+                continue
+            ttft = f"{backend['ewma_ttft']:.2f}s" if backend["ewma_ttft"] is not None else "-"
+            if backend["ttft_percentiles"]:
+                ttft += f" (p95 {backend['ttft_percentiles'][95]:.2f}s)"
+            state = {"closed": "up", "half_open": "probing"}.get(backend["state"], f"failing, retry in {backend['retry_in']:.0f}s")
+            lines.append(
+                f"{url} ({state}): {backend['outstanding']} active, {backend['requests']} requests, "
+                f"{backend['errors']} errors, TTFT {ttft}, {backend['tokens_per_second']:.0f} tok/s"
+            )
+        self.status_icon.setToolTip("\n".join(lines))
 
     def init_ui(self):
         main_hlayout = QtWidgets.QHBoxLayout(self)
@@ -446,13 +4021,29 @@ class ChatbotPanel(QtWidgets.QWidget):
         self.new_chat_button = QtWidgets.QPushButton("New Chat")
         self.new_chat_button.clicked.connect(self.new_chat)
         sidebar_layout.addWidget(self.new_chat_button)
+        self.search_field = QtWidgets.QLineEdit()
+        self.search_field.setPlaceholderText("Search chats...")
+        self.search_field.setClearButtonEnabled(True)
+        self.search_field.setObjectName("searchField")
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_field.textChanged.connect(lambda _: self.search_timer.start())
+        sidebar_layout.addWidget(self.search_field)
+        self.search_results = QtWidgets.QListWidget()
+        self.search_results.itemClicked.connect(self.open_search_result)
+        self.search_results.hide()
+        sidebar_layout.addWidget(self.search_results, 1)
         self.sidebar = QtWidgets.QListWidget()
         self.sidebar.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.sidebar.customContextMenuRequested.connect(self.show_context_menu)
         self.sidebar.itemClicked.connect(self.load_conversation)
+        # Titles are fetched a page at a time, most recent first, as the list is scrolled
+        self.sidebar.verticalScrollBar().valueChanged.connect(lambda _: self.load_more_conversations())
+        self.sidebar.verticalScrollBar().rangeChanged.connect(lambda *_: self.load_more_conversations())
         sidebar_layout.addWidget(self.sidebar,1)
-        for conv in self.conversations:
-            self.sidebar.addItem(conv["title"])
+        self.reload_sidebar()
 
         chat_area_widget = QtWidgets.QWidget()
         chat_area_widget.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
@@ -464,17 +4055,19 @@ class ChatbotPanel(QtWidgets.QWidget):
         header_layout.setContentsMargins(0,0,0,0)
         title_label = QtWidgets.QLabel("Houdini AI Assistant")
         title_label.setObjectName("titleLabel")
-        is_installed, _ = check_windows_ollama()
-        status_color = "#00ff00" if is_installed else "#ff0000"
-        status_icon = QtWidgets.QLabel()
-        status_icon.setFixedSize(12, 12)
-        status_icon.setStyleSheet(f"border-radius: 6px; background-color: {status_color};")
+        self.status_icon = QtWidgets.QLabel()
+        self.status_icon.setFixedSize(12, 12)
+        self.status_icon.setStyleSheet("border-radius: 6px; background-color: #808080;")
+        self.status_icon.setToolTip("Checking for Ollama...")
         title_container = QtWidgets.QWidget()
         title_layout2 = QtWidgets.QHBoxLayout(title_container)
         title_layout2.setContentsMargins(0, 0, 0, 0)
         title_layout2.setSpacing(8)
         title_layout2.addWidget(title_label)
-        title_layout2.addWidget(status_icon)
+        title_layout2.addWidget(self.status_icon)
+        self.model_status_label = QtWidgets.QLabel("")
+        self.model_status_label.setStyleSheet("color: #909090; font-size: 11px;")
+        title_layout2.addWidget(self.model_status_label)
         header_layout.addWidget(title_container)
         header_layout.addStretch()
         self.clear_button = QtWidgets.QPushButton()
@@ -489,6 +4082,36 @@ class ChatbotPanel(QtWidgets.QWidget):
         self.export_button.setIconSize(QtCore.QSize(24,24))
         self.export_button.clicked.connect(self.export_chat)
         header_layout.addWidget(self.export_button)
+        self.cache_button = QtWidgets.QToolButton()
+        self.cache_button.setText("Cache")
+        self.cache_button.setToolTip("Response Cache")
+        self.cache_button.setPopupMode(QtWidgets.QToolButton.InstantPopup)
+        cache_menu = QtWidgets.QMenu(self.cache_button)
+        self.cache_toggle_action = cache_menu.addAction("Use Response Cache")
+        self.cache_toggle_action.setCheckable(True)
+        self.cache_toggle_action.setChecked(self.options["response_cache_enabled"])
+        self.cache_toggle_action.toggled.connect(self.toggle_response_cache)
+        self.semantic_toggle_action = cache_menu.addAction("Use Semantic Cache (embeds each question)")
+        self.semantic_toggle_action.setCheckable(True)
+        self.semantic_toggle_action.setChecked(self.options["semantic_cache_enabled"] and np is not None)
+        self.semantic_toggle_action.setEnabled(np is not None)
+        self.semantic_toggle_action.toggled.connect(self.toggle_semantic_cache)
+        cache_menu.addAction("Regenerate Last Answer", self.regenerate_last_answer)
+        cache_menu.addAction("Clear Cache", self.clear_response_cache)
+        cache_menu.addSeparator()
+        self.cache_stats_action = cache_menu.addAction("")
+        self.cache_stats_action.setEnabled(False)
+        self.semantic_stats_action = cache_menu.addAction("Semantic cache unavailable (numpy not installed)")
+        self.semantic_stats_action.setEnabled(False)
+        cache_menu.addSeparator()
+        cache_menu.addAction("Reindex Docs", self.reindex_docs)
+        self.docs_stats_action = cache_menu.addAction("Docs index unavailable (numpy not installed)")
+        self.docs_stats_action.setEnabled(False)
+        cache_menu.addSeparator()
+        cache_menu.addAction("Show Model Throughput", self.show_metrics_summary)
+        cache_menu.aboutToShow.connect(self.update_cache_stats)
+        self.cache_button.setMenu(cache_menu)
+        header_layout.addWidget(self.cache_button)
         self.settings_button = QtWidgets.QPushButton()
         self.settings_button.setIcon(self.icon_settings)
         self.settings_button.setToolTip("Settings")
@@ -497,19 +4120,10 @@ class ChatbotPanel(QtWidgets.QWidget):
         header_layout.addWidget(self.settings_button)
         chat_area_layout.addWidget(header_widget)
 
-        self.chat_container = QtWidgets.QWidget()
-        self.chat_container.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Preferred)
-        self.chat_layout = QtWidgets.QVBoxLayout(self.chat_container)
-        self.chat_layout.setContentsMargins(0,0,0,0)
-        self.chat_layout.setSpacing(10)
-        self.chat_layout.addStretch()
-
-        self.scroll_area = QtWidgets.QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.chat_container)
-        self.scroll_area.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-        self.scroll_area.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
-        chat_area_layout.addWidget(self.scroll_area, 1)
+        # Only visible rows are painted, and code editors exist only for visible code rows
+        self.transcript = TranscriptView(self)
+        self.transcript.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        chat_area_layout.addWidget(self.transcript, 1)
 
         self.error_display = QtWidgets.QLabel("")
         self.error_display.setStyleSheet("color: #e0e0e0; font-size: 11px; padding: 2px;")
@@ -560,13 +4174,109 @@ class ChatbotPanel(QtWidgets.QWidget):
         if action == delete_action:
             self.delete_conversation(item)
 
+    def reload_sidebar(self):
+        self.conversations = []
+        self.sidebar_exhausted = False
+        self.sidebar.clear()
+        self.load_sidebar_page()
+
+    def load_sidebar_page(self):
+        if self.sidebar_exhausted:
+            return
+        page = self.history_store.list_conversations(offset=len(self.conversations), limit=SIDEBAR_PAGE_SIZE)
+        self.sidebar_exhausted = len(page) < SIDEBAR_PAGE_SIZE
+        self.conversations.extend(page)
+        for conv in page:
+            self.sidebar.addItem(conv["title"])
+
+    def load_more_conversations(self):
+        scroll_bar = self.sidebar.verticalScrollBar()
+        if not self.sidebar_exhausted and scroll_bar.value() >= scroll_bar.maximum() - 5:
+            self.load_sidebar_page()
+
+    def move_conversation_to_top(self, conversation_id, title):
+        for row, conv in enumerate(self.conversations):
+            if conv["id"] == conversation_id:
+                if row == 0:
+                    return
+                title = self.conversations.pop(row)["title"]
+                self.sidebar.takeItem(row)
+                break
+        self.conversations.insert(0, {"id": conversation_id, "title": title})
+        self.sidebar.insertItem(0, title)
+        self.sidebar.setCurrentRow(0)
+
     def delete_conversation(self, item):
         index = self.sidebar.row(item)
         if index < 0 or index >= len(self.conversations):
             return
-        self.conversations.pop(index)
+        conv = self.conversations.pop(index)
         self.sidebar.takeItem(index)
-        hou.session.ai_chat_history = self.conversations
+        self.history_store.delete_conversation(conv["id"])
+        dropped = [pending for pending in self.pending_requests if pending["conversation_id"] == conv["id"]]
+        for pending in dropped:
+            self.pending_requests.remove(pending)
+        if conv["id"] == self.current_conversation_id:
+            self.current_conversation_id = None
+            self.current_conversation = []
+            self.clear_chat()
+            self.report_queued_elsewhere()
+        if dropped:
+            self.error_display.setText(f"Dropped {len(dropped)} queued messages of the deleted chat")
+
+    def run_search(self):
+        query = self.search_field.text().strip()
+        self.search_results.clear()
+        if not query:
+            self.search_results.hide()
+            self.sidebar.show()
+            return
+        start = time.perf_counter()
+        results = self.history_store.search(query)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        for result in results:
+            item = QtWidgets.QListWidgetItem()
+            item.setData(QtCore.Qt.UserRole, (result["conversation_id"], result["seq"]))
+            label = QtWidgets.QLabel(
+                f"<span style='color:#909090; font-size:11px;'>{html.escape(result['title'])} &middot; {result['role']}</span><br>{result['snippet']}"
+            )
+            label.setTextFormat(QtCore.Qt.RichText)
+            label.setWordWrap(True)
+            label.setStyleSheet("background: transparent; padding: 4px;")
+            item.setSizeHint(QtCore.QSize(0, label.sizeHint().height() + 16))
+            self.search_results.addItem(item)
+            self.search_results.setItemWidget(item, label)
+        if self.history_store.search_truncated:
+            note = QtWidgets.QListWidgetItem(f"Best matches among the {SEARCH_RANK_WINDOW:,} most recent. Add words to reach older chats.")
+            note.setFlags(QtCore.Qt.NoItemFlags)
+            self.search_results.addItem(note)
+        self.search_results.setToolTip(f"{len(results)} results in {elapsed_ms:.1f} ms")
+        self.sidebar.hide()
+        self.search_results.show()
+
+    def open_search_result(self, item):
+        if item.data(QtCore.Qt.UserRole) is None:
+            return
+        conversation_id, seq = item.data(QtCore.Qt.UserRole)
+        self.open_conversation(conversation_id, focus_seq=seq)
+
+    def replace_entry(self, seq, entry):
+        if self.history_store is None:
+            return
+        self.current_conversation[seq] = entry
+        self.history_store.update_message(self.current_conversation_id, seq, entry)
+
+    def append_entry(self, entry):
+        if self.history_store is None:
+            # The panel has been closed and its store released
+            return
+        self.current_conversation.append(entry)
+        title = conversation_title(self.current_conversation)
+        if self.current_conversation_id is None:
+            self.current_conversation_id = self.history_store.create_conversation(title)
+        self.history_store.append_message(self.current_conversation_id, entry)
+        # The store orders by last activity, so the sidebar mirrors it by moving this chat up
+        self.move_conversation_to_top(self.current_conversation_id, title)
 
     def apply_modern_styles(self):
         self.setStyleSheet("""
@@ -580,19 +4290,6 @@ class ChatbotPanel(QtWidgets.QWidget):
                 font-weight: 500;
                 color: #ffffff;
             }
-            QLabel.message {
-                border: 1px solid #404040;
-                border-radius: 8px;
-                padding: 15px;
-                font-size: 13px;
-                line-height: 1.4;
-                background-color: #2d2d2d;
-                word-wrap: break-word;
-                max-width: 700px;
-            }
-            QLabel.user, QLabel.assistant {
-                margin: 0;
-            }
             QPlainTextEdit.codeBlock {
                 background-color: #1E1E1E;
                 border: 1px solid #404040;
@@ -602,6 +4299,12 @@ class ChatbotPanel(QtWidgets.QWidget):
                 font-size: 13px;
                 line-height: 1.45;
             }
+            #searchField {
+                background-color: #2d2d2d;
+                border: 1px solid #404040;
+                border-radius: 4px;
+                padding: 6px;
+            }
             #inputField {
                 background-color: #2d2d2d;
                 border: 1px solid #404040;
@@ -610,11 +4313,14 @@ class ChatbotPanel(QtWidgets.QWidget):
                 font-size: 13px;
                 min-height: 36px;
             }
-            QPushButton {
+            QPushButton, QToolButton {
                 background-color: transparent;
                 border: none;
             }
-            QPushButton:hover {
+            QToolButton::menu-indicator {
+                image: none;
+            }
+            QPushButton:hover, QToolButton:hover {
                 background-color: rgba(80,80,80,0.3);
                 border-radius: 4px;
             }
@@ -637,7 +4343,7 @@ class ChatbotPanel(QtWidgets.QWidget):
             QListWidget::item:selected {
                 background-color: #404040;
             }
-            QScrollArea {
+            #transcript {
                 border: none;
             }
         """)
@@ -648,67 +4354,17 @@ class ChatbotPanel(QtWidgets.QWidget):
 
 
 
-    def add_message(self, widget):
-        container = QtWidgets.QWidget()
-        layout = QtWidgets.QHBoxLayout(container)
-        layout.setContentsMargins(10,5,10,5)
-        role = widget.property("class")
-        if role == "message user":
-            layout.addStretch()
-            layout.addWidget(widget)
-        elif role == "message assistant":
-            layout.addWidget(widget)
-            layout.addStretch()
-        else:
-            layout.addStretch()
-            layout.addWidget(widget)
-            layout.addStretch()
-        self.chat_layout.insertWidget(self.chat_layout.count()-1, container)
-        QtCore.QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()))
-
-    def add_code_block(self, code):
-        container = QtWidgets.QWidget()
-        layout = QtWidgets.QVBoxLayout(container)
-        layout.setContentsMargins(10,5,10,5)
-
-        code_widget = QtWidgets.QPlainTextEdit()
-        code_widget.setReadOnly(False)
-        code_widget.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse | QtCore.Qt.TextSelectableByKeyboard)
-        code_widget.setPlainText(code)
-        code_widget.setObjectName("codeBlock")
-        code_widget.setProperty("class", "codeBlock")
-        PythonHighlighter(code_widget.document())
-        layout.addWidget(code_widget)
-
-        buttons_container = QtWidgets.QWidget()
-        buttons_layout = QtWidgets.QHBoxLayout(buttons_container)
-        buttons_layout.setContentsMargins(0,0,0,0)
-        buttons_layout.setSpacing(10)
+    def add_message(self, kind, text, **fields):
+        # Rows for the running request go above the messages still waiting in the queue
+        queued = self.queued_here()
+        before = queued[0]["item"] if queued else None
+        return self.transcript.add_item(kind, text, before=before, **fields)
 
-        run_button = QtWidgets.QPushButton()
-        run_button.setIcon(self.icon_run)
-        run_button.setToolTip("Execute Code")
-        run_button.setIconSize(QtCore.QSize(24,24))
-        run_button.clicked.connect(lambda: self.execute_code(code_widget))
-        buttons_layout.addWidget(run_button)
-
-        copy_button = QtWidgets.QPushButton("Copy")
-        copy_button.setIcon(self.icon_copy)
-        copy_button.setToolTip("Copy Code")
-        copy_button.clicked.connect(lambda: self.copy_code(code_widget, copy_button))
-        buttons_layout.addWidget(copy_button)
-
-        edit_button = QtWidgets.QPushButton("Edit")
-        edit_button.setIcon(self.icon_edit)
-        edit_button.setToolTip("Toggle Editable Code")
-        edit_button.clicked.connect(lambda: self.toggle_edit_code(code_widget, edit_button))
-        buttons_layout.addWidget(edit_button)
+    def queued_here(self):
+        return [pending for pending in self.pending_requests if pending["conversation_id"] == self.current_conversation_id]
 
-        layout.addWidget(buttons_container)
-        self.chat_layout.insertWidget(self.chat_layout.count()-1, container)
-        QtCore.QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()))
+    def add_code_block(self, code, language="python"):
+        return self.add_message("code", code, language=language)
 
     def toggle_edit_code(self, code_widget, edit_button):
         if code_widget.isReadOnly():
@@ -725,17 +4381,11 @@ class ChatbotPanel(QtWidgets.QWidget):
         copy_button.setText("✓ Copied")
         QtCore.QTimer.singleShot(2000, lambda: copy_button.setText(original_text))
 
-    def execute_code(self, code_widget):
+    def execute_code(self, code_widget, profile=False, item=None):
         cursor = code_widget.textCursor()
         selected_text = cursor.selectedText()
         code_to_run = selected_text if selected_text.strip() else code_widget.toPlainText()
-
-        vex_indicators = [
-            '@', 'v@', 'f@', 'i@', 'p@',
-            'point()', 'prim()', 'vertex()', 'detail()',
-            'volumesample()', 'chramp()', 'primintrinsic()'
-        ]
-        is_vex = any(indicator in code_to_run for indicator in vex_indicators)
+        is_vex = is_vex_code(code_to_run, (item or {}).get("language"))
 
         try:
             if is_vex:
@@ -763,12 +4413,72 @@ class ChatbotPanel(QtWidgets.QWidget):
                 else:
                     raise Exception("Could not determine where to create the wrangle node")
             else:
-                exec(code_to_run, {'hou': hou})
-                self.error_display.setText("Python code executed successfully")
+                if self.options["deferred_cooking"]:
+                    run = run_deferred(get_code_executor(), code_to_run, self.options["final_cook"], profile=profile)
+                else:
+                    run = get_code_executor().run(code_to_run, profile=profile)
+                self.show_run_result(item, run)
+                if run["ok"] and "cook_ms" in run:
+                    self.error_display.setText(f"Script {run['wall_ms']:.1f} ms, final cook {run['cook_ms']:.1f} ms")
+                elif run["ok"]:
+                    self.error_display.setText(f"Python code ran in {run['wall_ms']:.1f} ms")
+                else:
+                    self.error_display.setText(f"Execution error: {run['error']}")
 
         except Exception as e:
             self.error_display.setText(f"Execution error: {e}")
 
+    def execute_on_selection(self, code_widget, item=None):
+        selected_text = code_widget.textCursor().selectedText()
+        code_to_run = selected_text if selected_text.strip() else code_widget.toPlainText()
+        nodes = hou.selectedNodes()
+        if not nodes:
+            self.error_display.setText("Select the nodes to apply this code to.")
+            return
+        batch = run_batch(f"AI Assistant: apply code to {len(nodes)} nodes", node_jobs(nodes, code_to_run, get_code_executor(), (item or {}).get("language")),
+                          self.options["deferred_cooking"], self.options["final_cook"])
+        self.show_batch_results(item, batch)
+
+    def execute_reply_blocks(self, code_items):
+        if not code_items:
+            return
+        blocks = [{"code": item["text"], "language": item.get("language")} for item in code_items]
+        selected = hou.selectedNodes()
+        batch = run_batch(f"AI Assistant: run {len(blocks)} code blocks", block_jobs(blocks, get_code_executor(), selected[0] if selected else None),
+                          self.options["deferred_cooking"], self.options["final_cook"])
+        self.show_batch_results(code_items[-1], batch)
+
+    def show_batch_results(self, item, batch):
+        results = batch["results"]
+        failed = sum(1 for result in results if not result["ok"])
+        self.show_output(item, format_batch_results(batch), bool(failed) or bool(batch.get("cook_error")))
+        cook = f", final cook {batch['cook_ms']:.1f} ms" if "cook_ms" in batch else ""
+        if failed:
+            self.error_display.setText(f"{failed} of {len(results)} targets failed{cook}")
+        else:
+            self.error_display.setText(f"Applied to {len(results)} targets in one undo step{cook}")
+
+    def show_output(self, item, text, error):
+        output = item.get("output_item")
+        if output is not None and self.transcript.transcript_model.row_of(output) >= 0:
+            output["text"] = text
+            output["error"] = error
+            self.transcript.update_item(output)
+        else:
+            item["output_item"] = self.transcript.add_item_after(item, "output", text, error=error, seq=item.get("seq"))
+
+    def show_run_result(self, item, run):
+        if item is None:
+            return
+        self.show_output(item, format_run_result(run), not run["ok"])
+        seq = item.get("seq")
+        if seq is None or self.current_conversation_id is None or seq >= len(self.current_conversation):
+            return
+        entry = self.current_conversation[seq]
+        record = dict(run, block=item.get("block"), traceback=run["traceback"][-4000:])
+        entry["runs"] = (entry.get("runs", []) + [record])[-CODE_RUN_HISTORY:]
+        self.history_store.update_message(self.current_conversation_id, seq, entry)
+
     def voice_input(self):
         if sr is None:
             self.error_display.setText("Speech recognition module not available.")
@@ -795,13 +4505,48 @@ class ChatbotPanel(QtWidgets.QWidget):
         engine.say(text)
         engine.runAndWait()
 
+    def set_model_state(self, state, detail=""):
+        self.model_state = state
+        text = {"loading": "loading model...", "loaded": "model loaded", "failed": "model not loaded"}.get(state, "")
+        self.model_status_label.setText(text)
+        self.model_status_label.setToolTip(detail or self.model_name)
+
+    def warm_up_model(self, ping=False):
+        if ping and (self.warmup_worker or self.request_in_progress):
+            return
+        if not ping or self.model_state != "loaded":
+            self.set_model_state("loading")
+        worker = ModelWarmupWorker(self.api_url, self.model_name, self.options["keep_alive"])
+        worker.signals.loaded.connect(lambda model_name, seconds, load_seconds: self.handle_model_loaded(worker, seconds, load_seconds))
+        worker.signals.failed.connect(lambda model_name, error: self.handle_model_load_failed(worker, error))
+        self.warmup_worker = worker
+        self.thread_pool.start(worker)
+        keep_alive_seconds = parse_keep_alive(self.options["keep_alive"])
+        if keep_alive_seconds > 0:
+            self.keep_alive_timer.start(max(keep_alive_seconds // 2, 30) * 1000)
+        else:
+            self.keep_alive_timer.stop()
+
+    def handle_model_loaded(self, worker, seconds, load_seconds):
+        if worker is not self.warmup_worker:
+            return
+        self.warmup_worker = None
+        self.set_model_state("loaded", f"{worker.model_name} ready in {seconds:.1f}s (load {load_seconds:.1f}s)")
+
+    def handle_model_load_failed(self, worker, error):
+        if worker is not self.warmup_worker:
+            return
+        self.warmup_worker = None
+        self.set_model_state("failed", error)
+
+    def handle_first_token(self, seconds):
+        kind = "warm" if self.request_started_warm else "cold"
+        self.ttft_samples[kind].append(seconds)
+        self.set_model_state("loaded", f"{self.model_name}: {kind} time to first token {seconds:.2f}s")
+
     def start_thinking(self):
-        if self.thinking_label is None:
-            self.thinking_label = QtWidgets.QLabel("thinking.")
-            self.thinking_label.setProperty("class", "message assistant")
-            self.thinking_label.setTextFormat(QtCore.Qt.RichText)
-            self.thinking_label.setWordWrap(True)
-            self.add_message(self.thinking_label)
+        if self.thinking_item is None:
+            self.thinking_item = self.add_message("thinking", "thinking.")
         self.thinking_state = 0
         self.thinking_timer = QtCore.QTimer()
         self.thinking_timer.timeout.connect(self.update_thinking)
@@ -809,23 +4554,133 @@ class ChatbotPanel(QtWidgets.QWidget):
 
     def update_thinking(self):
         dots = "." * ((self.thinking_state % 3) + 1)
-        self.thinking_label.setText(f"thinking{dots}")
+        self.thinking_item["text"] = f"thinking{dots}"
+        self.transcript.update_item(self.thinking_item)
         self.thinking_state += 1
 
     def stop_thinking(self):
         if self.thinking_timer:
             self.thinking_timer.stop()
             self.thinking_timer = None
-        if self.thinking_label:
-            self.thinking_label.setParent(None)
-            self.thinking_label = None
+        if self.thinking_item:
+            self.transcript.remove_item(self.thinking_item)
+            self.thinking_item = None
+
+    def finish_stream(self):
+        self.flush_stream()
+        self.stream_timer.stop()
+        if self.stream_item:
+            self.transcript.finish_streaming(self.stream_item)
+            self.stream_item = None
+
+    def flush_stream(self):
+        changed = False
+        for index, chunks in self.stream_code_pending.items():
+            item = self.stream_blocks[index]["item"]
+            item["text"] += "".join(chunks)
+            self.transcript.update_item(item)
+            changed = True
+        self.stream_code_pending = {}
+        if self.stream_item and self.stream_item["renderer"].flush():
+            self.transcript.update_item(self.stream_item)
+            changed = True
+        if changed:
+            self.transcript.scroll_to_bottom()
 
     def cleanup_after_request(self):
+        self.finish_stream()
+        for block in self.stream_blocks:
+            # A cancelled or failed reply never closes its last fence
+            if block["item"].get("streaming"):
+                block["item"]["streaming"] = False
+                self.transcript.update_item(block["item"])
+        self.stream_blocks = []
+        self.regenerating = None
         self.request_in_progress = False
         self.cancel_requested = False
         self.current_worker = None
+        self.current_request = None
         self.cancel_button.hide()
-        self.send_button.setEnabled(True)
+        self.update_backend_status()
+        QtCore.QTimer.singleShot(0, self.start_next_request)
+
+    def toggle_response_cache(self, enabled):
+        self.options["response_cache_enabled"] = enabled
+        self.save_settings()
+
+    def toggle_semantic_cache(self, enabled):
+        self.options["semantic_cache_enabled"] = enabled
+        self.save_settings()
+
+    def clear_response_cache(self):
+        get_response_cache().clear()
+        if np is not None:
+            get_semantic_cache().clear()
+        self.error_display.setText("Response cache cleared.")
+
+    def update_cache_stats(self):
+        stats = get_response_cache().stats()
+        self.cache_stats_action.setText(
+            f"{stats['entries']} entries, {stats['bytes'] / 1048576.0:.1f} MB, "
+            f"hit rate {stats['hit_rate'] * 100:.0f}% ({stats['hits']}/{stats['hits'] + stats['misses']})"
+        )
+        if np is not None:
+            semantic = get_semantic_cache().stats()
+            self.semantic_stats_action.setText(
+                f"Semantic: {semantic['entries']} entries, hit rate {semantic['hit_rate'] * 100:.0f}%, "
+                f"lookup {semantic['avg_embed_ms'] + semantic['avg_scan_ms']:.1f} ms "
+                f"(embed {semantic['avg_embed_ms']:.1f}, scan {semantic['avg_scan_ms']:.2f})"
+                + (", embeddings failing" if semantic["embed_failing"] else "")
+            )
+            docs = get_docs_index().stats()
+            self.docs_stats_action.setText(
+                f"Docs: {docs['files']} files, {docs['chunks']} chunks{'' if docs['vectors'] else ' (keywords only)'}, "
+                f"search {docs['avg_search_ms']:.1f} ms"
+            )
+
+    def docs_roots(self):
+        paths = self.options["docs_paths"]
+        if isinstance(paths, str):
+            paths = paths.split(";")
+        return [path.strip() for path in paths if path.strip()]
+
+    def reindex_docs(self, quiet=False):
+        if np is None or not self.options["docs_enabled"] or not self.docs_roots():
+            if not quiet:
+                self.error_display.setText("Turn on the docs index and add folders to it in Settings first.")
+            return
+        if self.docs_worker is not None:
+            return
+        worker = DocsIndexWorker(get_docs_index(), self.docs_roots(), self.api_url, self.options["embedding_model"])
+        worker.signals.progress.connect(lambda text: self.error_display.setText(text) if not quiet else None)
+        worker.signals.finished.connect(lambda result: self.handle_docs_indexed(worker, result, quiet))
+        worker.signals.failed.connect(lambda error: self.handle_docs_index_failed(worker, error))
+        self.docs_worker = worker
+        self.thread_pool.start(worker)
+
+    def handle_docs_indexed(self, worker, result, quiet):
+        self.docs_worker = None
+        print(f"[HoudiniChatBot] docs index v{result['version']}: {result['files']} files, {result['chunks']} chunks, "
+              f"{result['changed']} changed, {result['removed']} removed in {result['seconds']:.1f}s")
+        if not quiet or result["changed"] or result["removed"]:
+            self.error_display.setText(f"Docs index: {result['files']} files, {result['chunks']} chunks ({result['changed']} changed, {result['removed']} removed).")
+
+    def handle_docs_index_failed(self, worker, error):
+        self.docs_worker = None
+        self.error_display.setText(f"Docs indexing failed: {error}")
+
+    def regenerate_last_answer(self):
+        if self.request_in_progress:
+            return
+        for index in reversed(range(len(self.current_conversation))):
+            entry = self.current_conversation[index]
+            if entry.get("role") == "user":
+                self.error_display.setText("")
+                # The new answer takes the old one's place, so the next turn never sees two answers in a row
+                if index + 1 < len(self.current_conversation):
+                    self.regenerating = (self.current_conversation_id, index + 1)
+                self.start_request(entry["message"], cache_mode="refresh", history=self.current_conversation[:index])
+                return
 
     def send_message(self):
         self.error_display.setText("")
@@ -833,49 +4688,249 @@ class ChatbotPanel(QtWidgets.QWidget):
         if not message:
             return
     
-        timestamp = QtCore.QDateTime.currentDateTime().toString("hh:mm")
-        user_label = QtWidgets.QLabel(f"{message}   <span style='font-size:11px; color:#666666;'>{timestamp}</span>")
-        user_label.setObjectName("userMessage")
-        user_label.setProperty("class", "message user")
-        user_label.setTextFormat(QtCore.Qt.RichText)
-        user_label.setWordWrap(True)
-        self.add_message(user_label)
-    
-        self.current_conversation.append({"role": "user", "message": message})
         self.input_field.clear()
-    
+        if self.request_in_progress:
+            # Replies are shown one at a time, so later messages wait in a FIFO instead of blocking Send
+            item = self.transcript.add_item("user", message, timestamp="queued")
+            self.pending_requests.append({"message": message, "item": item, "conversation_id": self.current_conversation_id})
+            self.error_display.setText(f"Queued ({len(self.queued_here())} waiting)")
+            return
+        timestamp = QtCore.QDateTime.currentDateTime().toString("hh:mm")
+        self.add_message("user", message, timestamp=timestamp)
+        self.append_entry({"role": "user", "message": message})
+        self.start_request(message, history=self.current_conversation[:-1])
+
+    def start_next_request(self):
+        queued = self.queued_here()
+        if self.request_in_progress or not queued:
+            return
+        # Messages queued in another chat wait until that chat is open again
+        pending = queued[0]
+        self.pending_requests.remove(pending)
+        pending["item"]["timestamp"] = QtCore.QDateTime.currentDateTime().toString("hh:mm")
+        self.transcript.update_item(pending["item"])
+        self.append_entry({"role": "user", "message": pending["message"]})
+        self.start_request(pending["message"], history=self.current_conversation[:-1])
+
+    def start_request(self, message, cache_mode="use", history=()):
         self.start_thinking()  # show "thinking" immediately
     
-        self.send_button.setEnabled(False)
         self.cancel_button.show()
         self.request_in_progress = True
         self.cancel_requested = False
     
-        worker = AIWorker(message, self.api_url, self.model_name)
-        worker.signals.partial.connect(self.handle_partial_response)
-        worker.signals.finished.connect(self.handle_ai_response)
-        worker.signals.error.connect(self.handle_error)
+        # The scene goes into this turn only; history keeps the bare message so earlier turns stay cacheable
+        self.request_query = message
+        self.context_metrics = {}
+        context = self.prompt_context()
+        if context:
+            message = f"{context}\n\nUser request:\n{message}"
+        messages = None
+        if self.options["conversation_mode"]:
+            self.history_budget.num_ctx = self.options["num_ctx"]
+            self.history_budget.reserve = self.options["num_ctx_reserve"] + (self.options["docs_tokens"] if self.docs_lookup_enabled() else 0)
+            messages = self.history_budget.build_messages(history, message)
+        # Follow-up turns depend on the earlier answers, so only fresh questions are cached
+        if not self.options["response_cache_enabled"] or (messages and len(messages) > 2):
+            cache_mode = "bypass"
+        if cache_mode == "use" and self.options["semantic_cache_enabled"] and np is not None and not context:
+            lookup = SemanticLookupWorker(message, self.api_url, self.model_name, self.options["embedding_model"], self.options["semantic_cache_threshold"])
+            lookup.signals.hit.connect(lambda entry, score: self.handle_semantic_hit(lookup, message, messages, entry, score))
+            lookup.signals.miss.connect(lambda vector: self.handle_semantic_miss(lookup, message, messages, vector))
+            self.current_worker = lookup
+            self.thread_pool.start(lookup)
+            return
+        self.launch_worker(message, cache_mode, messages)
+
+    def docs_lookup_enabled(self):
+        return np is not None and self.options["docs_enabled"] and bool(self.docs_roots())
+
+    def prompt_context(self):
+        sections = []
+        if self.options["scene_context"]:
+            if self.scene_context is None:
+                self.scene_context = SceneContextProvider()
+            self.scene_context.token_budget = self.options["scene_context_tokens"]
+            sections.append(self.timed_context("scene context", self.scene_context.snapshot))
+        if self.options["geometry_context"]:
+            if self.geometry_summarizer is None:
+                self.geometry_summarizer = GeometrySummarizer()
+            self.geometry_summarizer.token_budget = self.options["geometry_context_tokens"]
+            sections.append(self.timed_context("geometry summary", self.geometry_summarizer.snapshot))
+        return "\n\n".join(section for section in sections if section)
+
+    def timed_context(self, label, snapshot):
+        start = time.perf_counter()
+        try:
+            context = snapshot()
+        except Exception as e:
+            print(f"[HoudiniChatBot] {label} unavailable: {e}")
+            return ""
+        # Reported with the request's telemetry once the worker finishes
+        name = label.replace(" ", "_")
+        self.context_metrics.update({f"{name}_tokens": estimate_tokens(context), f"{name}_ms": (time.perf_counter() - start) * 1000.0})
+        return context
+
+    def handle_semantic_hit(self, lookup, message, messages, entry, score):
+        if self.cancel_requested or lookup is not self.current_worker:
+            return
+        self.error_display.setText(f"Answered from semantic cache (similarity {score:.2f}).")
+        self.launch_worker(message, "use", messages, cached_entry=entry)
+
+    def handle_semantic_miss(self, lookup, message, messages, vector):
+        if self.cancel_requested or lookup is not self.current_worker:
+            return
+        self.launch_worker(message, "use", messages, embedding=vector)
+
+    def launch_worker(self, message, cache_mode, messages=None, cached_entry=None, embedding=None, tried=()):
+        scheduler = get_backend_scheduler()
+        scheduler.configure(self.backend_urls(), self.options["scheduler_policy"], self.options["breaker_threshold"], self.options["breaker_cooldown"])
+        # Cached answers are replayed locally, so they neither need a backend nor care about open breakers
+        api_url = None if cached_entry else scheduler.pick(exclude=tried)
+        if api_url is None and not cached_entry and not tried and cache_mode == "use":
+            cache = get_response_cache()
+            cached_entry = cache.get(response_cache_key(cache, self.model_name, message, get_docs_index() if self.docs_lookup_enabled() else None))
+        if api_url is None and not cached_entry:
+            # Every backend left has tripped its circuit breaker, so fail now instead of waiting on a timeout
+            if not tried:
+                retry_in = min([backend["retry_in"] for backend in scheduler.stats() if backend["state"] == "open"] or [0])
+                self.handle_error(f"All backends are failing; next retry in {retry_in:.0f}s. Hover the status dot for details.")
+            return False
+        if cached_entry:
+            api_url, scheduler = self.api_url, None
+        num_ctx = self.options["num_ctx"] if messages is not None else None
+        race_models = self.options["race_models"]
+        if isinstance(race_models, str):
+            race_models = [model.strip() for model in race_models.split(",") if model.strip()]
+        worker = AIWorker(message, api_url, self.model_name, cache=get_response_cache(), cache_mode=cache_mode,
+                          cached_entry=cached_entry, embedding=embedding, messages=messages, num_ctx=num_ctx,
+                          keep_alive=self.options["keep_alive"], scheduler=scheduler,
+                          hedge_delay=self.options["hedge_delay_ms"] / 1000.0, hedge_model=self.options["hedge_model"],
+                          race_models=race_models, connect_timeout=self.options["connect_timeout"],
+                          first_token_timeout=self.options["first_token_timeout"], token_timeout=self.options["token_timeout"],
+                          max_retries=self.options["max_retries"], retry_backoff=self.options["retry_backoff"],
+                          docs_index=get_docs_index() if self.docs_lookup_enabled() else None, docs_query=self.request_query,
+                          docs_top_k=self.options["docs_top_k"], docs_tokens=self.options["docs_tokens"],
+                          embedding_model=self.options["embedding_model"])
+        self.current_request = {"message": message, "cache_mode": cache_mode, "messages": messages,
+                                "cached_entry": cached_entry, "embedding": embedding, "tried": tuple(tried) + (api_url,),
+                                "answered_by": "", "stats": None}
+        self.request_started_warm = self.model_state == "loaded"
+        # Signals from a cancelled or replaced worker can still be queued, so each handler checks the sender
+        current = lambda handler: lambda *args: handler(*args) if worker is self.current_worker else None
+        worker.signals.first_token.connect(current(self.handle_first_token))
+        worker.signals.winner.connect(current(lambda url, model: self.handle_winner(worker, url, model)))
+        worker.signals.connection_lost.connect(self.handle_connection_lost)
+        worker.signals.partial.connect(current(self.handle_partial_response))
+        worker.signals.block_started.connect(current(self.handle_block_started))
+        worker.signals.block_delta.connect(current(self.handle_block_delta))
+        worker.signals.block_finished.connect(current(self.handle_block_finished))
+        worker.signals.stats.connect(current(self.handle_stats))
+        worker.signals.telemetry.connect(current(self.handle_telemetry))
+        worker.signals.finished.connect(current(self.handle_ai_response))
+        worker.signals.error.connect(current(lambda error_message: self.handle_worker_error(worker, error_message)))
         self.current_worker = worker
         self.thread_pool.start(worker)
+        return True
 
-    def handle_partial_response(self, partial_text):
+    def handle_worker_error(self, worker, error_message):
+        request = self.current_request
+        if not self.cancel_requested and not worker.output_started and request:
+            request["tried"] += tuple(attempt["api_url"] for attempt in worker.attempts)
+            remaining = [url for url in self.backend_urls() if url not in request["tried"]]
+            if remaining:
+                # Nothing has been shown yet, so the same request can move to another backend
+                self.error_display.setText(f"{worker.api_url} failed, retrying on another backend...")
+                if self.launch_worker(request["message"], request["cache_mode"], request["messages"],
+                                      request["cached_entry"], request["embedding"], tried=request["tried"]):
+                    return
+        self.handle_error(error_message)
+
+    def handle_winner(self, worker, api_url, model_name):
+        # A hedged request whose first attempt answered in time never raced anything, so it gets no label
+        if len(worker.attempts) < 2 or not self.current_request:
+            return
+        label = f"Answered by {model_name} on {urlparse(api_url).netloc}"
+        self.current_request["answered_by"] = label
+        self.current_request["answered_by_item"] = self.add_message("info", label)
+
+    def handle_partial_response(self, delta):
         if self.cancel_requested:
             return
     
         # As soon as AI starts sending any text, stop thinking
-        if self.thinking_label:
+        if self.thinking_item:
             self.stop_thinking()
     
-        # Display partial text in a dedicated label
-        if not hasattr(self, 'partial_label') or self.partial_label is None:
-            self.partial_label = QtWidgets.QLabel()
-            self.partial_label.setProperty("class", "message assistant")
-            self.partial_label.setTextFormat(QtCore.Qt.RichText)
-            self.partial_label.setWordWrap(True)
-            self.add_message(self.partial_label)
+        # Tokens are buffered and drawn by flush_stream at a fixed frame rate
+        if self.stream_item is None:
+            self.stream_item = self.add_message("assistant", "")
+            self.transcript.start_streaming(self.stream_item)
+            self.stream_timer.start()
     
-        self.partial_label.setText(partial_text)
+        self.transcript.stream_append(self.stream_item, delta)
+
+
+    def handle_block_started(self, index, language):
+        if self.cancel_requested:
+            return
+        if self.thinking_item:
+            self.stop_thinking()
+        # The editor is created as soon as the fence opens so code can be run mid-stream
+        self.flush_stream()
+        item = self.add_code_block("", language or "python")
+        item["streaming"] = True
+        self.stream_blocks.append({"language": language, "item": item})
+        self.stream_timer.start()
 
+    def handle_block_delta(self, index, delta):
+        if self.cancel_requested or index >= len(self.stream_blocks):
+            return
+        self.stream_code_pending.setdefault(index, []).append(delta)
+
+    def handle_block_finished(self, index, language, code):
+        if self.cancel_requested or index >= len(self.stream_blocks):
+            return
+        # The closing fence makes the block complete, so it is shown in full and its run buttons unlock right away
+        self.stream_code_pending.pop(index, None)
+        item = self.stream_blocks[index]["item"]
+        item["text"] = code
+        item["streaming"] = False
+        self.transcript.update_item(item)
+
+    def handle_stats(self, stats):
+        if "prompt_eval_duration" not in stats:
+            return
+        turns = max(len(self.current_conversation) - 1, 0) - self.history_budget.start
+        self.error_display.setText(
+            f"Prompt eval: {stats.get('prompt_eval_count', 0)} tokens in {stats['prompt_eval_duration'] / 1e6:.0f} ms "
+            f"({turns} earlier messages in context)"
+        )
+
+    def handle_telemetry(self, stats):
+        if not stats.get("cached"):
+            stats = dict(stats, **self.context_metrics)
+        if self.current_request is not None:
+            self.current_request["stats"] = stats
+        if not self.options["metrics_log_enabled"] or stats.get("cached"):
+            return
+        log = self.metrics_log()
+        record = {"time": time.time(), "host": socket.gethostname(), "user": os.environ.get("USER") or os.environ.get("USERNAME", "")}
+        if hasattr(hou, "applicationVersionString"):
+            record["houdini"] = hou.applicationVersionString()
+        record.update(stats)
+        log.append(record)
+
+    def metrics_log(self):
+        log = get_metrics_log()
+        path = self.options["metrics_log_path"] or os.path.join(os.path.expanduser("~"), ".houdini_ai_cache", "metrics.jsonl")
+        log.configure(os.path.expanduser(path), int(self.options["metrics_log_max_mb"] * 1024 * 1024))
+        return log
+
+    def show_metrics_summary(self):
+        # Averaged over everything still in the log, so slow models and overloaded backends stand out
+        self.add_message("output", format_metrics_summary(self.metrics_log().summary()))
+        self.transcript.scroll_to_bottom()
 
     def cancel_request(self):
         if self.request_in_progress and self.current_worker:
@@ -890,24 +4945,43 @@ class ChatbotPanel(QtWidgets.QWidget):
             return
     
         self.stop_thinking()
-        if hasattr(self, 'partial_label') and self.partial_label:
-            self.partial_label.setText(ai_response)
-            self.partial_label = None
-    
-        vex_match = re.search(r'```vex(.*?)```', ai_response, re.DOTALL)
-        if vex_match:
-            code_found = True
-            python_code = vex_match.group(1).strip()
+        reply_item = self.stream_item
+        if reply_item is None:
+            reply_item = self.add_message("assistant", ai_response)
+        self.finish_stream()
     
+        blocks = [{"language": block["language"], "code": block["item"]["text"]} for block in self.stream_blocks]
         entry = {"role": "assistant", "message": ai_response}
-        if code_found and python_code:
-            entry["code"] = python_code
-            entry["is_vex"] = bool(vex_match)
-    
-        self.current_conversation.append(entry)
+        if self.current_request and self.current_request["answered_by"]:
+            entry["answered_by"] = self.current_request["answered_by"]
+        stats = self.current_request["stats"] if self.current_request else None
+        if stats:
+            entry["stats"] = stats
+        if blocks:
+            entry["blocks"] = blocks
+        code, is_vex = primary_code_block(blocks)
+        if code_found and code:
+            entry["code"] = code
+            entry["is_vex"] = is_vex
     
-        if code_found and python_code:
-            self.add_code_block(python_code)
+        if self.regenerating is not None and self.regenerating[0] == self.current_conversation_id:
+            seq = self.regenerating[1]
+            for item in [item for item in self.transcript.transcript_model.items if item.get("seq") == seq]:
+                self.transcript.remove_item(item)
+            self.replace_entry(seq, entry)
+        else:
+            self.append_entry(entry)
+            seq = len(self.current_conversation) - 1
+        # Every row of the reply carries its message index, so a later regenerate can find and replace them
+        reply_items = [reply_item, self.current_request.get("answered_by_item") if self.current_request else None]
+        for block_index, block in enumerate(self.stream_blocks):
+            block["item"]["block"] = block_index
+            reply_items.extend((block["item"], block["item"].get("output_item")))
+        for item in reply_items:
+            if item is not None:
+                item["seq"] = seq
+        if stats and self.options["show_reply_stats"]:
+            self.add_message("stats", format_stats_line(stats), seq=seq)
     
         self.cleanup_after_request()
 
@@ -920,12 +4994,14 @@ class ChatbotPanel(QtWidgets.QWidget):
         self.cleanup_after_request()
 
     def clear_chat(self):
-        for i in reversed(range(self.chat_layout.count()-1)):
-            widget = self.chat_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
+        self.transcript.clear()
         self.error_display.setText("")
 
+    def report_queued_elsewhere(self):
+        waiting = len(self.pending_requests) - len(self.queued_here())
+        if waiting:
+            self.error_display.setText(f"{waiting} queued messages will be sent when their chat is open again")
+
     def export_chat(self):
         filename, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Chat", "", "Text Files (*.txt)")
         if filename:
@@ -942,26 +5018,28 @@ class ChatbotPanel(QtWidgets.QWidget):
         index = self.sidebar.row(item)
         if index < 0 or index >= len(self.conversations):
             return
-        conversation = self.conversations[index]["messages"]
+        self.open_conversation(self.conversations[index]["id"])
+
+    def open_conversation(self, conversation_id, focus_seq=None):
+        conversation = self.history_store.load_messages(conversation_id)
         self.clear_chat()
-        self.current_conversation = conversation.copy()
+        self.current_conversation = conversation
+        self.current_conversation_id = conversation_id
+        self.history_budget.reset()
+        for row, conv in enumerate(self.conversations):
+            if conv["id"] == conversation_id:
+                self.sidebar.setCurrentRow(row)
 
-        for entry in conversation:
-            timestamp = ""
-            if entry.get("role") == "user":
-                label = QtWidgets.QLabel(f"{entry.get('message')}   <span style='font-size:11px; color:#666666;'>{timestamp}</span>")
-                label.setProperty("class", "message user")
-                label.setTextFormat(QtCore.Qt.RichText)
-                label.setWordWrap(True)
-                self.add_message(label)
-            elif entry.get("role") == "assistant":
-                label = QtWidgets.QLabel(f"{entry.get('message')}   <span style='font-size:11px; color:#909090;'>{timestamp}</span>")
-                label.setProperty("class", "message assistant")
-                label.setTextFormat(QtCore.Qt.RichText)
-                label.setWordWrap(True)
-                self.add_message(label)
-                if entry.get("code", ""):
-                    self.add_code_block(entry.get("code"))
+        self.transcript.show_entries(conversation)
+        for pending in self.queued_here():
+            pending["item"] = self.transcript.add_item("user", pending["message"], timestamp="queued")
+        if self.queued_here():
+            QtCore.QTimer.singleShot(0, self.start_next_request)
+        self.report_queued_elsewhere()
+        if focus_seq is not None:
+            self.transcript.scroll_to_seq(focus_seq)
+        else:
+            self.transcript.scroll_to_bottom()
 
     def keyPressEvent(self, event):
         if (event.key() in [QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter]) and not (event.modifiers() & QtCore.Qt.ShiftModifier):
@@ -972,20 +5050,26 @@ class ChatbotPanel(QtWidgets.QWidget):
         super().keyPressEvent(event)
 
     def load_settings(self):
-        settings_path = os.path.join(os.path.expanduser("~"), ".houdini_ai_settings.json")
+        settings_path = get_settings_path()
         if os.path.exists(settings_path):
             try:
                 with open(settings_path, 'r') as f:
                     settings = json.load(f)
+                    self.api_url_configured = 'api_url' in settings
                     self.api_url = settings.get('api_url', self.api_url)
                     self.model_name = settings.get('model_name', self.model_name)
                     self.history_path = settings.get('history_path', '')
                     self.use_disk_storage = settings.get('use_disk_storage', False)
+                    for key in DEFAULT_OPTIONS:
+                        self.options[key] = settings.get(key, self.options[key])
             except:
                 pass
+        keep_alive = normalize_keep_alive(self.options["keep_alive"])
+        self.options["keep_alive"] = DEFAULT_OPTIONS["keep_alive"] if keep_alive is None else keep_alive
+        get_http_client().configure(self.options["http_pool_connections"], self.options["http_pool_maxsize"])
+        get_response_cache().configure(self.options["response_cache_max_mb"] * 1048576, self.options["response_cache_max_age_days"] * 86400)
 
     def save_settings(self):
-        settings_path = os.path.join(os.path.expanduser("~"), ".houdini_ai_settings.json")
         try:
             settings = {
                 'api_url': self.api_url,
@@ -993,81 +5077,101 @@ class ChatbotPanel(QtWidgets.QWidget):
                 'history_path': self.history_path,
                 'use_disk_storage': self.use_disk_storage
             }
-            with open(settings_path, 'w') as f:
-                json.dump(settings, f)
+            settings.update(self.options)
+            update_settings_file(settings)
         except:
             pass
 
     def load_chat_history(self):
-        if self.use_disk_storage and self.history_path:
-            history_file = os.path.join(self.history_path, "houdini_ai_chat_history.json")
-            try:
-                if os.path.exists(history_file):
-                    with open(history_file, 'r') as f:
-                        self.conversations = json.load(f)
-                else:
-                    self.conversations = []
-            except:
-                self.conversations = []
-        else:
-            if hasattr(hou.session, "ai_chat_history"):
-                self.conversations = hou.session.ai_chat_history
-            else:
-                self.conversations = []
-
-    def save_chat_history(self):
+        if self.history_store is not None:
+            self.history_store.close()
+        self.history_store = None
         if self.use_disk_storage and self.history_path:
             try:
                 if not os.path.exists(self.history_path):
                     os.makedirs(self.history_path)
-                history_file = os.path.join(self.history_path, "houdini_ai_chat_history.json")
-                with open(history_file, 'w') as f:
-                    json.dump(self.conversations, f)
-            except:
-                pass
-        else:
-            hou.session.ai_chat_history = self.conversations
+                self.history_store = SQLiteHistoryStore(
+                    os.path.join(self.history_path, "houdini_ai_chat_history.sqlite"),
+                    legacy_json_path=os.path.join(self.history_path, "houdini_ai_chat_history.json"),
+                    legacy_conversations=getattr(hou.session, "ai_chat_history", None),
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"[HoudiniChatBot] Could not open chat history database: {e}")
+        if self.history_store is None:
+            self.history_store = SessionHistoryStore()
 
     def open_settings(self):
-        dialog = SettingsDialog(self, self.api_url, self.model_name, self.history_path, self.use_disk_storage)
+        dialog = SettingsDialog(self, self.api_url, self.model_name, self.history_path, self.use_disk_storage, self.options, self.available_models)
         if dialog.exec_():
+            previous_model = (self.api_url, self.model_name, self.options["keep_alive"])
+            previous_storage = (self.history_path, self.use_disk_storage)
+            previous_docs = (self.options["docs_enabled"], self.docs_roots())
             self.api_url, self.model_name, self.history_path, self.use_disk_storage = dialog.get_settings()
+            self.options.update(dialog.get_options())
+            if (self.api_url, self.model_name, self.options["keep_alive"]) != previous_model:
+                self.warm_up_model()
             self.save_settings()
-            self.load_chat_history()
-            self.sidebar.clear()
-            for conv in self.conversations:
-                self.sidebar.addItem(conv["title"])
-            info_label = QtWidgets.QLabel("Settings updated.")
-            info_label.setStyleSheet("background-color: #2d2d2d; color: #e0e0e0; padding: 8px 12px; border: 1px solid #404040; border-radius: 4px; text-align: center;")
-            info_label.setAlignment(QtCore.Qt.AlignCenter)
-            self.add_message(info_label)
+            if (self.options["docs_enabled"], self.docs_roots()) != previous_docs:
+                self.reindex_docs(quiet=True)
+            if (self.history_path, self.use_disk_storage) != previous_storage:
+                self.load_chat_history()
+                self.current_conversation_id = None
+                if self.current_conversation:
+                    # Carry the open chat over so it keeps being saved in the new location
+                    self.current_conversation_id = self.history_store.create_conversation(conversation_title(self.current_conversation))
+                    for entry in self.current_conversation:
+                        self.history_store.append_message(self.current_conversation_id, entry)
+                self.reload_sidebar()
+            self.add_message("info", "Settings updated.")
 
     def new_chat(self):
-        if self.current_conversation:
-            first_msg = ""
-            for entry in self.current_conversation:
-                if entry.get("role") == "user":
-                    first_msg = entry.get("message")
-                    break
-            title = (first_msg[:20] + "...") if first_msg else "New Chat"
-            self.conversations.append({"title": title, "messages": self.current_conversation})
-            self.sidebar.addItem(title)
-            self.save_chat_history()
+        # Messages are stored as they are added, so starting over only resets the view
         self.clear_chat()
         self.current_conversation = []
+        self.current_conversation_id = None
+        self.history_budget.reset()
+        self.report_queued_elsewhere()
 
     def closeEvent(self, event):
-        if self.current_conversation:
-            first_msg = ""
-            for entry in self.current_conversation:
-                if entry.get("role") == "user":
-                    first_msg = entry.get("message")
-                    break
-            title = (first_msg[:20] + "...") if first_msg else "New Chat"
-            self.conversations.append({"title": title, "messages": self.current_conversation})
-            self.sidebar.addItem(title)
-            self.save_chat_history()
+        if self.current_worker is not None:
+            # Signals the worker has already queued are dropped once it is no longer current
+            self.current_worker.cancel()
+            self.current_worker = None
+            self.request_in_progress = False
+        self.pending_requests.clear()
+        if self.docs_worker is not None:
+            self.docs_worker.cancel()
+        if self.scene_context is not None:
+            self.scene_context.close()
+            self.scene_context = None
+        if self.history_store is not None:
+            self.history_store.close()
+            self.history_store = None
         event.accept()
 
+def benchmark_panel_startup(runs=5, discovery_timeout=10.0):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    totals = OrderedDict()
+    for _ in range(runs):
+        start = time.perf_counter()
+        panel = ChatbotPanel()
+        first_paint_ms = (time.perf_counter() - start) * 1000.0
+        deadline = time.perf_counter() + discovery_timeout
+        while panel.discovery_worker is not None and time.perf_counter() < deadline:
+            app.processEvents()
+            time.sleep(0.005)
+        timings = OrderedDict(panel.startup_timings)
+        timings["constructor total"] = first_paint_ms
+        for name, value in timings.items():
+            totals[name] = totals.get(name, 0.0) + value
+        panel.keep_alive_timer.stop()
+        panel.deleteLater()
+    app.processEvents()
+    results = OrderedDict((name, value / runs) for name, value in totals.items())
+    print(f"Panel startup over {runs} runs (mean ms per phase):")
+    for name, value in results.items():
+        print(f"  {name:<24} {value:8.2f} ms")
+    return results
+
 def createInterface():
     return ChatbotPanel()
@@ -0,0 +1,365 @@
+"""Headless latency benchmarks for HoudiniChatBot against the bundled mock Ollama server.
+
+Runs outside Houdini with the offscreen Qt platform and a stubbed `hou` module, so it
+works on any machine with PySide2. Settings and caches go to a temporary home
+directory, so the user's real settings are never touched. Results are printed as a
+table and written as JSON. `--compare` checks them against an earlier run and exits
+non-zero on regressions.
+
+    python benchmark_chatbot.py --runs 10 --output bench.json
+    python benchmark_chatbot.py --compare baseline.json --tolerance 0.25
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide2 import QtCore, QtWidgets, __version__ as pyside_version
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def install_stub_hou():
+    try:
+        import hou  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    hou = types.ModuleType("hou")
+    hou.session = types.SimpleNamespace()
+    hou.selectedNodes = lambda: ()
+    hou.node = lambda path: None
+    hou.NetworkEditor = type("NetworkEditor", (), {})
+    hou.Vector2 = lambda x, y: (x, y)
+    hou.ui = types.SimpleNamespace(paneTabs=lambda: ())
+    hou.undos = types.SimpleNamespace(group=lambda label: contextlib.nullcontext())
+    sys.modules["hou"] = hou
+    return True
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda fraction: ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": ordered[-1], "mean": sum(ordered) / len(ordered), "n": len(ordered)}
+
+
+def wait_until(app, predicate, timeout):
+    # A real event loop sleeps in the dispatcher when idle, so main-thread CPU time only counts actual UI work
+    deadline = time.perf_counter() + timeout
+    loop = QtCore.QEventLoop()
+    timer = QtCore.QTimer()
+    timer.timeout.connect(lambda: loop.quit() if predicate() or time.perf_counter() > deadline else None)
+    timer.start(10)
+    if not predicate():
+        loop.exec_()
+    timer.stop()
+    app.processEvents()
+    return predicate()
+
+
+def bench_worker(app, bot, server, runs, chat):
+    ttft, total, rates, errors = [], [], [], 0
+    model = server.config.models[0]
+    for _ in range(runs):
+        state = {"first": None, "done": None, "tokens": 0, "error": None}
+        messages = [{"role": "system", "content": bot.HOUDINI_CONTEXT}, {"role": "user", "content": "Scatter points on a grid"}] if chat else None
+        worker = bot.AIWorker("Scatter points on a grid", f"{server.url}/api/generate", model, messages=messages)
+        worker.setAutoDelete(False)
+
+        def on_partial(token, state=state):
+            state["tokens"] += 1
+            if state["first"] is None:
+                state["first"] = time.perf_counter()
+
+        worker.signals.partial.connect(on_partial)
+        worker.signals.finished.connect(lambda *args, state=state: state.update(done=time.perf_counter()))
+        worker.signals.error.connect(lambda message, state=state: state.update(error=message, done=time.perf_counter()))
+        start = time.perf_counter()
+        QtCore.QThreadPool.globalInstance().start(worker)
+        wait_until(app, lambda: state["done"] is not None, 60)
+        if state["error"] or state["first"] is None or state["done"] is None:
+            errors += 1
+            continue
+        ttft.append((state["first"] - start) * 1000.0)
+        total.append((state["done"] - start) * 1000.0)
+        if state["done"] > state["first"]:
+            rates.append(state["tokens"] / (state["done"] - state["first"]))
+    return {"ttft_ms": percentiles(ttft), "end_to_end_ms": percentiles(total), "tokens_per_second": percentiles(rates), "errors": errors}
+
+
+def bench_panel(app, bot, server, runs):
+    panel = bot.createInterface()
+    panel.show()
+    # Discovery may otherwise replace the endpoint with a real local Ollama
+    wait_until(app, lambda: panel.discovery_worker is None, 15)
+    panel.api_url = f"{server.url}/api/generate"
+    panel.api_url_configured = True
+    panel.model_name = server.config.models[0]
+    panel.options["response_cache_enabled"] = False
+    panel.options["semantic_cache_enabled"] = False
+    ttft, total, ui_per_token, handler_per_token, errors = [], [], [], [], 0
+    for _ in range(runs):
+        panel.new_chat()
+        state = {"first": None, "done": None, "tokens": 0, "handler_seconds": 0.0}
+        original, original_done = panel.handle_partial_response, panel.handle_ai_response
+
+        def timed_partial(delta, state=state):
+            begin = time.perf_counter()
+            if state["first"] is None:
+                state["first"] = begin
+            state["tokens"] += 1
+            original(delta)
+            state["handler_seconds"] += time.perf_counter() - begin
+
+        def timed_done(*args, state=state):
+            original_done(*args)
+            state["done"] = time.perf_counter()
+
+        # launch_worker connects to the attributes, so the instance overrides are what get called
+        panel.handle_partial_response, panel.handle_ai_response = timed_partial, timed_done
+        panel.input_field.setPlainText("Scatter points on a grid and copy spheres onto them")
+        start_cpu, start = time.thread_time(), time.perf_counter()
+        panel.send_message()
+        finished = wait_until(app, lambda: not panel.request_in_progress, 60)
+        end_cpu = time.thread_time()
+        del panel.handle_partial_response, panel.handle_ai_response
+        if not finished or state["first"] is None or state["done"] is None:
+            errors += 1
+            continue
+        ttft.append((state["first"] - start) * 1000.0)
+        total.append((state["done"] - start) * 1000.0)
+        # Main-thread CPU covers the handlers, stream timer flushes, layout and painting
+        ui_per_token.append((end_cpu - start_cpu) * 1000.0 / state["tokens"])
+        handler_per_token.append(state["handler_seconds"] * 1000.0 / state["tokens"])
+    panel.keep_alive_timer.stop()
+    panel.close()
+    panel.deleteLater()
+    app.processEvents()
+    return {"ttft_ms": percentiles(ttft), "end_to_end_ms": percentiles(total), "ui_ms_per_token": percentiles(ui_per_token),
+            "handler_ms_per_token": percentiles(handler_per_token), "errors": errors}
+
+
+SEARCH_SENTENCES = (
+    "Scatter points on the grid and copy spheres onto them with a copy to points SOP.",
+    "Set pscale in a point wrangle so every copy gets a random size.",
+    "Use a VEX wrangle with noise on @P to displace the grid.",
+    "The vel attribute drives motion blur and the POP solver.",
+    "Group the primitives by normal and delete the ones facing down.",
+    "A for-each loop over connected pieces lets you pack each piece.",
+    "Cache the simulation to disk with a file cache node before rendering.",
+    "The pyro solver reads density, temperature and vel fields from the source volume.",
+    "Try an attribute promote to move the value from points to detail.",
+    "Python can build the network with hou.node('/obj').createNode('geo').",
+    "Increase the substeps on the FLIP solver if particles leak through the collider.",
+    "UV unwrap the mesh, then layout the islands so the texture does not stretch.",
+)
+SEARCH_QUERIES = ("s", "sc", "scatter", "scatter points", "vel", "wrangle noise grid", "pyro density", "hou.node createNode")
+
+
+def bench_search(bot, directory, message_count, runs, messages_per_conversation=50):
+    os.makedirs(directory, exist_ok=True)
+    store = bot.SQLiteHistoryStore(os.path.join(directory, "search_history.sqlite"))
+    rng = random.Random(0)
+    begin = time.perf_counter()
+    # One transaction, like the JSON migration; appending 100k messages one commit at a time would dominate the run
+    with store.connection:
+        for index in range(message_count):
+            if index % messages_per_conversation == 0:
+                conversation_id = store._insert_conversation(f"Search chat {index // messages_per_conversation}")
+            seq = index % messages_per_conversation
+            entry = {"role": "user" if seq % 2 == 0 else "assistant",
+                     "message": " ".join(rng.sample(SEARCH_SENTENCES, 3)) + f" Take {rng.randint(0, 9999)}."}
+            store._insert_message(conversation_id, seq, entry)
+    build_ms = (time.perf_counter() - begin) * 1000.0
+    results, search = {}, []
+    for query in SEARCH_QUERIES:
+        samples = []
+        for _ in range(runs):
+            begin = time.perf_counter()
+            store.search(query)
+            samples.append((time.perf_counter() - begin) * 1000.0)
+        search.extend(samples)
+        results["search_" + re.sub(r"\W+", "_", query).strip("_") + "_ms"] = percentiles(samples)
+    store.close()
+    results.update({"search_ms": percentiles(search), "search_build_ms": build_ms, "search_messages": message_count})
+    return results
+
+
+def bench_history(app, bot, directory, conversations, messages, search_messages=100000, runs=10):
+    os.makedirs(directory, exist_ok=True)
+    store = bot.SQLiteHistoryStore(os.path.join(directory, "houdini_ai_chat_history.sqlite"))
+    append = []
+    for index in range(conversations):
+        conversation_id = store.create_conversation(f"Benchmark chat {index}")
+        for seq in range(messages):
+            entry = {"role": "user" if seq % 2 == 0 else "assistant",
+                     "message": f"Message {seq}: scatter points, copy spheres and set pscale. " * 6}
+            begin = time.perf_counter()
+            store.append_message(conversation_id, entry)
+            append.append((time.perf_counter() - begin) * 1000.0)
+    begin = time.perf_counter()
+    listed = store.list_conversations()
+    list_ms = (time.perf_counter() - begin) * 1000.0
+    load = []
+    for conversation in listed[:20]:
+        begin = time.perf_counter()
+        store.load_messages(conversation["id"])
+        load.append((time.perf_counter() - begin) * 1000.0)
+    store.close()
+    panel = bot.createInterface()
+    wait_until(app, lambda: panel.discovery_worker is None, 15)
+    panel.history_path, panel.use_disk_storage = directory, True
+    begin = time.perf_counter()
+    panel.load_chat_history()
+    panel.reload_sidebar()
+    open_store_ms = (time.perf_counter() - begin) * 1000.0
+    begin = time.perf_counter()
+    panel.open_conversation(listed[0]["id"])
+    app.processEvents()
+    open_conversation_ms = (time.perf_counter() - begin) * 1000.0
+    panel.keep_alive_timer.stop()
+    panel.close()
+    panel.deleteLater()
+    app.processEvents()
+    results = {"append_ms": percentiles(append), "list_conversations_ms": list_ms, "load_messages_ms": percentiles(load),
+               "panel_open_history_ms": open_store_ms, "panel_open_conversation_ms": open_conversation_ms,
+               "conversations": conversations, "messages_per_conversation": messages}
+    if search_messages:
+        results.update(bench_search(bot, os.path.join(directory, "search"), search_messages, runs))
+    return results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    current, previous = flatten(results), flatten(baseline.get("results", {}))
+    regressions = []
+    for name, value in sorted(current.items()):
+        old = previous.get(name)
+        # Only latencies are compared, and only their typical and tail values
+        if old is None or not name.split(".")[-1] in ("p50", "p95", "mean") or "_ms" not in name:
+            continue
+        if old > 0 and value > old * (1.0 + tolerance):
+            regressions.append(f"{name}: {old:.2f} -> {value:.2f} ms (+{(value / old - 1.0) * 100:.0f}%)")
+    return regressions
+
+
+def print_summary(results):
+    for section, metrics in results.items():
+        print(section, file=sys.stderr)
+        for name, value in metrics.items():
+            if isinstance(value, dict) and value:
+                print(f"  {name:<28} p50 {value['p50']:9.2f}  p95 {value['p95']:9.2f}  mean {value['mean']:9.2f}  (n={value['n']})", file=sys.stderr)
+            elif isinstance(value, float):
+                print(f"  {name:<28} {value:9.2f}", file=sys.stderr)
+            elif not isinstance(value, dict):
+                print(f"  {name:<28} {value}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--replay", help="Stream recordings from mock_ollama.py --record-to instead of synthetic text")
+    parser.add_argument("--history-conversations", type=int, default=200)
+    parser.add_argument("--history-messages", type=int, default=40)
+    parser.add_argument("--search-messages", type=int, default=100000, help="Size of the history searched by the search benchmark, 0 to skip it")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="houdini_chatbot_bench_")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    stubbed = install_stub_hou()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import mock_ollama
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    import_start = time.perf_counter()
+    import HoudiniChatBot as bot
+    import_ms = (time.perf_counter() - import_start) * 1000.0
+
+    config = mock_ollama.MockConfig(tokens_per_second=args.tokens_per_second, first_token_delay=args.first_token_delay,
+                                    jitter=args.jitter, replay_path=args.replay)
+    server = mock_ollama.MockOllamaServer(config).start()
+    try:
+        results = {
+            "startup": {"import_ms": import_ms},
+            "worker_generate": bench_worker(app, bot, server, args.runs, chat=False),
+            "worker_chat": bench_worker(app, bot, server, args.runs, chat=True),
+            "panel": bench_panel(app, bot, server, args.runs),
+            "history": bench_history(app, bot, os.path.join(home, "history"), args.history_conversations, args.history_messages,
+                                     args.search_messages, args.runs),
+        }
+        startup = bot.benchmark_panel_startup(runs=3, discovery_timeout=15)
+        results["startup"].update({re.sub(r"\W+", "_", name).strip("_") + "_ms": value for name, value in startup.items()})
+        # Tracing slows every allocation, so peak memory gets its own pass after the timed ones
+        tracemalloc.start()
+        bench_panel(app, bot, server, min(args.runs, 3))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        server.stop()
+    results["memory"] = {"python_peak_mb": peak / 1048576.0}
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 1048576.0 if sys.platform == "darwin" else 1024.0
+        results["memory"]["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+    report = {
+        "schema": 1,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pyside": pyside_version,
+        "stub_hou": stubbed,
+        "config": {"runs": args.runs, "tokens_per_second": args.tokens_per_second, "first_token_delay": args.first_token_delay,
+                   "jitter": args.jitter, "replay": args.replay,
+                   "tokens_per_reply": None if args.replay else len(mock_ollama.split_tokens(config.text))},
+        "results": results,
+    }
+    print_summary(results)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
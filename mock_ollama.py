@@ -0,0 +1,368 @@
+"""Local stand-in for the Ollama HTTP API, for benchmarking the panel without a GPU.
+
+Serves /api/generate, /api/chat, /api/embeddings, /api/embed, /api/tags and /api/ps.
+Replies stream as NDJSON at a configurable token rate, with optional cold-load and
+first-token delays and injected failures. It can also proxy a real Ollama server,
+record the streams it sees, and replay them later with their original timing.
+
+    python mock_ollama.py --port 11434 --tokens-per-second 40 --first-token-delay 0.2
+    python mock_ollama.py --record-from http://gpu-box:11434 --record-to streams.jsonl
+    python mock_ollama.py --replay streams.jsonl --replay-speed 2
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import random
+import re
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_TEXT = (
+    "Here is a script that scatters points on a grid and copies spheres onto them:\n"
+    "```python\n"
+    "import hou\n"
+    "geo = hou.node('/obj').createNode('geo', 'scatter_demo')\n"
+    "grid = geo.createNode('grid')\n"
+    "scatter = geo.createNode('scatter')\n"
+    "scatter.setInput(0, grid)\n"
+    "scatter.parm('npts').set(500)\n"
+    "sphere = geo.createNode('sphere')\n"
+    "copy = geo.createNode('copytopoints')\n"
+    "copy.setInput(0, sphere)\n"
+    "copy.setInput(1, scatter)\n"
+    "copy.setDisplayFlag(True)\n"
+    "geo.layoutChildren()\n"
+    "```\n"
+    "And a wrangle to randomize the scale:\n"
+    "```vex\n"
+    "f@pscale = fit01(rand(@ptnum), 0.05, 0.2);\n"
+    "```\n"
+    "Lower `npts` if the viewport gets slow."
+)
+FAILURE_MODES = ("refuse", "busy", "error", "drop", "stall")
+
+
+def split_tokens(text):
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+def hash_embedding(text, dim):
+    # Bag-of-words hashing gives stable vectors where shared words mean higher similarity
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dim] += 1.0
+    return vector
+
+
+class MockConfig:
+    def __init__(self, models=("qwen2.5-coder:32b",), text=DEFAULT_TEXT, tokens_per_second=50.0, first_token_delay=0.05,
+                 load_delay=0.0, jitter=0.0, failure=None, failure_rate=1.0, failure_after=5, stall_seconds=30.0, failure_limit=None,
+                 embedding_dim=64, upstream=None, record_path=None, replay_path=None, replay_speed=1.0):
+        self.models = list(models)
+        self.text = text
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self.load_delay = load_delay
+        self.jitter = jitter
+        self.failure = failure
+        self.failure_rate = failure_rate
+        self.failure_after = failure_after
+        self.stall_seconds = stall_seconds
+        self.failure_limit = failure_limit
+        self.embedding_dim = embedding_dim
+        self.upstream = upstream
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+
+
+class MockOllamaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Without this, small NDJSON writes wait on delayed ACKs and every token looks 40 ms late
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, obj, status=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        config = self.server.config
+        if self.path.startswith("/api/tags"):
+            self.send_json({"models": [{"name": name, "model": name} for name in config.models]})
+        elif self.path.startswith("/api/ps"):
+            self.send_json({"models": [{"name": name, "model": name} for name in sorted(self.server.loaded)]})
+        elif self.path.startswith("/api/version"):
+            self.send_json({"version": "0.0.0-mock"})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.record_request(self.path, request)
+        if self.path.startswith("/api/embeddings"):
+            self.send_json({"embedding": hash_embedding(request.get("prompt", ""), self.server.config.embedding_dim)})
+        elif self.path.startswith("/api/embed"):
+            inputs = request.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self.send_json({"model": request.get("model", ""), "embeddings": [hash_embedding(text, self.server.config.embedding_dim) for text in inputs]})
+        elif self.path.startswith(("/api/generate", "/api/chat")):
+            if self.server.config.upstream:
+                self.proxy(request)
+            elif self.server.recordings:
+                self.replay(request)
+            else:
+                self.generate(request)
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def pick_failure(self):
+        config = self.server.config
+        if config.failure in FAILURE_MODES and random.random() < config.failure_rate:
+            # A limit makes a server recover after a few failures, which is how retries and breakers get exercised
+            with self.server._lock:
+                if config.failure_limit is not None and self.server.failures >= config.failure_limit:
+                    return None
+                self.server.failures += 1
+            return config.failure
+        return None
+
+    def generate(self, request):
+        config = self.server.config
+        chat = self.path.startswith("/api/chat")
+        model = request.get("model", "")
+        prompt = request.get("prompt", "") if not chat else (request.get("messages") or [{}])[-1].get("content", "")
+        start = time.perf_counter()
+        failure = self.pick_failure()
+        if failure == "refuse":
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if failure == "busy":
+            self.send_json({"error": "server busy, please try again"}, 503)
+            return
+        if failure == "error":
+            self.send_json({"error": f"model '{model}' failed to run"}, 500)
+            return
+        load_seconds = 0.0
+        if model not in self.server.loaded:
+            load_seconds = config.load_delay
+            time.sleep(load_seconds)
+            if request.get("keep_alive") not in (0, "0"):
+                self.server.loaded.add(model)
+        if not chat and not prompt:
+            # An empty prompt only loads the model, which the panel uses for warm-up
+            self.send_json({"model": model, "response": "", "done": True, "done_reason": "load", "load_duration": int(load_seconds * 1e9)})
+            return
+        tokens = split_tokens(config.text)
+        if request.get("stream", True) is False:
+            time.sleep(config.first_token_delay + len(tokens) / max(config.tokens_per_second, 1e-6))
+            self.send_json(self.final_chunk(chat, model, prompt, len(tokens), start, load_seconds, config.text))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(config.first_token_delay)
+        prompt_done = time.perf_counter()
+        try:
+            for index, token in enumerate(tokens):
+                if failure == "drop" and index == config.failure_after:
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                if failure == "stall" and index == config.failure_after:
+                    time.sleep(config.stall_seconds)
+                if index:
+                    delay = 1.0 / max(config.tokens_per_second, 1e-6)
+                    time.sleep(max(0.0, delay * (1.0 + random.uniform(-config.jitter, config.jitter))))
+                self.write_chunk({"model": model, "message": {"role": "assistant", "content": token}, "done": False} if chat
+                                 else {"model": model, "response": token, "done": False})
+            final = self.final_chunk(chat, model, prompt, len(tokens), start, load_seconds)
+            final["prompt_eval_duration"] = int((prompt_done - start - load_seconds) * 1e9)
+            final["eval_duration"] = int((time.perf_counter() - prompt_done) * 1e9)
+            self.write_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled or hedged this request away
+            self.close_connection = True
+
+    def final_chunk(self, chat, model, prompt, token_count, start, load_seconds, text=""):
+        elapsed = time.perf_counter() - start
+        final = {"model": model, "done": True, "done_reason": "stop", "total_duration": int(elapsed * 1e9),
+                 "load_duration": int(load_seconds * 1e9), "prompt_eval_count": max(1, len(prompt) // 4),
+                 "prompt_eval_duration": int(self.server.config.first_token_delay * 1e9), "eval_count": token_count,
+                 "eval_duration": int(max(0.0, elapsed - load_seconds - self.server.config.first_token_delay) * 1e9)}
+        if chat:
+            final["message"] = {"role": "assistant", "content": text}
+        else:
+            final["response"] = text
+            final["context"] = [1, 2, 3]
+        return final
+
+    def proxy(self, request):
+        upstream = self.server.config.upstream.rstrip("/") + self.path
+        upstream_request = urllib.request.Request(upstream, data=json.dumps(request).encode("utf-8"), headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        lines = []
+        try:
+            response = urllib.request.urlopen(upstream_request, timeout=600)
+        except urllib.error.HTTPError as e:
+            self.send_json({"error": e.read().decode("utf-8", errors="replace")}, e.code)
+            return
+        with response:
+            self.send_response(response.status)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for line in response:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                lines.append([time.perf_counter() - start, obj])
+                self.write_chunk(obj)
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+        self.server.save_recording({"path": self.path.split("?")[0], "request": request, "lines": lines})
+
+    def replay(self, request):
+        recording = self.server.find_recording(self.path.split("?")[0], request)
+        if recording is None:
+            self.send_json({"error": "no recorded stream for this endpoint"}, 404)
+            return
+        speed = max(self.server.config.replay_speed, 1e-6)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        start = time.perf_counter()
+        try:
+            for offset, obj in recording["lines"]:
+                delay = offset / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                self.write_chunk(obj)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class MockOllamaServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), MockOllamaHandler)
+        self.config = config or MockConfig()
+        self.loaded = set()
+        self.requests = []
+        self.recordings = []
+        self.replay_index = 0
+        self.failures = 0
+        self.thread = None
+        self._lock = threading.Lock()
+        if self.config.replay_path:
+            with open(self.config.replay_path, "r", encoding="utf-8") as f:
+                self.recordings = [json.loads(line) for line in f if line.strip()]
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def record_request(self, path, request):
+        with self._lock:
+            self.requests.append((time.time(), path, request))
+
+    def save_recording(self, recording):
+        if not self.config.record_path:
+            return
+        with self._lock:
+            with open(self.config.record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(recording) + "\n")
+
+    def find_recording(self, path, request):
+        key = request.get("prompt") or request.get("messages")
+        with self._lock:
+            candidates = [recording for recording in self.recordings if recording["path"] == path]
+            if not candidates:
+                return None
+            for recording in candidates:
+                if (recording["request"].get("prompt") or recording["request"].get("messages")) == key:
+                    return recording
+            # Unknown prompts cycle through what was captured, so any question gets realistic timing
+            self.replay_index += 1
+            return candidates[self.replay_index % len(candidates)]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", action="append", dest="models", help="Model name to advertise (repeatable)")
+    parser.add_argument("--text-file", help="File whose contents are streamed as every reply")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="Simulated prompt evaluation time in seconds")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Extra delay the first time each model is used")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative random variation of the token interval")
+    parser.add_argument("--failure", choices=FAILURE_MODES)
+    parser.add_argument("--failure-rate", type=float, default=1.0)
+    parser.add_argument("--failure-after", type=int, default=5, help="Token index at which drop and stall failures happen")
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    parser.add_argument("--failure-limit", type=int, help="Only fail this many requests, then answer normally")
+    parser.add_argument("--embedding-dim", type=int, default=64)
+    parser.add_argument("--record-from", help="Proxy generate/chat requests to this Ollama server")
+    parser.add_argument("--record-to", help="Append proxied streams to this JSONL file")
+    parser.add_argument("--replay", help="Serve streams from a JSONL file written by --record-to")
+    parser.add_argument("--replay-speed", type=float, default=1.0)
+    args = parser.parse_args()
+    text = DEFAULT_TEXT
+    if args.text_file:
+        with open(args.text_file, "r", encoding="utf-8") as f:
+            text = f.read()
+    config = MockConfig(models=args.models or ["qwen2.5-coder:32b"], text=text, tokens_per_second=args.tokens_per_second,
+                        first_token_delay=args.first_token_delay, load_delay=args.load_delay, jitter=args.jitter,
+                        failure=args.failure, failure_rate=args.failure_rate, failure_after=args.failure_after,
+                        stall_seconds=args.stall_seconds, failure_limit=args.failure_limit, embedding_dim=args.embedding_dim, upstream=args.record_from,
+                        record_path=args.record_to, replay_path=args.replay, replay_speed=args.replay_speed)
+    server = MockOllamaServer(config, args.host, args.port)
+    print(f"Mock Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import contextlib
+import os
+import sys
+import time
+import types
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def install_fake_hou():
+    if "hou" in sys.modules:
+        return sys.modules["hou"]
+    hou = types.ModuleType("hou")
+    hou.session = types.SimpleNamespace()
+    hou.selectedNodes = lambda: ()
+    hou.node = lambda path: None
+    hou.NetworkEditor = type("NetworkEditor", (), {})
+    hou.Vector2 = lambda x, y: (x, y)
+    hou.ui = types.SimpleNamespace(paneTabs=lambda: ())
+    hou.undos = types.SimpleNamespace(group=lambda label: contextlib.nullcontext())
+    hou.attribData = types.SimpleNamespace(**{name: types.SimpleNamespace(name=lambda name=name: name)
+                                              for name in ("Int", "Float", "String", "Dict")})
+    sys.modules["hou"] = hou
+    return hou
+
+
+install_fake_hou()
+
+
+@pytest.fixture
+def bot():
+    import HoudiniChatBot
+    return HoudiniChatBot
+
+
+@pytest.fixture
+def fake_hou():
+    return sys.modules["hou"]
+
+
+@pytest.fixture
+def home(bot, tmp_path, monkeypatch):
+    # Settings and caches are written under the home directory, so the cache singletons start over too
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    for name in ("_response_cache", "_semantic_cache", "_docs_index", "_metrics_log"):
+        monkeypatch.setattr(bot, name, None)
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PySide2 import QtWidgets
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def wait_until(app, predicate, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate() and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    app.processEvents()
+    return predicate()
+
+
+@pytest.fixture
+def mock_server():
+    from mock_ollama import MockConfig, MockOllamaServer
+    servers = []
+
+    def start(**config):
+        server = MockOllamaServer(MockConfig(**config)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def scheduler(bot, monkeypatch):
+    # Backend health is process-wide, so every test starts from a fresh scheduler
+    monkeypatch.setattr(bot, "_backend_scheduler", None)
+    return bot.get_backend_scheduler()
+
+
+@pytest.fixture
+def panel(qapp, bot, home, mock_server, scheduler):
+    server = mock_server(tokens_per_second=200.0, first_token_delay=0.0)
+    panel = bot.createInterface()
+    # Discovery could otherwise replace the endpoint with a real local Ollama
+    wait_until(qapp, lambda: panel.discovery_worker is None)
+    panel.api_url = f"{server.url}/api/generate"
+    panel.api_url_configured = True
+    panel.model_name = server.config.models[0]
+    panel.options["response_cache_enabled"] = False
+    panel.options["semantic_cache_enabled"] = False
+    panel.mock_server = server
+    yield panel
+    panel.keep_alive_timer.stop()
+    panel.close()
+    panel.deleteLater()
+    qapp.processEvents()
@@ -0,0 +1,48 @@
+from conftest import wait_until
+
+
+def assistant_replies(panel):
+    return [entry for entry in panel.current_conversation if entry["role"] == "assistant"]
+
+
+def test_least_outstanding_spreads_requests_in_configured_order(bot):
+    scheduler = bot.BackendScheduler()
+    scheduler.configure(["http://a/api/generate", "http://b/api/generate", "http://c/api/generate"])
+    picked = [scheduler.pick() for _ in range(3)]
+    assert picked == ["http://a/api/generate", "http://b/api/generate", "http://c/api/generate"]
+    scheduler.release("http://b/api/generate", True, 1.0, 10)
+    assert scheduler.pick() == "http://b/api/generate"
+    assert scheduler.pick(exclude=("http://a/api/generate",)) in ("http://b/api/generate", "http://c/api/generate")
+
+
+def test_request_fails_over_to_the_next_backend_in_order(qapp, panel, mock_server, scheduler):
+    first, second = mock_server(failure="refuse"), mock_server(failure="busy")
+    panel.api_url = f"{first.url}/api/generate"
+    panel.options["backends"] = [second.url, panel.mock_server.url]
+    panel.options["max_retries"] = 0
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    assert len(assistant_replies(panel)) == 1
+    hits = [(server, request[0]) for server in (first, second, panel.mock_server) for request in server.requests if request[1] == "/api/chat"]
+    assert [server for server, _ in sorted(hits, key=lambda hit: hit[1])] == [first, second, panel.mock_server]
+    errors = {backend["url"]: backend["errors"] for backend in scheduler.stats()}
+    assert errors == {f"{first.url}/api/generate": 1, f"{second.url}/api/generate": 1, f"{panel.mock_server.url}/api/generate": 0}
+
+
+def test_queued_messages_wait_for_their_own_chat(qapp, panel):
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    first_chat = panel.current_conversation_id
+    panel.input_field.setPlainText("Now copy spheres onto them")
+    panel.send_message()
+    assert len(panel.pending_requests) == 1
+    panel.new_chat()
+    assert "1 queued messages" in panel.error_display.text()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    qapp.processEvents()
+    assert not panel.request_in_progress and len(panel.pending_requests) == 1
+    panel.open_conversation(first_chat)
+    assert wait_until(qapp, lambda: not panel.pending_requests and not panel.request_in_progress)
+    messages = [entry["message"] for entry in panel.history_store.load_messages(first_chat) if entry["role"] == "user"]
+    assert messages == ["Scatter points on a grid", "Now copy spheres onto them"]
@@ -0,0 +1,187 @@
+import contextlib
+import types
+
+import pytest
+
+
+class FakeParm:
+    def __init__(self):
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+
+class FakeConnection:
+    def __init__(self, node, index):
+        self.node, self.index = node, index
+
+    def outputNode(self):
+        return self.node
+
+    def inputIndex(self):
+        return self.index
+
+
+class FakeNode:
+    def __init__(self, network, name, category="Sop"):
+        self.network, self._name, self.category = network, name, category
+        self.inputs, self.display, self.render = {}, False, False
+        self.parms = {"snippet": FakeParm()}
+        self._position = (0.0, 0.0)
+        self.dirty, self.cooks = True, 0
+
+    def name(self):
+        return self._name
+
+    def path(self):
+        return f"/obj/geo1/{self._name}"
+
+    def type(self):
+        return types.SimpleNamespace(category=lambda: types.SimpleNamespace(name=lambda: self.category))
+
+    def parent(self):
+        return self.network
+
+    def parm(self, name):
+        return self.parms[name]
+
+    def position(self):
+        return self._position
+
+    def setPosition(self, position):
+        self._position = position
+
+    def setInput(self, index, node):
+        self.network.log.append(("wire", self._name, index, node.name()))
+        self.inputs[index] = node
+
+    def outputConnections(self):
+        return [FakeConnection(node, index) for node in self.network.nodes for index, source in node.inputs.items() if source is self]
+
+    def isDisplayFlagSet(self):
+        return self.display
+
+    def setDisplayFlag(self, on):
+        for node in self.network.nodes:
+            node.display = False
+        self.display = on
+
+    def setRenderFlag(self, on):
+        self.render = on
+
+    def needsToCook(self):
+        return self.dirty
+
+    def cook(self):
+        if self.network.cook_error:
+            raise RuntimeError(self.network.cook_error)
+        self.cooks += 1
+        self.dirty = False
+
+
+class FakeNetwork:
+    def __init__(self, log):
+        self.log, self.nodes, self.cook_error = log, [], None
+
+    def createNode(self, node_type, name=None):
+        node = FakeNode(self, name or f"{node_type}{len(self.nodes) + 1}")
+        self.nodes.append(node)
+        self.log.append(("create", node.name()))
+        return node
+
+    def childTypeCategory(self):
+        return "sop"
+
+    def displayNode(self):
+        return next((node for node in self.nodes if node.display), None)
+
+
+@pytest.fixture
+def scene(fake_hou, monkeypatch):
+    log = []
+    network = FakeNetwork(log)
+    mode = {"current": "auto"}
+
+    @contextlib.contextmanager
+    def group(label):
+        log.append(("undo open", label))
+        try:
+            yield
+        finally:
+            log.append(("undo close", label))
+
+    def set_update_mode(value):
+        log.append(("update mode", value))
+        mode["current"] = value
+
+    monkeypatch.setattr(fake_hou, "undos", types.SimpleNamespace(group=group), raising=False)
+    monkeypatch.setattr(fake_hou, "updateMode", types.SimpleNamespace(Manual="manual"), raising=False)
+    monkeypatch.setattr(fake_hou, "updateModeSetting", lambda: mode["current"], raising=False)
+    monkeypatch.setattr(fake_hou, "setUpdateMode", set_update_mode, raising=False)
+    monkeypatch.setattr(fake_hou, "sopNodeTypeCategory", lambda: "sop", raising=False)
+    obj = types.SimpleNamespace(allSubChildren=lambda recurse_in_locked_nodes=False: [network])
+    monkeypatch.setattr(fake_hou, "node", lambda path: obj if path == "/obj" else None)
+    return network
+
+
+def failing_job():
+    raise ValueError("no such parm")
+
+
+def test_final_cook_runs_inside_the_undo_group(bot, scene):
+    grid = scene.createNode("grid")
+    grid.setDisplayFlag(True)
+    batch = bot.run_batch("AI Assistant: apply", [("grid", lambda: "ok"), ("box", failing_job)], deferred=True, final_cook=True)
+    events = [event[0] for event in scene.log if event[0] in ("undo open", "undo close", "update mode")]
+    assert events == ["undo open", "update mode", "update mode", "undo close"]
+    assert grid.cooks == 1 and batch["cooked"] == 1 and "cook_ms" in batch
+    assert [result["ok"] for result in batch["results"]] == [True, False]
+    text = bot.format_batch_results(batch)
+    assert "final cook of 1 nodes" in text and "FAILED box: ValueError: no such parm" in text
+
+
+def test_failing_final_cook_is_reported(bot, scene):
+    scene.createNode("grid").setDisplayFlag(True)
+    scene.cook_error = "cook failed"
+    batch = bot.run_batch("AI Assistant: apply", [("grid", lambda: "ok")], deferred=True, final_cook=True)
+    assert batch["cook_error"] == "cook failed"
+    assert scene.log[-1] == ("undo close", "AI Assistant: apply")
+    assert "Final cook failed: cook failed" in bot.format_batch_results(batch)
+
+
+def test_no_cook_is_reported_without_a_final_cook(bot, scene):
+    batch = bot.run_batch("AI Assistant: apply", [("grid", lambda: "ok")], deferred=True, final_cook=False)
+    assert "cook_ms" not in batch
+    executor = bot.CodeExecutor()
+    assert "cook_ms" not in bot.run_deferred(executor, "x = 1", final_cook=False)
+    assert "cook_ms" in bot.run_deferred(executor, "x = 1", final_cook=True)
+
+
+def test_batch_is_one_undo_step_and_failures_do_not_stop_it(bot, scene):
+    batch = bot.run_batch("AI Assistant: apply", [("a", lambda: "ok"), ("b", failing_job), ("c", lambda: None)])
+    assert [event for event in scene.log if event[0].startswith("undo")] == [("undo open", "AI Assistant: apply"), ("undo close", "AI Assistant: apply")]
+    assert [(result["target"], result["ok"]) for result in batch["results"]] == [("a", True), ("b", False), ("c", True)]
+    assert batch["results"][1]["detail"] == "ValueError: no such parm"
+
+
+def test_insert_wrangle_takes_over_downstream_wiring(bot, scene):
+    grid, scatter, copy = scene.createNode("grid"), scene.createNode("scatter"), scene.createNode("copytopoints")
+    scatter.setInput(0, grid)
+    copy.setInput(1, scatter)
+    scatter.setDisplayFlag(True)
+    wrangle = bot.insert_wrangle(scatter, "f@pscale = 0.1;")
+    assert wrangle.inputs[0] is scatter and copy.inputs[1] is wrangle
+    assert wrangle.parm("snippet").value == "f@pscale = 0.1;"
+    assert wrangle.display and wrangle.render and not scatter.display
+
+
+def test_node_jobs_follow_the_fence_language(bot, scene):
+    nodes = [scene.createNode("grid"), scene.createNode("box")]
+    source = "@property\ndef name(self):\n    return 'mail@example.com'\n"
+    bot.run_batch("AI Assistant: apply", bot.node_jobs(nodes, source, bot.CodeExecutor(), "python"))
+    assert len(scene.nodes) == 2
+    bot.run_batch("AI Assistant: apply", bot.node_jobs(nodes, "f@pscale = 0.1;", bot.CodeExecutor(), "vex"))
+    assert len(scene.nodes) == 4
+    # Unlabelled blocks still fall back to the heuristic
+    assert bot.is_vex_code("v@N = 0;") and not bot.is_vex_code("print(1)")
@@ -0,0 +1,34 @@
+import gc
+import weakref
+
+import pytest
+
+
+@pytest.fixture
+def docs(tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    (root / "scatter.md").write_text("# Scatter SOP\n\nScatters points over the surface of the input geometry.")
+    (root / "copy.md").write_text("# Copy to Points\n\nCopies geometry onto the points of the second input.")
+    return root
+
+
+def test_reindex_releases_mapped_files_before_swapping(bot, tmp_path, docs, mock_server, monkeypatch):
+    server = mock_server()
+    index = bot.DocsIndex(str(tmp_path / "index"))
+    index.build([str(docs)], f"{server.url}/api/generate", "nomic-embed-text")
+    assert index.search("scatter points")[0]["path"].endswith("scatter.md")
+    mapped = {name: weakref.ref(index.arrays[name]) for name in ("offsets", "postings_doc", "vectors", "text")}
+    replace = bot.os.replace
+
+    def checked_replace(source, target):
+        if target == index.index_dir:
+            gc.collect()
+            assert [name for name, ref in mapped.items() if ref() is not None] == []
+        replace(source, target)
+
+    monkeypatch.setattr(bot.os, "replace", checked_replace)
+    (docs / "copy.md").write_text("# Copy to Points\n\nCopies spheres onto the scattered points.")
+    result = index.build([str(docs)], f"{server.url}/api/generate", "nomic-embed-text")
+    assert result["changed"] == 1 and result["version"] == 2
+    assert index.search("spheres")[0]["path"].endswith("copy.md")
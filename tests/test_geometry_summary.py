@@ -0,0 +1,162 @@
+import time
+import types
+
+import numpy as np
+import pytest
+
+
+class FakeAttrib:
+    def __init__(self, name, data_type, values=None, size=1, strings=()):
+        self._name, self.data_type, self.values, self._size, self._strings = name, data_type, values, size, list(strings)
+
+    def name(self):
+        return self._name
+
+    def dataType(self):
+        return self.data_type
+
+    def size(self):
+        return self._size
+
+    def isArrayType(self):
+        return False
+
+    def strings(self):
+        return self._strings
+
+
+class FakeGeometry:
+    def __init__(self, points, attribs=()):
+        self.points = np.asarray(points, dtype=np.float32)
+        self.attribs = {"P": FakeAttrib("P", None, self.points, size=3)}
+        self.attribs.update((attrib.name(), attrib) for attrib in attribs)
+        self.reads = 0
+
+    def intrinsicValue(self, name):
+        return {"pointcount": len(self.points), "primitivecount": 0, "vertexcount": 0}[name]
+
+    def boundingBox(self):
+        low, high = self.points.min(axis=0), self.points.max(axis=0)
+        return types.SimpleNamespace(minvec=lambda: low, maxvec=lambda: high, sizevec=lambda: high - low)
+
+    def pointAttribs(self):
+        return list(self.attribs.values())
+
+    def primAttribs(self):
+        return []
+
+    def vertexAttribs(self):
+        return []
+
+    def globalAttribs(self):
+        return []
+
+    def pointFloatAttribValuesAsString(self, name):
+        self.reads += 1
+        return np.ascontiguousarray(self.attribs[name].values, dtype=np.float32).tobytes()
+
+    def pointIntAttribValuesAsString(self, name):
+        self.reads += 1
+        return np.ascontiguousarray(self.attribs[name].values, dtype=np.int32).tobytes()
+
+
+class FakeSop:
+    def __init__(self, name, geometry):
+        self._name, self.geo, self.cook_count = name, geometry, 1
+
+    def sessionId(self):
+        return id(self)
+
+    def cookCount(self):
+        return self.cook_count
+
+    def path(self):
+        return f"/obj/geo1/{self._name}"
+
+    def geometry(self):
+        return self.geo
+
+    def type(self):
+        return types.SimpleNamespace(category=lambda: types.SimpleNamespace(name=lambda: "Sop"))
+
+
+@pytest.fixture
+def geometry(fake_hou):
+    def make(count=100, **attribs):
+        points = np.zeros((count, 3), np.float32)
+        points[:, 0] = np.linspace(0.0, 1.0, count)
+        extra = [FakeAttrib(name, fake_hou.attribData.Float if np.asarray(values).dtype.kind == "f" else fake_hou.attribData.Int,
+                            values, size=np.asarray(values).reshape(count, -1).shape[1])
+                 for name, values in attribs.items()]
+        geo = FakeGeometry(points, extra)
+        geo.attribs["P"].data_type = fake_hou.attribData.Float
+        return geo
+    return make
+
+
+def test_summary_lists_counts_bounds_and_attribute_ranges(bot, geometry, fake_hou):
+    geo = geometry(pscale=np.linspace(0.0, 2.0, 100, dtype=np.float32), id=np.arange(100, dtype=np.int32))
+    geo.attribs["name"] = FakeAttrib("name", fake_hou.attribData.String, strings=["piece0", "piece1"])
+    text = bot.GeometrySummarizer().snapshot([FakeSop("scatter1", geo)])
+    lines = text.splitlines()
+    assert lines[0] == "Selected geometry:"
+    assert lines[1] == "Geometry of /obj/geo1/scatter1: 100 points, 0 primitives, 0 vertices"
+    assert lines[2] == "bounds min (0, 0, 0) max (1, 0, 0) size (1, 0, 0)"
+    assert lines[3].startswith("point P float3: min (0, 0, 0) max (1, 0, 0)") and "length histogram [13, 12, 13, 12, 12, 13, 12, 13]" in lines[3]
+    assert lines[4].startswith("point pscale float: min 0 max 2 mean 1 histogram")
+    assert lines[5].startswith("point id int: min 0 max 99")
+    assert lines[6] == 'point name string: 2 unique ("piece0", "piece1")'
+
+
+def test_unchanged_cook_count_reuses_the_summary(bot, geometry):
+    summarizer, node = bot.GeometrySummarizer(), FakeSop("grid1", geometry())
+    first = summarizer.snapshot([node])
+    reads = node.geo.reads
+    assert summarizer.snapshot([node]) == first
+    assert (summarizer.hits, summarizer.misses) == (1, 1) and node.geo.reads == reads
+
+
+def test_recook_reads_the_geometry_again(bot, geometry):
+    summarizer, node = bot.GeometrySummarizer(), FakeSop("grid1", geometry())
+    summarizer.snapshot([node])
+    node.geo.attribs["P"].values = node.geo.points = node.geo.points * 2.0
+    node.cook_count += 1
+    assert "max (2, 0, 0)" in summarizer.snapshot([node])
+    assert (summarizer.hits, summarizer.misses) == (0, 2)
+
+
+def test_token_budget_drops_the_remaining_attributes(bot, geometry):
+    geo = geometry(**{f"attr{index}": np.zeros(100, np.float32) for index in range(20)})
+    text = bot.GeometrySummarizer(token_budget=120).snapshot([FakeSop("grid1", geo)])
+    assert bot.estimate_tokens(text) < 160
+    assert text.splitlines()[-1].endswith("more attributes left out to stay within the context budget)")
+
+
+def test_histogram_skips_non_finite_values(bot):
+    summarizer = bot.GeometrySummarizer()
+    assert summarizer.histogram(np.array([0, 1, 2, np.inf], np.float32)) == [1, 0, 0, 0, 1, 0, 0, 1]
+    assert summarizer.histogram(np.array([np.nan, np.inf], np.float32)) == []
+
+
+def test_non_finite_values_are_counted_instead_of_dropping_the_summary(bot, geometry):
+    velocity = np.ones((100, 3), np.float32)
+    velocity[3] = np.inf
+    velocity[7, 1] = np.nan
+    text = bot.GeometrySummarizer().snapshot([FakeSop("sim1", geometry(v=velocity))])
+    line = next(line for line in text.splitlines() if line.startswith("point v"))
+    assert line.startswith("point v float3: min (1, 1, 1) max (1, 1, 1) mean (1, 1, 1) (2 non-finite skipped)")
+    bad = bot.GeometrySummarizer().snapshot([FakeSop("sim2", geometry(density=np.full(100, np.nan, np.float32)))])
+    assert "point density float: all 100 values non-finite" in bad
+
+
+def test_multi_million_points_summarize_well_under_a_second(bot, geometry):
+    count = 2000000
+    rng = np.random.default_rng(0)
+    geo = geometry(count, N=rng.standard_normal((count, 3), np.float32), pscale=rng.random(count, np.float32))
+    geo.attribs["P"].values = geo.points = rng.random((count, 3), np.float32)
+    summarizer = bot.GeometrySummarizer()
+    start = time.perf_counter()
+    text = summarizer.snapshot([FakeSop("scatter1", geo)])
+    elapsed = time.perf_counter() - start
+    assert "2,000,000 points" in text and "point N float3" in text
+    assert elapsed < 1.0
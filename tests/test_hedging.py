@@ -0,0 +1,27 @@
+import time
+
+
+def test_race_reports_the_winners_first_token_not_its_finish(qapp, bot, mock_server):
+    server = mock_server(models=("qwen2.5-coder:32b", "qwen2.5-coder:7b"), tokens_per_second=100.0, first_token_delay=0.05)
+    samples = []
+    worker = bot.AIWorker("Scatter points on a grid", f"{server.url}/api/generate", "qwen2.5-coder:32b", race_models=["qwen2.5-coder:7b"])
+    worker.signals.first_token.connect(samples.append)
+    worker.run()
+    assert len(samples) == 1
+    total = time.perf_counter() - worker.attempts[0]["start"]
+    # About 100 tokens at 100/s: the whole answer takes a second, the first token well under half of that
+    assert samples[0] < 0.5 < total
+
+
+def test_racer_without_a_backend_of_its_own_releases_nothing(qapp, bot, mock_server, monkeypatch):
+    server = mock_server(models=("qwen2.5-coder:32b", "qwen2.5-coder:7b"), tokens_per_second=500.0, first_token_delay=0.0)
+    url = f"{server.url}/api/generate"
+    scheduler = bot.BackendScheduler()
+    scheduler.configure([url])
+    # One slot for a request still running elsewhere, one for this worker's primary
+    assert scheduler.pick() == scheduler.pick() == url
+    monkeypatch.setattr(scheduler, "pick", lambda exclude=(): None)
+    worker = bot.AIWorker("Scatter points on a grid", url, "qwen2.5-coder:32b", scheduler=scheduler, race_models=["qwen2.5-coder:7b"])
+    worker.run()
+    assert [attempt["picked"] for attempt in worker.attempts] == [True, False]
+    assert scheduler.backends[url]["outstanding"] == 1
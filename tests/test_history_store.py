@@ -0,0 +1,78 @@
+import json
+
+
+def legacy_history(path):
+    conversations = [
+        {"title": "Scatter", "messages": [{"role": "user", "message": "scatter points on a grid"},
+                                           {"role": "assistant", "message": "```python\nhou.node('/obj')\n```"}]},
+        {"title": "Wrangle", "messages": [{"role": "user", "message": "randomize pscale in a wrangle"}]},
+    ]
+    with open(path, "w") as f:
+        json.dump(conversations, f)
+
+
+def test_legacy_history_opens_twice(bot, tmp_path):
+    legacy = tmp_path / "houdini_ai_chat_history.json"
+    legacy_history(legacy)
+    db_path = str(tmp_path / "history.sqlite")
+    for _ in range(2):
+        store = bot.SQLiteHistoryStore(db_path, legacy_json_path=str(legacy))
+        assert [conv["title"] for conv in store.list_conversations()] == ["Wrangle", "Scatter"]
+        hits = store.search("scatter")
+        assert len(hits) == 1 and hits[0]["title"] == "Scatter"
+        store.close()
+
+
+def test_half_indexed_database_is_rebuilt(bot, tmp_path):
+    db_path = str(tmp_path / "history.sqlite")
+    store = bot.SQLiteHistoryStore(db_path)
+    conversation_id = store.create_conversation("Pscale")
+    store.append_message(conversation_id, {"role": "user", "message": "set pscale from noise"})
+    with store.connection:
+        store.connection.execute("DELETE FROM meta WHERE key = 'search_indexed'")
+    store.close()
+    store = bot.SQLiteHistoryStore(db_path)
+    assert len(store.search("pscale")) == 1
+    store.close()
+
+
+def test_search_ranks_every_match_within_the_window(bot, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "SEARCH_RANK_WINDOW", 3)
+    store = bot.SQLiteHistoryStore(str(tmp_path / "history.sqlite"))
+    conversation_id = store.create_conversation("Vel")
+    store.append_message(conversation_id, {"role": "user", "message": "vel vel vel"})
+    for _ in range(2):
+        store.append_message(conversation_id, {"role": "user", "message": "vel drives motion blur, the pop solver and the pyro source volume"})
+    hits = store.search("vel")
+    assert hits[0]["seq"] == 0 and not store.search_truncated
+    store.append_message(conversation_id, {"role": "user", "message": "vel and more"})
+    assert store.search("vel") and store.search_truncated
+    store.close()
+
+
+def test_index_without_prefix_tables_is_rebuilt(bot, tmp_path):
+    db_path = str(tmp_path / "history.sqlite")
+    store = bot.SQLiteHistoryStore(db_path)
+    store.append_message(store.create_conversation("Pscale"), {"role": "user", "message": "set pscale from noise"})
+    with store.connection:
+        store.connection.execute("DROP TABLE message_search")
+        store.connection.execute("CREATE VIRTUAL TABLE message_search USING fts5(body, code, tokenize='unicode61')")
+        store.connection.execute("UPDATE meta SET value = '1' WHERE key = 'search_indexed'")
+    store.close()
+    store = bot.SQLiteHistoryStore(db_path)
+    sql = store.connection.execute("SELECT sql FROM sqlite_master WHERE name = 'message_search'").fetchone()[0]
+    assert "prefix='1 2'" in sql and len(store.search("p")) == 1
+    store.close()
+
+
+def test_updated_message_is_searched_by_its_new_text(bot, tmp_path):
+    store = bot.SQLiteHistoryStore(str(tmp_path / "history.sqlite"))
+    conversation_id = store.create_conversation("Pscale")
+    store.append_message(conversation_id, {"role": "assistant", "message": "set pscale from noise"})
+    store.update_message(conversation_id, 0, {"role": "assistant", "message": "use a scatter node"})
+    assert store.search("pscale") == [] and len(store.search("scatter")) == 1
+    store.close()
+    index = bot.MessageSearchIndex()
+    index.add((1, 0), {"role": "assistant", "message": "set pscale from noise"})
+    index.add((1, 0), {"role": "assistant", "message": "use a scatter node"})
+    assert index.search("pscale") == [] and len(index.search("scatter")) == 1
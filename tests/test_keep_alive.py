@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("30m", "30m"), ("1h30m", "1h30m"), (" 2h ", "2h"), ("500ms", "500ms"),
+    ("600", 600), ("-1", -1), (-1, -1), ("0", 0), (300, 300), ("-5m", "-5m"),
+    ("forever", None), ("30 minutes", None), ("", None), ("m30", None),
+])
+def test_normalize_keep_alive(bot, value, expected):
+    assert bot.normalize_keep_alive(value) == expected
+
+
+@pytest.mark.parametrize("value, seconds", [("30m", 1800), ("1h30m", 5400), ("600", 600), (-1, -1), ("-1m", -1), ("bogus", 0)])
+def test_parse_keep_alive(bot, value, seconds):
+    assert bot.parse_keep_alive(value) == seconds
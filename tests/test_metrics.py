@@ -0,0 +1,26 @@
+
+
+def test_summary_groups_requests_by_model_and_backend(bot, tmp_path):
+    log = bot.MetricsLog(str(tmp_path / "metrics.jsonl"))
+    log.append({"model": "qwen", "backend": "http://a", "eval_rate": 40.0, "ttft_ms": 200.0})
+    log.append({"model": "qwen", "backend": "http://a", "eval_rate": 60.0, "ttft_ms": 400.0})
+    log.append({"model": "qwen", "backend": "http://a", "ttft_ms": 300.0})
+    log.append({"model": "qwen", "backend": "http://a", "cached": True, "eval_rate": 900.0})
+    log.append({"model": "llama", "backend": "http://b", "client_rate": 10.0})
+    rows = {(row["model"], row["backend"]): row for row in log.summary()}
+    assert rows[("qwen", "http://a")]["requests"] == 3
+    assert rows[("qwen", "http://a")]["tokens_per_second"] == 50.0
+    assert rows[("qwen", "http://a")]["ttft_ms"][50] == 300.0
+    assert rows[("llama", "http://b")]["ttft_ms"] == {}
+    lines = bot.format_metrics_summary(log.summary()).splitlines()
+    assert "qwen @ http://a" in lines[1] and "0.30s" in lines[1]
+    assert "llama @ http://b" in lines[2]
+
+
+def test_panel_shows_the_metrics_summary(bot, home, panel, tmp_path):
+    panel.options["metrics_log_path"] = str(tmp_path / "metrics.jsonl")
+    panel.show_metrics_summary()
+    assert panel.transcript.transcript_model.items[-1]["text"] == "No requests in the metrics log yet."
+    panel.metrics_log().append({"model": "qwen", "backend": "http://a", "eval_rate": 42.0, "ttft_ms": 150.0})
+    panel.show_metrics_summary()
+    assert "qwen @ http://a" in panel.transcript.transcript_model.items[-1]["text"]
@@ -0,0 +1,50 @@
+import sys
+
+from conftest import wait_until
+
+
+def test_closing_mid_reply_drops_the_late_answer(qapp, panel, monkeypatch):
+    errors = []
+    monkeypatch.setattr(sys, "excepthook", lambda *exc_info: errors.append(exc_info))
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: panel.stream_item is not None)
+    panel.close()
+    assert wait_until(qapp, lambda: panel.thread_pool.activeThreadCount() == 0)
+    assert errors == []
+
+
+def test_code_blocks_unlock_when_their_fence_closes(qapp, panel):
+    finished, handler = [], panel.handle_block_finished
+
+    def record(index, language, code):
+        handler(index, language, code)
+        item = panel.stream_blocks[index]["item"]
+        finished.append((language, item["streaming"], item["text"] == code, panel.request_in_progress))
+
+    panel.handle_block_finished = record
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    # The mock reply has a python block followed by a vex block; the first closes while the reply is still streaming
+    assert finished[0] == ("python", False, True, True)
+    assert [language for language, *_ in finished] == ["python", "vex"]
+    assert all(not item.get("streaming") for item in panel.transcript.transcript_model.items if item["kind"] == "code")
+
+
+def test_regenerate_replaces_the_previous_answer(qapp, panel):
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    panel.regenerate_last_answer()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    assert [entry["role"] for entry in panel.current_conversation] == ["user", "assistant"]
+    assert [entry["role"] for entry in panel.history_store.load_messages(panel.current_conversation_id)] == ["user", "assistant"]
+    items = panel.transcript.transcript_model.items
+    assert [item["kind"] for item in items].count("assistant") == 1
+    assert all(item.get("seq") == 1 for item in items if item["kind"] in ("assistant", "code", "stats"))
+    panel.input_field.setPlainText("Now copy spheres onto them")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    roles = [message["role"] for message in panel.mock_server.requests[-1][2]["messages"]]
+    assert roles == ["system", "user", "assistant", "user"]
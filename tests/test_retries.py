@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from conftest import wait_until
+
+
+def run_worker(bot, server, scheduler=None, **options):
+    url = f"{server.url}/api/generate"
+    worker = bot.AIWorker("Scatter points on a grid", url, server.config.models[0], scheduler=scheduler, retry_backoff=0.01, **options)
+    result = {"tokens": [], "error": None, "answer": None}
+    worker.signals.partial.connect(result["tokens"].append)
+    worker.signals.error.connect(lambda message: result.update(error=message))
+    worker.signals.finished.connect(lambda text, found, code: result.update(answer=text))
+    start = time.perf_counter()
+    worker.run()
+    result["seconds"] = time.perf_counter() - start
+    result["worker"] = worker
+    return result
+
+
+@pytest.fixture
+def fast(mock_server):
+    return lambda **config: mock_server(tokens_per_second=500.0, first_token_delay=0.0, **config)
+
+
+def test_stalled_first_token_is_retried(qapp, bot, fast):
+    server = fast(failure="stall", failure_after=0, stall_seconds=2.0, failure_limit=1)
+    result = run_worker(bot, server, first_token_timeout=0.3, max_retries=1)
+    assert result["error"] is None and result["answer"]
+    assert result["worker"].attempts[0]["retries"] == 1
+    assert len([request for request in server.requests if request[1] == "/api/generate"]) == 2
+    assert result["seconds"] < 2.0
+
+
+def test_stall_after_output_fails_on_the_token_timeout(qapp, bot, fast):
+    server = fast(failure="stall", failure_after=5, stall_seconds=2.0)
+    result = run_worker(bot, server, token_timeout=0.3, max_retries=2)
+    assert result["error"] == "The model stopped sending tokens for more than 0.3s."
+    assert len(result["tokens"]) == 5 and result["worker"].attempts[0]["retries"] == 0
+    assert result["seconds"] < 2.0
+
+
+def test_dropped_connection_is_retried(qapp, bot, fast):
+    server = fast(failure="drop", failure_after=0, failure_limit=2)
+    result = run_worker(bot, server, max_retries=2)
+    assert result["error"] is None and result["worker"].attempts[0]["retries"] == 2
+
+
+def test_retries_stop_after_max_retries(qapp, bot, fast):
+    server = fast(failure="busy")
+    result = run_worker(bot, server, max_retries=2)
+    assert "503" in result["error"]
+    assert len(server.requests) == 3
+
+
+def test_breaker_opens_then_recovers_through_one_probe(qapp, bot, fast):
+    server = fast(failure="busy", failure_limit=2)
+    url = f"{server.url}/api/generate"
+    scheduler = bot.BackendScheduler(breaker_threshold=2, breaker_cooldown=0.2)
+    scheduler.configure([url])
+    for _ in range(2):
+        assert scheduler.pick() == url
+        assert run_worker(bot, server, scheduler, max_retries=0)["error"]
+    assert scheduler.stats()[0]["state"] == "open"
+    assert scheduler.pick() is None
+    time.sleep(0.25)
+    # Half-open: exactly one probe goes through while it is outstanding
+    assert scheduler.pick() == url
+    assert scheduler.stats()[0]["state"] == "half_open" and scheduler.pick() is None
+    assert run_worker(bot, server, scheduler, max_retries=0)["error"] is None
+    assert scheduler.stats()[0]["state"] == "closed"
+
+
+def test_failed_probe_reopens_the_breaker(bot):
+    scheduler = bot.BackendScheduler(breaker_threshold=1, breaker_cooldown=0.05)
+    scheduler.configure(["http://a/api/generate"])
+    scheduler.pick()
+    scheduler.release("http://a/api/generate", False, error="refused")
+    time.sleep(0.06)
+    assert scheduler.pick() == "http://a/api/generate"
+    scheduler.release("http://a/api/generate", False, error="refused")
+    assert scheduler.stats()[0]["state"] == "open" and scheduler.pick() is None
+
+
+def test_cached_answers_replay_while_every_breaker_is_open(qapp, panel, scheduler):
+    panel.options["response_cache_enabled"] = True
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    for backend in scheduler.backends.values():
+        backend["state"], backend["open_until"] = "open", time.time() + 60
+    panel.new_chat()
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    assert [entry["role"] for entry in panel.current_conversation] == ["user", "assistant"]
+    assert "All backends are failing" not in panel.error_display.text()
@@ -0,0 +1,148 @@
+import itertools
+import types
+
+import pytest
+
+EVENTS = ("ParmTupleChanged", "InputRearranged", "NameChanged", "FlagChanged", "ChildCreated", "ChildDeleted", "BeingDeleted")
+session_ids = itertools.count(1)
+
+
+class FakeParmTuple:
+    def __init__(self, name, values):
+        self._name, self.values = name, values
+
+    def name(self):
+        return self._name
+
+    def eval(self):
+        return self.values
+
+    def isAtDefault(self):
+        return False
+
+
+class FakeNode:
+    def __init__(self, name, type_name, parent=None, inputs=(), parms=None):
+        self._name, self.type_name, self._parent, self._inputs = name, type_name, parent, list(inputs)
+        self._session_id = next(session_ids)
+        self._parms = [FakeParmTuple(key, value) for key, value in (parms or {}).items()]
+        self._children, self.callbacks = [], []
+        self.describes = 0
+        if parent is not None:
+            parent._children.append(self)
+
+    def sessionId(self):
+        return self._session_id
+
+    def name(self):
+        return self._name
+
+    def path(self):
+        return f"{self._parent.path()}/{self._name}" if self._parent is not None else f"/obj/{self._name}"
+
+    def type(self):
+        return types.SimpleNamespace(name=lambda: self.type_name)
+
+    def parent(self):
+        return self._parent
+
+    def inputs(self):
+        return tuple(self._inputs)
+
+    def children(self):
+        return tuple(self._children)
+
+    def isDisplayFlagSet(self):
+        return False
+
+    def parmTuples(self):
+        self.describes += 1
+        return self._parms
+
+    def addEventCallback(self, event_types, callback):
+        self.callbacks.append(callback)
+
+    def removeEventCallback(self, event_types, callback):
+        self.callbacks.remove(callback)
+
+    def fire(self, event):
+        for callback in list(self.callbacks):
+            callback(event, node=self)
+
+
+@pytest.fixture
+def scene(fake_hou, monkeypatch):
+    monkeypatch.setattr(fake_hou, "nodeEventType", types.SimpleNamespace(**{name: name for name in EVENTS}), raising=False)
+    geo = FakeNode("geo1", "geo")
+    grid = FakeNode("grid1", "grid", geo, parms={"size": (4.0, 4.0)})
+    scatter = FakeNode("scatter1", "scatter", geo, inputs=[grid], parms={"npts": (500,)})
+    selection = [scatter]
+    monkeypatch.setattr(fake_hou, "selectedNodes", lambda: tuple(selection))
+    return types.SimpleNamespace(geo=geo, grid=grid, scatter=scatter, selection=selection)
+
+
+def test_second_snapshot_is_served_from_the_cache(bot, scene):
+    provider = bot.SceneContextProvider()
+    first = provider.snapshot()
+    assert "Network /obj/geo1: 2 nodes" in first and "scatter1 (scatter) <- grid1" in first and "npts=500" in first
+    misses = provider.misses
+    assert provider.snapshot() == first
+    assert provider.misses == misses and provider.hits == misses
+    assert scene.scatter.describes == 1
+
+
+@pytest.mark.parametrize("event", ["ParmTupleChanged", "InputRearranged", "FlagChanged"])
+def test_node_events_rebuild_only_that_node(bot, scene, event):
+    provider = bot.SceneContextProvider()
+    provider.snapshot()
+    scene.scatter._parms[0].values = (2000,)
+    scene.scatter.fire(event)
+    assert "npts=2000" in provider.snapshot()
+    assert scene.scatter.describes == 2 and scene.grid.describes == 1
+
+
+def test_rename_rebuilds_every_node_section(bot, scene):
+    provider = bot.SceneContextProvider()
+    provider.snapshot()
+    scene.grid._name = "base_grid"
+    scene.grid.fire("NameChanged")
+    assert "scatter1 (scatter) <- base_grid" in provider.snapshot()
+    assert scene.scatter.describes == 2 and scene.grid.describes == 2
+
+
+@pytest.mark.parametrize("event", ["ChildCreated", "ChildDeleted"])
+def test_child_events_rebuild_the_network_summary(bot, scene, event):
+    provider = bot.SceneContextProvider()
+    provider.snapshot()
+    FakeNode("box1", "box", scene.geo)
+    scene.geo.fire(event)
+    assert "Network /obj/geo1: 3 nodes" in provider.snapshot()
+    assert scene.scatter.describes == 1
+
+
+def test_deleted_nodes_are_forgotten(bot, scene):
+    provider = bot.SceneContextProvider()
+    provider.snapshot()
+    scene.scatter.fire("BeingDeleted")
+    assert scene.scatter.sessionId() not in provider.watched
+    assert scene.scatter.sessionId() not in provider.node_sections
+
+
+def test_least_recently_used_nodes_are_unwatched(bot, scene):
+    provider = bot.SceneContextProvider(max_watched=2)
+    provider.snapshot()
+    assert list(provider.watched) == [scene.scatter.sessionId(), scene.grid.sessionId()]
+    assert scene.geo.callbacks == [] and scene.geo.sessionId() not in provider.network_summaries
+    provider.close()
+    assert scene.scatter.callbacks == [] and scene.grid.callbacks == []
+
+
+def test_nodes_past_the_token_budget_are_left_out(bot, scene):
+    nodes = [FakeNode(f"box{number}", "box", scene.geo, parms={"size": (1.0, 1.0, 1.0)}) for number in range(40)]
+    scene.selection[:] = nodes
+    provider = bot.SceneContextProvider(token_budget=200)
+    text = provider.snapshot()
+    included = sum(1 for node in nodes if f"{node.name()} (box)" in text)
+    assert 0 < included < len(nodes)
+    assert f"({len(nodes) - included} more nodes left out to stay within the context budget)" in text
+    assert bot.estimate_tokens(text) <= 200 + 30
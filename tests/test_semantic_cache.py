@@ -0,0 +1,30 @@
+import pytest
+import requests
+
+
+class FailingClient:
+    def __init__(self):
+        self.posts = 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        raise requests.exceptions.ConnectionError("connection refused")
+
+
+def test_failed_embedding_endpoint_is_skipped_until_the_retry_delay(bot, tmp_path, monkeypatch):
+    client = FailingClient()
+    cache = bot.SemanticCache(str(tmp_path), http_client=client)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cache.embed("scatter points", "http://localhost:11434/api/generate", "nomic-embed-text")
+    with pytest.raises(RuntimeError):
+        cache.embed("copy spheres", "http://localhost:11434/api/generate", "nomic-embed-text")
+    assert client.posts == 1 and cache.stats()["embed_failing"]
+    failed_at = cache.embed_failures[("http://localhost:11434", "nomic-embed-text")]
+    monkeypatch.setattr(bot.time, "time", lambda: failed_at + bot.SEMANTIC_EMBED_RETRY_SECONDS + 1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cache.embed("copy spheres", "http://localhost:11434/api/generate", "nomic-embed-text")
+    assert client.posts == 2
+
+
+def test_semantic_cache_is_off_by_default(bot):
+    assert bot.DEFAULT_OPTIONS["semantic_cache_enabled"] is False
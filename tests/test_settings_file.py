@@ -0,0 +1,21 @@
+import json
+import threading
+
+
+def test_concurrent_updates_keep_every_key(bot, home):
+    bot.update_settings_file({"api_url": "http://localhost:11434/api/generate", "model_name": "qwen2.5-coder:32b"})
+
+    def save(key):
+        for index in range(50):
+            bot.update_settings_file({key: index})
+
+    threads = [threading.Thread(target=save, args=(f"key{number}",)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(bot.get_settings_path()) as f:
+        settings = json.load(f)
+    assert settings["model_name"] == "qwen2.5-coder:32b"
+    assert all(settings[f"key{number}"] == 49 for number in range(4))
+    assert not [name for name in home.iterdir() if name.suffix == ".tmp"]
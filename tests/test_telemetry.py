@@ -0,0 +1,40 @@
+from conftest import wait_until
+
+
+class FakeDocsIndex:
+    def version(self):
+        return 1
+
+    def context(self, query, api_url, embedding_model, top_k, tokens):
+        return "Reference: the scatter SOP places points on surfaces."
+
+
+def test_docs_lookup_is_reported_in_telemetry(qapp, bot, mock_server, capsys):
+    server = mock_server(tokens_per_second=500.0, first_token_delay=0.0)
+    worker = bot.AIWorker("Scatter points on a grid", f"{server.url}/api/generate", server.config.models[0], docs_index=FakeDocsIndex())
+    telemetry = []
+    worker.signals.telemetry.connect(telemetry.append)
+    worker.run()
+    assert telemetry[0]["docs_lookup_tokens"] == bot.estimate_tokens(FakeDocsIndex().context("", "", "", 0, 0))
+    assert telemetry[0]["docs_lookup_ms"] >= 0.0
+    assert "docs lookup" not in capsys.readouterr().out
+
+
+def test_prompt_context_is_reported_in_telemetry(qapp, panel, capsys):
+    panel.options["scene_context"] = True
+    panel.options["metrics_log_enabled"] = False
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    stats = panel.current_conversation[-1]["stats"]
+    assert stats["scene_context_tokens"] >= 1 and stats["scene_context_ms"] >= 0.0
+    assert "scene context" not in capsys.readouterr().out
+
+
+def test_time_to_first_token_is_shown_in_the_model_status_tooltip(qapp, panel, capsys):
+    panel.input_field.setPlainText("Scatter points on a grid")
+    panel.send_message()
+    assert wait_until(qapp, lambda: not panel.request_in_progress)
+    assert len(panel.ttft_samples["cold"]) == 1
+    assert panel.model_status_label.toolTip().startswith(f"{panel.model_name}: cold time to first token ")
+    assert "time to first token" not in capsys.readouterr().out